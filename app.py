@@ -1,18 +1,12 @@
 import streamlit as st
 from utils.auth import login_page, signup_page, forgot_password_page, logout
-from utils.exam_utils import (
-    admin_dashboard, 
-    manage_users, 
-    manage_exams, 
-    view_results,  
-    student_dashboard, 
-    take_exam, 
-    view_student_results, 
-    view_leaderboard
-)
-)
-from firebase_config import is_firebase_initialized
-import time
+from utils.metrics import page_context
+from firebase_config import storage_error, warm_up
+import uuid
+
+# Page modules load the Firestore SDK, pandas and numpy, so they are
+# imported when a signed-in user first needs them rather than at startup;
+# the login page renders while storage initializes in the background.
 
 # App configuration
 st.set_page_config(
@@ -22,9 +16,14 @@ st.set_page_config(
 )
 
 def main():
-    # Check Firebase initialization
-    if not is_firebase_initialized():
-        st.error("Firebase initialization failed. Please check your configuration.")
+    # Open storage, seed the dashboard counters and start delivering queued
+    # submissions (including any left over from a previous run) without
+    # holding up this render
+    warm_up(seed_counters, start_outbox)
+    
+    # Check storage initialization
+    if storage_error():
+        st.error("Storage initialization failed. Please check your Firebase configuration or STORAGE_BACKEND setting.")
         return
 
     # Session state initialization
@@ -42,6 +41,23 @@ def main():
         # User is not logged in - show auth pages
         show_auth_pages()
 
+def seed_counters():
+    """Count existing users, exams and results into the dashboard counters if needed (runs on the warm-up thread)"""
+    from utils.stats import ensure_counters
+    ensure_counters()
+
+def start_outbox():
+    """Start the submission outbox flusher (runs on the warm-up thread)"""
+    from utils.outbox import start_flusher
+    start_flusher()
+
+def render_page(page):
+    """Render a page, attributing its database reads and writes to it and this session"""
+    session_id = st.session_state.setdefault('metrics_session', uuid.uuid4().hex)
+    user_id = st.session_state.user['uid'] if 'user' in st.session_state else None
+    with page_context(page.__name__, session_id, user_id):
+        page()
+
 def show_auth_pages():
     """Show authentication pages based on current page state"""
     # Sidebar for auth navigation
@@ -49,37 +65,40 @@ def show_auth_pages():
     
     # Page selection
     if st.session_state.page == "login":
-        login_page()
+        render_page(login_page)
         if st.sidebar.button("Don't have an account? Sign up"):
             st.session_state.page = "signup"
-            st.experimental_rerun()
+            st.rerun()
         if st.sidebar.button("Forgot password?"):
             st.session_state.page = "forgot_password"
-            st.experimental_rerun()
+            st.rerun()
             
     elif st.session_state.page == "signup":
-        signup_page()
+        render_page(signup_page)
         if st.sidebar.button("Already have an account? Login"):
             st.session_state.page = "login"
-            st.experimental_rerun()
+            st.rerun()
             
     elif st.session_state.page == "forgot_password":
-        forgot_password_page()
+        render_page(forgot_password_page)
         if st.sidebar.button("Back to login"):
             st.session_state.page = "login"
-            st.experimental_rerun()
+            st.rerun()
 
 def show_admin_interface():
     """Show admin dashboard and navigation"""
     st.sidebar.title(f"Welcome, {st.session_state.user['display_name']}")
     st.sidebar.subheader("Admin Dashboard")
     
+    from utils.exam_utils import admin_dashboard, manage_users, manage_exams, view_results, performance_dashboard
+    
     # Admin navigation
     menu_options = {
         "Dashboard": admin_dashboard,
         "User Management": manage_users,
         "Exam Management": manage_exams,
-        "View Results": view_results
+        "View Results": view_results,
+        "Performance": performance_dashboard
     }
     
     choice = st.sidebar.radio("Menu", list(menu_options.keys()))
@@ -89,13 +108,15 @@ def show_admin_interface():
         logout()
     
     # Display selected page
-    menu_options[choice]()
+    render_page(menu_options[choice])
 
 def show_student_interface():
     """Show student dashboard and navigation"""
     st.sidebar.title(f"Welcome, {st.session_state.user['display_name']}")
     st.sidebar.subheader("Student Dashboard")
     
+    from utils.exam_utils import student_dashboard, take_exam, view_student_results, view_leaderboard
+    
     # Student navigation
     menu_options = {
         "Dashboard": student_dashboard,
@@ -106,7 +127,7 @@ def show_student_interface():
     
     # Special case for take exam page
     if 'current_exam' in st.session_state:
-        take_exam()
+        render_page(take_exam)
         return
     
     choice = st.sidebar.radio("Menu", list(menu_options.keys()))
@@ -116,7 +137,7 @@ def show_student_interface():
         logout()
     
     # Display selected page
-    menu_options[choice]()
+    render_page(menu_options[choice])
 
 if __name__ == "__main__":
     main()
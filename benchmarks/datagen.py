@@ -0,0 +1,280 @@
+from firebase_config import db, STORAGE_BACKEND
+from utils.db_operations import make_attempt_id
+from utils.exam_snapshot import answer_key_for, build_snapshot
+from utils.grading import compile_answer_key, grade_submissions
+from utils.answer_codec import MANIFESTS_COLLECTION, build_manifest, manifest_id, pack_answers
+from utils.analytics import compute_stats
+from utils.ranking import ALL_EXAMS_INDEX, percentage_bin
+from utils.leaderboards import ALL_EXAMS_BOARD, LEADERBOARD_SIZE, make_entry
+from utils.search_index import search_fields
+from utils.stats import COUNTERS_DOCUMENT, STATS_COLLECTION
+from datetime import datetime, timedelta
+from typing import Dict, List
+import argparse
+import heapq
+import random
+import time
+
+# Synthetic data with roughly the shape of a real deployment: a few admins
+# and instructors among many students, exams of 5-40 mixed-type questions,
+# heavily skewed exam popularity, and scores driven by per-student ability
+# and per-exam difficulty. Results are graded by the real grader, and the
+# derived documents (counters, exam stats, rank histograms, leaderboards,
+# per-user history) are written directly so the data set is consistent
+# without replaying every submission.
+SCALES = {
+    "small": {"users": 1000, "exams": 50, "results": 20000},
+    "medium": {"users": 10000, "exams": 500, "results": 100000},
+    "large": {"users": 10000, "exams": 500, "results": 1000000}
+}
+WRITE_BATCH_SIZE = 400
+QUESTION_TYPES = {"Multiple Choice": 0.6, "True/False": 0.2, "Short Answer": 0.15, "Essay": 0.05}
+ROLES = {"student": 0.95, "instructor": 0.04, "admin": 0.01}
+FIRST_NAMES = ["Aarav", "Maya", "Liam", "Sofia", "Noah", "Priya", "Ethan", "Zara", "Lucas", "Ananya",
+               "Oliver", "Isha", "Mateo", "Chloe", "Arjun", "Emma", "Kenji", "Amara", "Diego", "Fatima"]
+LAST_NAMES = ["Sharma", "Smith", "Garcia", "Chen", "Patel", "Johnson", "Okafor", "Nguyen", "Kumar", "Silva",
+              "Brown", "Ivanova", "Haddad", "Kim", "Mensah", "Rossi", "Tanaka", "Singh", "Lopez", "Walker"]
+SUBJECTS = ["Algebra", "Biology", "Chemistry", "World History", "Physics", "Statistics", "Literature",
+            "Geography", "Economics", "Computer Science", "Geometry", "Psychology"]
+LEVELS = ["Quiz", "Midterm", "Final", "Practice Test", "Unit Test"]
+
+class _BatchWriter:
+    """Buffers writes into Firestore-sized batches"""
+
+    def __init__(self):
+        self._batch = db.batch()
+        self._pending = 0
+        self.written = 0
+
+    def set(self, ref, data: Dict) -> None:
+        self._batch.set(ref, data)
+        self._pending += 1
+        if self._pending >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if self._pending:
+            self._batch.commit()
+            self.written += self._pending
+            self._batch = db.batch()
+            self._pending = 0
+
+def require_local_backend() -> None:
+    """Synthetic data must never be written to a real project"""
+    if STORAGE_BACKEND not in ("memory", "sqlite"):
+        raise SystemExit(f"Refusing to use STORAGE_BACKEND={STORAGE_BACKEND!r}; set it to memory or sqlite")
+
+def _pick(rng: random.Random, weights: Dict[str, float]) -> str:
+    return rng.choices(list(weights), weights=list(weights.values()))[0]
+
+def _doc_id(rng: random.Random, length: int = 20) -> str:
+    return "".join(rng.choice("abcdefghijklmnopqrstuvwxyz0123456789") for _ in range(length))
+
+def _make_question(rng: random.Random, number: int) -> Dict:
+    question_type = _pick(rng, QUESTION_TYPES)
+    question = {
+        "id": _doc_id(rng),
+        "text": f"Question {number}: " + " ".join(rng.choice(SUBJECTS).lower() for _ in range(rng.randint(6, 18))),
+        "type": question_type,
+        "points": rng.choices([1, 2, 3, 5], weights=[50, 30, 15, 5])[0],
+        "question_number": number,
+        "options": []
+    }
+    if question_type == "Multiple Choice":
+        question["options"] = [f"Option {chr(65 + i)}" for i in range(rng.randint(3, 5))]
+        question["correct_answer"] = rng.choice(question["options"])
+    elif question_type == "True/False":
+        question["options"] = ["True", "False"]
+        question["correct_answer"] = rng.choice(question["options"])
+    elif question_type == "Short Answer":
+        question["correct_answer"] = rng.choice(SUBJECTS).lower()
+    else:
+        question["correct_answer"] = ""
+    return question
+
+def _answer(rng: random.Random, question: Dict, p_correct: float) -> str:
+    if question["type"] == "Essay":
+        return " ".join(rng.choice(SUBJECTS).lower() for _ in range(rng.randint(20, 60)))
+    if rng.random() < p_correct:
+        return question["correct_answer"]
+    wrong = [o for o in question["options"] if o != question["correct_answer"]]
+    return rng.choice(wrong) if wrong else "not sure"
+
+def _popularity(rng: random.Random, exams: int, results: int, students: int) -> List[int]:
+    """Attempts per exam: Zipf-like skew, capped at one attempt per student"""
+    weights = [1 / (rank ** 0.9) for rank in range(1, exams + 1)]
+    rng.shuffle(weights)
+    total = sum(weights)
+    counts = [min(students, int(results * w / total)) for w in weights]
+    remaining = min(results, exams * students) - sum(counts)
+    while remaining > 0:
+        for i in range(exams):
+            if remaining and counts[i] < students:
+                counts[i] += 1
+                remaining -= 1
+    return counts
+
+def generate(users: int = 1000, exams: int = 50, results: int = 20000, seed: int = 7, verbose: bool = False,
+             plain_answers: bool = False) -> Dict:
+    """Populate the configured local backend; returns ids the benchmarks use.
+    
+    Results store compactly encoded answers unless plain_answers is set, which
+    writes them the way results were stored before the encoding existed.
+    """
+    require_local_backend()
+    rng = random.Random(seed)
+    now = datetime.now().replace(microsecond=0)
+    started = time.perf_counter()
+    writer = _BatchWriter()
+
+    # Users (written last, once their exam history is known)
+    user_docs = {}
+    for i in range(users):
+        first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+        uid = _doc_id(rng, 28)
+        user = {
+            "uid": uid,
+            "email": f"{first}.{last}{i}@example.edu".lower(),
+            "full_name": f"{first} {last}",
+            "role": "admin" if i == 0 else _pick(rng, ROLES),
+            "created_at": now - timedelta(days=rng.uniform(30, 720)),
+            "last_login": now - timedelta(days=rng.uniform(0, 30)),
+            "exams_taken": 0,
+            "total_points": 0,
+            "exams_taken_ids": {},
+            "exams_taken_indexed": True
+        }
+        user.update(search_fields(user))
+        user_docs[uid] = user
+    students = [uid for uid, u in user_docs.items() if u["role"] == "student"]
+    ability = {uid: rng.betavariate(5, 2.5) for uid in students}
+
+    # Exams and questions
+    exam_docs = {}
+    exam_questions = {}
+    for i in range(exams):
+        exam_id = _doc_id(rng)
+        questions = [_make_question(rng, n) for n in range(1, rng.randint(5, 40) + 1)]
+        exam_docs[exam_id] = {
+            "name": f"{rng.choice(SUBJECTS)} {rng.choice(LEVELS)} {i + 1}",
+            "description": "Synthetic exam",
+            "duration": rng.choice([15, 30, 45, 60, 90, 120]),
+            "created_at": now - timedelta(days=rng.uniform(1, 365)),
+            "is_active": rng.random() < 0.8,
+            "total_questions": len(questions),
+            "total_points": sum(q["points"] for q in questions),
+            "questions_version": len(questions)
+        }
+        exam_questions[exam_id] = questions
+        questions_ref = db.collection("exams").document(exam_id).collection("questions")
+        for question in questions:
+            writer.set(questions_ref.document(question["id"]), {k: v for k, v in question.items() if k != "id"})
+    if verbose:
+        print(f"  {exams} exams, {sum(len(q) for q in exam_questions.values())} questions")
+
+    # Results, graded exam by exam with the production grader
+    overall_top: List = []
+    ranks_all: Dict[str, int] = {}
+    attempts_per_exam = {}
+    total_results = 0
+    for (exam_id, exam), attempts in zip(list(exam_docs.items()), _popularity(rng, exams, results, len(students))):
+        questions = exam_questions[exam_id]
+        snapshot = build_snapshot(exam_id, exam["questions_version"], questions)
+        key = compile_answer_key(snapshot)
+        manifest = build_manifest(snapshot)
+        writer.set(db.collection(MANIFESTS_COLLECTION).document(manifest_id(exam_id, snapshot.version)), manifest)
+        takers = rng.sample(students, attempts)
+        difficulty = rng.uniform(-0.2, 0.1)
+        submissions = [{answer_key_for(q): _answer(rng, q, min(0.98, max(0.02, ability[s] + difficulty))) for q in questions}
+                       for s in takers]
+        scores = grade_submissions(key, submissions).scores.tolist() if takers else []
+
+        exam_results = []
+        for student_id, answers, score in zip(takers, submissions, scores):
+            result_id = make_attempt_id(student_id, exam_id, _doc_id(rng, 32))
+            submitted_at = now - timedelta(days=rng.uniform(0, 180), hours=rng.gauss(0, 3))
+            result = {
+                "exam_id": exam_id,
+                "exam_name": exam["name"],
+                "student_id": student_id,
+                "student_name": user_docs[student_id]["full_name"],
+                "score": score,
+                "max_score": key.max_score,
+                "percentage": score / key.max_score * 100 if key.max_score else 0.0,
+                **({"answers": answers} if plain_answers else pack_answers(manifest, answers)),
+                "submitted_at": submitted_at,
+                "time_taken": rng.uniform(0.3, 1.0) * exam["duration"] * 60
+            }
+            writer.set(db.collection("results").document(result_id), result)
+            exam_results.append((result_id, result))
+
+            user = user_docs[student_id]
+            user["exams_taken"] += 1
+            user["total_points"] += score
+            user["exams_taken_ids"][exam_id] = True
+            user["last_exam_taken"] = max(user.get("last_exam_taken", submitted_at), submitted_at)
+        total_results += len(exam_results)
+        attempts_per_exam[exam_id] = len(exam_results)
+
+        # Derived documents for this exam
+        writer.set(db.collection("exam_stats").document(exam_id), compute_stats(exam_id, (r for _, r in exam_results)))
+        bins: Dict[str, int] = {}
+        for _, result in exam_results:
+            b = str(percentage_bin(result["percentage"]))
+            bins[b] = bins.get(b, 0) + 1
+            ranks_all[b] = ranks_all.get(b, 0) + 1
+        writer.set(db.collection("exam_ranks").document(exam_id), {"bins": bins})
+        ranked = sorted(exam_results, key=lambda r: (-r[1]["percentage"], r[0]))
+        writer.set(db.collection("leaderboards").document(exam_id), {
+            "entries": [make_entry(result_id, result) for result_id, result in ranked[:LEADERBOARD_SIZE]],
+            "updated_at": now
+        })
+        overall_top = heapq.nsmallest(LEADERBOARD_SIZE, overall_top + [(-r["percentage"], rid, r) for rid, r in ranked[:LEADERBOARD_SIZE]],
+                                      key=lambda t: (t[0], t[1]))
+        if verbose:
+            print(f"  {total_results} results", end="\r")
+
+    writer.set(db.collection("exam_ranks").document(ALL_EXAMS_INDEX), {"bins": ranks_all})
+    writer.set(db.collection("leaderboards").document(ALL_EXAMS_BOARD), {
+        "entries": [make_entry(result_id, result) for _, result_id, result in overall_top],
+        "updated_at": now
+    })
+    for uid, user in user_docs.items():
+        writer.set(db.collection("users").document(uid), user)
+    for exam_id, exam in exam_docs.items():
+        writer.set(db.collection("exams").document(exam_id), exam)
+    writer.set(db.collection(STATS_COLLECTION).document(COUNTERS_DOCUMENT), {
+        "users": users,
+        "exams": exams,
+        "active_exams": sum(1 for e in exam_docs.values() if e["is_active"]),
+        "submissions": total_results
+    })
+    writer.flush()
+
+    busiest_student = max(students, key=lambda s: user_docs[s]["exams_taken"])
+    return {
+        "users": users,
+        "exams": exams,
+        "results": total_results,
+        "documents_written": writer.written,
+        "seconds": round(time.perf_counter() - started, 1),
+        "admin_id": next(uid for uid, u in user_docs.items() if u["role"] == "admin"),
+        "student_id": busiest_student,
+        "new_student_id": min(students, key=lambda s: user_docs[s]["exams_taken"]),
+        "exam_id": max(exam_docs, key=lambda e: exam_docs[e]["total_questions"] if exam_docs[e]["is_active"] else 0),
+        "popular_exam_id": max(attempts_per_exam, key=attempts_per_exam.get),
+        "search_term": user_docs[busiest_student]["full_name"].split()[0][:3].lower()
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Fill a local storage backend with synthetic data")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--plain-answers", action="store_true", help="Store answers unencoded, as older results were")
+    args = parser.parse_args()
+
+    summary = generate(**SCALES[args.scale], seed=args.seed, verbose=True, plain_answers=args.plain_answers)
+    print(f"\nWrote {summary['documents_written']} documents in {summary['seconds']}s to the {STORAGE_BACKEND} backend")
+
+if __name__ == "__main__":
+    main()
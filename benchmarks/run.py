@@ -0,0 +1,248 @@
+import os
+
+# Benchmarks always run in-process against a local backend
+os.environ.setdefault("STORAGE_BACKEND", "memory")
+
+from benchmarks.datagen import SCALES, generate, require_local_backend
+from firebase_config import db, STORAGE_BACKEND
+from utils import db_operations as ops
+from utils import answer_codec, exam_snapshot, leaderboards, ranking
+from utils.analytics import get_exam_analytics
+from utils.ranking import get_rank
+from utils.stats import get_dashboard_stats
+from utils.drafts import flush_drafts
+from streamlit.testing.v1 import AppTest
+from typing import Callable, Dict, List, Optional
+import argparse
+import json
+import numpy as np
+import sys
+import time
+import tracemalloc
+import uuid
+
+# Times db_operations functions and whole page renders (through Streamlit's
+# AppTest) against synthetic data, reporting latency percentiles, billable
+# document reads/writes per call and peak memory. Results are compared with
+# benchmarks/baseline.json: read/write counts must not grow, and latency and
+# memory may not exceed the baseline by more than the given tolerance (plus
+# a small absolute allowance, so microsecond-scale calls don't fail on noise).
+# Latencies are those of this process and the local backend, not of
+# Firestore; the read/write counts are what Firestore would bill.
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baseline.json")
+DEFAULT_ITERATIONS = 20
+DEFAULT_PAGE_ITERATIONS = 5
+LATENCY_TOLERANCE = 2.0  # x baseline p95
+LATENCY_FLOOR_MS = 5.0   # p95 allowance on top of the tolerance (GC pauses, scheduling)
+MEMORY_TOLERANCE = 1.5   # x baseline peak
+COUNT_TOLERANCE = 0.1    # fraction above baseline reads/writes per call
+
+def _submit(data: Dict) -> Callable[[], object]:
+    def submit():
+        return ops.submit_exam_results({
+            "exam_id": data["exam_id"],
+            "exam_name": "Benchmark",
+            "student_id": data["new_student_id"],
+            "student_name": "Benchmark",
+            "score": 1,
+            "max_score": 2,
+            "answers": {},
+            "time_taken": 60
+        }, attempt_nonce=uuid.uuid4().hex)
+    return submit
+
+def operations(data: Dict) -> Dict[str, Callable[[], object]]:
+    """The data-layer calls the pages make, with representative arguments"""
+    return {
+        "get_exam": lambda: ops.get_exam(data["exam_id"]),
+        "get_all_exams": lambda: ops.get_all_exams(active_only=True),
+        "get_exam_questions": lambda: ops.get_exam_questions(data["exam_id"]),
+        "get_leaderboard[exam]": lambda: ops.get_leaderboard(data["popular_exam_id"], limit=10),
+        "get_leaderboard[all]": lambda: ops.get_leaderboard(None, limit=10),
+        "get_leaderboard[exam,100]": lambda: ops.get_leaderboard(data["popular_exam_id"], limit=100),
+        "get_recent_results": lambda: ops.get_recent_results(limit=5),
+        "get_student_results": lambda: ops.get_student_results(data["student_id"]),
+        "get_best_percentage": lambda: ops.get_best_percentage(data["student_id"], data["popular_exam_id"]),
+        "get_taken_exam_ids": lambda: ops.get_taken_exam_ids(data["student_id"]),
+        "get_users_page": lambda: ops.get_users_page(None, ops.USERS_PAGE_SIZE),
+        "search_users": lambda: ops.search_users(data["search_term"]),
+        "get_all_users": ops.get_all_users,
+        "get_dashboard_stats": get_dashboard_stats,
+        "get_exam_analytics": lambda: get_exam_analytics(data["popular_exam_id"]),
+        "get_rank": lambda: get_rank(data["popular_exam_id"], 75.0),
+        "submit_exam_results": _submit(data)
+    }
+
+def pages(data: Dict) -> Dict[str, Dict]:
+    """Page functions with the session state they render for"""
+    admin = {"uid": data["admin_id"], "email": "admin@example.edu", "display_name": "Admin", "role": "admin"}
+    student = {"uid": data["student_id"], "email": "student@example.edu", "display_name": "Student", "role": "student"}
+    exam = {"id": data["exam_id"], **ops.get_exam(data["exam_id"])}
+    return {
+        "admin_dashboard": {"user": admin},
+        "manage_users": {"user": admin},
+        "manage_exams": {"user": admin},
+        "view_results": {"user": admin},
+        "student_dashboard": {"user": student},
+        "take_exam": {"user": student, "current_exam": exam},
+        "view_student_results": {"user": student},
+        "view_leaderboard": {"user": student}
+    }
+
+def _summarize(latencies: List[float], usage_before: Dict, usage_after: Dict, calls: int, peak: int) -> Dict:
+    ms = np.array(latencies) * 1000
+    return {
+        "p50_ms": round(float(np.percentile(ms, 50)), 3),
+        "p95_ms": round(float(np.percentile(ms, 95)), 3),
+        "p99_ms": round(float(np.percentile(ms, 99)), 3),
+        "mean_ms": round(float(ms.mean()), 3),
+        "reads": round((usage_after["reads"] - usage_before["reads"]) / calls, 1),
+        "writes": round((usage_after["writes"] - usage_before["writes"]) / calls, 1),
+        "peak_kb": round(peak / 1024, 1)
+    }
+
+def _peak_memory(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+def clear_all_caches() -> None:
+    """Empty the db_operations caches and the module caches the pages read through"""
+    ops.clear_caches()
+    for cache, lock in ((exam_snapshot._snapshots, exam_snapshot._snapshots_lock),
+                        (ranking._indexes, ranking._indexes_lock),
+                        (leaderboards._cutoffs, leaderboards._cutoffs_lock),
+                        (answer_codec._manifests, answer_codec._manifests_lock)):
+        with lock:
+            cache.clear()
+
+def bench_operation(fn: Callable[[], object], iterations: int, warm: bool) -> Dict:
+    """Time one call repeatedly; caches are cleared before each call unless warm"""
+    fn()  # first call outside the measurements (imports, lazy indexes)
+    latencies = []
+    before = db.usage()
+    for _ in range(iterations):
+        if not warm:
+            clear_all_caches()
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    after = db.usage()
+    if not warm:
+        clear_all_caches()
+    return _summarize(latencies, before, after, iterations, _peak_memory(fn))
+
+def _page_app(page: str, session: Dict) -> AppTest:
+    app = AppTest.from_string(f"from utils import exam_utils\nexam_utils.{page}()\n", default_timeout=120)
+    for key, value in session.items():
+        app.session_state[key] = value
+    return app
+
+def bench_page(page: str, session: Dict, iterations: int, warm: bool) -> Dict:
+    """Render a page in a fresh session repeatedly"""
+    _page_app(page, session).run()
+    flush_drafts(force=True)
+    latencies = []
+    before = db.usage()
+    for _ in range(iterations):
+        if not warm:
+            clear_all_caches()
+        app = _page_app(page, session)
+        started = time.perf_counter()
+        app.run()
+        latencies.append(time.perf_counter() - started)
+        if app.exception:
+            raise RuntimeError(f"{page} raised: {app.exception[0].value}")
+        # Debounced autosaves count against the page that caused them
+        flush_drafts(force=True)
+    after = db.usage()
+    return _summarize(latencies, before, after, iterations, _peak_memory(lambda: _page_app(page, session).run()))
+
+def compare(results: Dict, baseline: Dict, latency_tolerance: float) -> List[str]:
+    """Regressions against a baseline of the same scale"""
+    problems = []
+    for group in ("operations", "pages"):
+        for name, expected in baseline.get(group, {}).items():
+            actual = results[group].get(name)
+            if actual is None:
+                continue
+            for counter in ("reads", "writes"):
+                if actual[counter] > expected[counter] * (1 + COUNT_TOLERANCE) + 0.5:
+                    problems.append(f"{name}: {counter} per call {actual[counter]} > baseline {expected[counter]}")
+            if actual["p95_ms"] > expected["p95_ms"] * latency_tolerance + LATENCY_FLOOR_MS:
+                problems.append(f"{name}: p95 {actual['p95_ms']}ms > {latency_tolerance}x baseline {expected['p95_ms']}ms")
+            if actual["peak_kb"] > expected["peak_kb"] * MEMORY_TOLERANCE + 64:
+                problems.append(f"{name}: peak memory {actual['peak_kb']}KB > {MEMORY_TOLERANCE}x baseline {expected['peak_kb']}KB")
+    return problems
+
+def _print_table(title: str, rows: Dict[str, Dict]) -> None:
+    print(f"\n{title}")
+    print(f"{'':28} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'reads':>8} {'writes':>7} {'peak KB':>9}")
+    for name, r in rows.items():
+        print(f"{name:28} {r['p50_ms']:9.2f} {r['p95_ms']:9.2f} {r['p99_ms']:9.2f} {r['reads']:8.1f} {r['writes']:7.1f} {r['peak_kb']:9.1f}")
+
+def run(scale: str, iterations: int, page_iterations: int, warm: bool, only: Optional[List[str]] = None) -> Dict:
+    require_local_backend()
+    print(f"Generating {scale} data set ({SCALES[scale]}) on the {STORAGE_BACKEND} backend...")
+    data = generate(**SCALES[scale])
+    print(f"  {data['documents_written']} documents in {data['seconds']}s")
+
+    results = {"scale": scale, "backend": STORAGE_BACKEND, "warm": warm, "operations": {}, "pages": {}}
+    for name, fn in operations(data).items():
+        if not only or name in only:
+            results["operations"][name] = bench_operation(fn, iterations, warm)
+    for page, session in pages(data).items():
+        if not only or page in only:
+            results["pages"][page] = bench_page(page, session, page_iterations, warm)
+    return results
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark data-layer calls and pages on synthetic data")
+    parser.add_argument("--scale", choices=SCALES, default="small")
+    parser.add_argument("--iterations", type=int, default=DEFAULT_ITERATIONS)
+    parser.add_argument("--page-iterations", type=int, default=DEFAULT_PAGE_ITERATIONS)
+    parser.add_argument("--warm", action="store_true", help="Keep read caches between calls")
+    parser.add_argument("--only", nargs="*", help="Operation or page names to run")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--update-baseline", action="store_true", help="Record these results as the baseline")
+    parser.add_argument("--latency-tolerance", type=float, default=LATENCY_TOLERANCE)
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = run(args.scale, args.iterations, args.page_iterations, args.warm, args.only)
+    _print_table("db_operations", results["operations"])
+    _print_table("pages", results["pages"])
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    baselines = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baselines = json.load(f)
+    key = f"{args.scale}{'-warm' if args.warm else ''}"
+
+    if args.update_baseline:
+        baselines[key] = {"operations": results["operations"], "pages": results["pages"]}
+        with open(args.baseline, "w") as f:
+            json.dump(baselines, f, indent=2, sort_keys=True)
+            f.write("\n")
+        print(f"\nBaseline '{key}' written to {args.baseline}")
+        return
+
+    if key not in baselines:
+        print(f"\nNo '{key}' baseline to compare against (run with --update-baseline)")
+        return
+    problems = compare(results, baselines[key], args.latency_tolerance)
+    if problems:
+        print("\nRegressions against baseline:")
+        for problem in problems:
+            print(f"  {problem}")
+        sys.exit(1)
+    print("\nNo regressions against baseline")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+from typing import Dict, List
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+# Measures cold-start cost: each probe runs in a fresh interpreter, the way
+# a new Streamlit worker or test process would pay it. Probes time importing
+# the modules the app loads, the first render of the login page (and whether
+# storage was already initialized by then), and initializing storage.
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_RUNS = 5
+IMPORT_PROBES = ("firebase_config", "utils.auth", "utils.db_operations", "utils.exam_utils")
+
+def _probe_import(module: str) -> Dict:
+    started = time.perf_counter()
+    __import__(module)
+    return {"seconds": time.perf_counter() - started}
+
+def _probe_login() -> Dict:
+    from streamlit.testing.v1 import AppTest
+    import firebase_config
+    app = AppTest.from_file(os.path.join(ROOT, "app.py"), default_timeout=60)
+    started = time.perf_counter()
+    app.run()
+    elapsed = time.perf_counter() - started
+    if app.exception:
+        raise RuntimeError(app.exception[0].value)
+    return {"seconds": elapsed, "storage_ready": firebase_config.is_firebase_initialized()}
+
+def _probe_storage() -> Dict:
+    import firebase_config
+    started = time.perf_counter()
+    firebase_config.get_db()
+    return {"seconds": time.perf_counter() - started}
+
+def _run_probe(probe: str) -> Dict:
+    if probe.startswith("import:"):
+        return _probe_import(probe.split(":", 1)[1])
+    if probe == "login":
+        return _probe_login()
+    if probe == "storage":
+        return _probe_storage()
+    raise ValueError(f"Unknown probe {probe!r}")
+
+def measure(probe: str, runs: int) -> Dict:
+    """Run a probe in `runs` fresh interpreters and summarize"""
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-m", "benchmarks.startup", "--probe", probe],
+            cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    seconds = [s["seconds"] * 1000 for s in samples]
+    summary = {"median_ms": round(statistics.median(seconds), 1), "max_ms": round(max(seconds), 1)}
+    if "storage_ready" in samples[0]:
+        summary["storage_ready_at_render"] = sum(s["storage_ready"] for s in samples)
+    return summary
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold-start time of the app in fresh processes")
+    parser.add_argument("--runs", type=int, default=DEFAULT_RUNS)
+    parser.add_argument("--probe", help=argparse.SUPPRESS)  # used by the child processes
+    args = parser.parse_args()
+
+    if args.probe:
+        print(json.dumps(_run_probe(args.probe)))
+        return
+
+    probes: List[str] = [f"import:{m}" for m in IMPORT_PROBES] + ["storage", "login"]
+    print(f"Cold start on the {os.getenv('STORAGE_BACKEND', 'firestore')} backend, {args.runs} runs each")
+    print(f"{'':28} {'median ms':>10} {'max ms':>9}")
+    for probe in probes:
+        result = measure(probe, args.runs)
+        line = f"{probe:28} {result['median_ms']:10.1f} {result['max_ms']:9.1f}"
+        if "storage_ready_at_render" in result:
+            line += f"   (storage ready at first render in {result['storage_ready_at_render']}/{args.runs} runs)"
+        print(line)
+
+if __name__ == "__main__":
+    main()
@@ -1,24 +1,45 @@
-import firebase_admin
-from firebase_admin import credentials, firestore, auth
+from utils.metrics import instrument
+from typing import Callable, Optional
+import functools
 import os
+import threading
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+# "firestore" (default), or "memory" / "sqlite" to run without Firebase credentials
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "firestore").strip().lower()
+STORAGE_PATH = os.getenv("STORAGE_PATH", "exam_data.sqlite3")
+# Record reads, writes and latency per page (see utils/metrics.py); set to 0 to disable
+DB_METRICS = os.getenv("DB_METRICS", "1").strip().lower() not in ("0", "false", "no")
+
+# Storage is initialized on first use rather than at import, so importing
+# this module (and every page module) stays cheap. The SDKs themselves are
+# imported inside the initializers. warm_up() does the initialization and
+# opens the connection on a background thread while the first page renders;
+# anything that needs the client before then waits on _init_lock.
+WARM_UP_DOCUMENT = ("stats", "counters")  # read once to open the Firestore channel
+
 # Global variable to track initialization
 _firebase_initialized = False
 _db = None
 _auth = None
+_init_error: Optional[str] = None
+_init_lock = threading.Lock()
+_warm_up_thread: Optional[threading.Thread] = None
 
 def initialize_firebase():
     """Initialize Firebase Admin SDK with environment variables"""
-    global _firebase_initialized, _db, _auth
+    global _firebase_initialized, _db, _auth, _init_error
     
     if _firebase_initialized:
         return _db, _auth
 
     try:
+        import firebase_admin
+        from firebase_admin import credentials, firestore, auth
+
         # Configuration using environment variables
         firebase_config = {
             "type": "service_account",
@@ -55,14 +76,137 @@ def initialize_firebase():
 
     except ValueError as ve:
         print(f"Configuration error: {ve}")
+        _init_error = str(ve)
         return None, None
     except Exception as e:
         print(f"Error initializing Firebase: {e}")
+        _init_error = str(e)
+        return None, None
+
+def initialize_local_storage(backend: str):
+    """Initialize the in-memory or SQLite backend in place of Firebase"""
+    global _firebase_initialized, _db, _auth, _init_error
+
+    if _firebase_initialized:
+        return _db, _auth
+
+    try:
+        from utils.local_store import LocalClient, MemoryStore, SQLiteStore
+        from utils.local_auth import LocalAuth
+
+        if backend == "memory":
+            store = MemoryStore()
+        elif backend == "sqlite":
+            store = SQLiteStore(STORAGE_PATH)
+        else:
+            raise ValueError(f"Unknown STORAGE_BACKEND {backend!r}; use firestore, memory or sqlite")
+
+        _db = LocalClient(store)
+        _auth = LocalAuth(_db)
+        _firebase_initialized = True
+
+        return _db, _auth
+
+    except ValueError as ve:
+        print(f"Configuration error: {ve}")
+        _init_error = str(ve)
+        return None, None
+    except Exception as e:
+        print(f"Error initializing {backend} storage: {e}")
+        _init_error = str(e)
         return None, None
 
-# Initialize Firebase and get Firestore client and auth
-db, auth = initialize_firebase()
+def initialize_storage():
+    """Initialize the configured storage backend"""
+    if STORAGE_BACKEND == "firestore":
+        return initialize_firebase()
+    return initialize_local_storage(STORAGE_BACKEND)
+
+def _ensure_initialized() -> None:
+    """Initialize storage exactly once, whichever thread gets here first"""
+    global _db
+    if _firebase_initialized or _init_error is not None:
+        return
+    with _init_lock:
+        if _firebase_initialized or _init_error is not None:
+            return
+        initialize_storage()
+        if _firebase_initialized and DB_METRICS:
+            _db = instrument(_db)
+
+def get_db():
+    """The database client, initializing storage on first use"""
+    _ensure_initialized()
+    if _db is None:
+        raise Exception(f"Storage is not available: {_init_error}")
+    return _db
+
+def get_auth():
+    """firebase_admin.auth, or its local stand-in, initializing storage on first use"""
+    _ensure_initialized()
+    if _auth is None:
+        raise Exception(f"Storage is not available: {_init_error}")
+    return _auth
+
+class _Deferred:
+    """Module-level stand-in for a client that is created on first attribute access"""
+    __slots__ = ("_resolve",)
+
+    def __init__(self, resolve: Callable):
+        self._resolve = resolve
+
+    def __getattr__(self, name):
+        return getattr(self._resolve(), name)
+
+    def __repr__(self):
+        return f"<deferred {self._resolve.__name__}>"
+
+def _warm_up(after: tuple) -> None:
+    try:
+        client = get_db()
+        if STORAGE_BACKEND == "firestore":
+            # The first request opens the gRPC channel and fetches an access token
+            collection, document = WARM_UP_DOCUMENT
+            client.collection(collection).document(document).get()
+    except Exception as e:
+        print(f"Storage warm-up failed: {e}")
+    for fn in after:
+        try:
+            fn()
+        except Exception as e:
+            print(f"Error during warm-up: {e}")
+
+def warm_up(*after: Callable[[], None]) -> None:
+    """Initialize storage in the background, then run `after`; only the first call does anything"""
+    global _warm_up_thread
+    with _init_lock:
+        if _warm_up_thread is not None:
+            return
+        _warm_up_thread = threading.Thread(target=_warm_up, args=(after,), name="storage-warm-up", daemon=True)
+    _warm_up_thread.start()
+
+def transactional(fn):
+    """firestore.transactional that also accepts local backend and instrumented transactions"""
+    @functools.wraps(fn)
+    def wrapper(transaction, *args, **kwargs):
+        # The retry machinery gets the underlying transaction; fn gets the
+        # one it was given, so instrumented reads and writes are recorded
+        underlying = getattr(transaction, "wrapped", transaction)
+        call = lambda _, *a, **kw: fn(transaction, *a, **kw)
+        if STORAGE_BACKEND != "firestore":
+            return underlying.run(call, *args, **kwargs)
+        from firebase_admin import firestore
+        return firestore.transactional(call)(underlying, *args, **kwargs)
+    return wrapper
+
+# The database client and auth, created when first used
+db = _Deferred(get_db)
+auth = _Deferred(get_auth)
 
 def is_firebase_initialized():
-    """Check if Firebase was successfully initialized"""
+    """Check if the storage backend (Firebase or local) was successfully initialized"""
     return _firebase_initialized
+
+def storage_error() -> Optional[str]:
+    """Why storage initialization failed, or None if it hasn't (yet)"""
+    return _init_error
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# Tests run against the in-memory backend, so they need neither Firebase
+# credentials nor a network connection
+os.environ["STORAGE_BACKEND"] = "memory"
+os.environ.setdefault("DB_METRICS", "0")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
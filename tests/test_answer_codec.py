@@ -0,0 +1,75 @@
+import pytest
+
+from firebase_config import db
+from utils import answer_codec
+from utils.answer_codec import (MANIFESTS_COLLECTION, NO_CHOICE, build_manifest, decode_answers, encode_answers,
+                                ensure_manifest, manifest_id, pack_answers, unpack_answers)
+from utils.exam_snapshot import build_snapshot
+
+QUESTIONS = [
+    {"id": "q1", "question_number": 1, "type": "Multiple Choice", "options": ["A", "B", "C"], "correct_answer": "B"},
+    {"id": "q2", "question_number": 2, "type": "True/False", "correct_answer": "False"},
+    {"id": "q3", "question_number": 3, "type": "Short Answer", "correct_answer": "paris"},
+]
+
+# Version 2 of the exam reorders q1's options and adds a question
+QUESTIONS_V2 = [
+    {**QUESTIONS[0], "options": ["C", "B", "A"]},
+    QUESTIONS[1],
+    QUESTIONS[2],
+    {"id": "q4", "question_number": 4, "type": "Multiple Choice", "options": ["X", "Y"], "correct_answer": "Y"},
+]
+
+@pytest.fixture(autouse=True)
+def clear_manifests():
+    answer_codec._manifests.clear()
+    yield
+    answer_codec._manifests.clear()
+
+def test_pack_round_trips_every_question_type():
+    manifest = build_manifest(build_snapshot("codec-pack", 1, QUESTIONS))
+    answers = {"q_q1": "C", "q_q2": "False", "q_q3": "Paris"}
+    packed = pack_answers(manifest, answers)
+    assert packed["choices"] == "21" + NO_CHOICE
+    assert packed["texts"] == {"2": "Paris"}
+    assert unpack_answers(manifest, packed) == answers
+
+def test_missing_empty_and_unknown_answers():
+    manifest = build_manifest(build_snapshot("codec-pack", 1, QUESTIONS))
+    packed = pack_answers(manifest, {"q_q1": "", "q_q2": None, "q_gone": "kept"})
+    assert packed["choices"] == NO_CHOICE * 3
+    assert unpack_answers(manifest, packed) == {"q_gone": "kept"}
+
+def test_answer_outside_the_options_is_kept_as_text():
+    manifest = build_manifest(build_snapshot("codec-pack", 1, QUESTIONS))
+    packed = pack_answers(manifest, {"q_q1": "D"})
+    assert packed["choices"][0] == NO_CHOICE
+    assert unpack_answers(manifest, packed) == {"q_q1": "D"}
+
+def test_results_decode_against_the_version_they_were_packed_for():
+    v1 = encode_answers(build_snapshot("codec-versions", 1, QUESTIONS), {"q_q1": "A", "q_q2": "True"})
+    v2 = encode_answers(build_snapshot("codec-versions", 2, QUESTIONS_V2), {"q_q1": "A", "q_q4": "Y"})
+    assert (v1["questions_version"], v2["questions_version"]) == (1, 2)
+    assert v1["choices"][0] != v2["choices"][0]
+
+    answer_codec._manifests.clear()  # decode from the stored manifests
+    assert decode_answers({"exam_id": "codec-versions", **v1}) == {"q_q1": "A", "q_q2": "True"}
+    assert decode_answers({"exam_id": "codec-versions", **v2}) == {"q_q1": "A", "q_q4": "Y"}
+
+def test_plain_results_decode_unchanged():
+    assert decode_answers({"exam_id": "codec-plain", "answers": {"q_q1": "B"}}) == {"q_q1": "B"}
+
+def test_answers_are_packed_against_a_manifest_written_first_elsewhere():
+    stored = build_manifest(build_snapshot("codec-race", 1, QUESTIONS_V2[:3]))
+    db.collection(MANIFESTS_COLLECTION).document(manifest_id("codec-race", 1)).set(stored)
+    manifest = ensure_manifest(build_snapshot("codec-race", 1, QUESTIONS))
+    assert manifest == stored
+    packed = encode_answers(build_snapshot("codec-race", 1, QUESTIONS), {"q_q1": "C"})
+    assert packed["choices"][0] == "0"
+    assert decode_answers({"exam_id": "codec-race", **packed}) == {"q_q1": "C"}
+
+def test_unknown_encoding_and_missing_manifest_raise():
+    with pytest.raises(ValueError, match="Unknown answer encoding"):
+        decode_answers({"exam_id": "codec-bad", "answer_encoding": 99, "questions_version": 1})
+    with pytest.raises(ValueError, match="Missing answer manifest"):
+        decode_answers({"exam_id": "codec-bad", "answer_encoding": 1, "questions_version": 1, "choices": ""})
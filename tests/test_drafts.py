@@ -0,0 +1,43 @@
+from firebase_config import db
+from utils import drafts
+
+def _draft_exists(student_id, exam_id):
+    return db.collection(drafts.DRAFTS_COLLECTION).document(drafts.draft_id(student_id, exam_id)).get().exists
+
+def test_failed_discard_is_counted_and_retried(monkeypatch):
+    first = drafts.open_draft("draft-student", "draft-exam", 60)
+    reference_type = type(db.collection(drafts.DRAFTS_COLLECTION).document("x"))
+    original_delete = reference_type.delete
+
+    def offline(self):
+        raise RuntimeError("offline")
+
+    monkeypatch.setattr(reference_type, "delete", offline)
+    before = drafts.get_draft_metrics()["discard_failures"]
+    try:
+        drafts.discard_draft("draft-student", "draft-exam")
+    except Exception as e:
+        assert "offline" in str(e)
+    metrics = drafts.get_draft_metrics()
+    assert metrics["discard_failures"] == before + 1
+    assert metrics["pending_discards"] == 1
+    assert _draft_exists("draft-student", "draft-exam")
+
+    monkeypatch.setattr(reference_type, "delete", original_delete)
+    drafts.flush_drafts()
+    assert drafts.get_draft_metrics()["pending_discards"] == 0
+    assert not _draft_exists("draft-student", "draft-exam")
+
+    # A new attempt starts afresh
+    assert drafts.open_draft("draft-student", "draft-exam", 60)["attempt_nonce"] != first["attempt_nonce"]
+
+def test_failed_save_is_counted_and_kept(monkeypatch):
+    drafts.open_draft("save-student", "save-exam", 60)
+    drafts.stage_answers("save-student", "save-exam", {"q_1": "A"})
+    monkeypatch.setattr(drafts, "_write", lambda entry: (_ for _ in ()).throw(RuntimeError("offline")))
+    before = drafts.get_draft_metrics()["save_failures"]
+    assert drafts.flush_drafts(force=True) == 0
+    assert drafts.get_draft_metrics()["save_failures"] == before + 1
+    monkeypatch.undo()
+    assert drafts.flush_drafts(force=True) == 1
+    assert drafts.open_draft("save-student", "save-exam", 60)["answers"] == {"q_1": "A"}
@@ -0,0 +1,65 @@
+import numpy as np
+
+from utils.exam_snapshot import build_snapshot
+from utils.grading import answer_matrix, compile_answer_key, grade_matrix, grade_submission, grade_submissions
+
+QUESTIONS = [
+    {"id": "q2", "question_number": 2, "type": "True/False", "correct_answer": "False", "points": 1},
+    {"id": "q1", "question_number": 1, "type": "Multiple Choice", "options": ["A", "B", "C"], "correct_answer": "B", "points": 3},
+    {"id": "q3", "question_number": 3, "type": "Short Answer", "correct_answer": "paris", "points": 2},
+]
+
+def make_key(version=1, questions=QUESTIONS):
+    return compile_answer_key(build_snapshot("exam-grading", version, questions))
+
+def test_key_follows_question_order():
+    key = make_key()
+    assert key.answer_keys == ("q_q1", "q_q2", "q_q3")
+    assert key.max_score == 6
+
+def test_grade_submission_scores_correct_answers():
+    grade = grade_submission(make_key(), {"q_q1": "B", "q_q2": "True", "q_q3": "paris"})
+    assert grade["score"] == 5
+    assert grade["max_score"] == 6
+    assert grade["correct"] == {"q_q1": True, "q_q2": False, "q_q3": True}
+
+def test_missing_and_empty_answers_score_nothing():
+    key = make_key()
+    assert grade_submission(key, {})["score"] == 0
+    assert grade_submission(key, {"q_q1": "", "q_q2": None})["score"] == 0
+
+def test_unknown_answers_are_ignored():
+    assert grade_submission(make_key(), {"q_q1": "B", "q_other": "B"})["score"] == 3
+
+def test_grade_submissions_matches_one_by_one():
+    key = make_key()
+    submissions = [
+        {"q_q1": "B", "q_q2": "False", "q_q3": "paris"},
+        {"q_q1": "A"},
+        {"q_q2": "False", "q_q3": "london"},
+    ]
+    report = grade_submissions(key, submissions)
+    assert report.scores.tolist() == [grade_submission(key, s)["score"] for s in submissions]
+    assert np.allclose(report.percentages, [100.0, 0.0, 100 / 6])
+
+def test_grade_matrix_on_prebuilt_matrix():
+    key = make_key()
+    matrix = answer_matrix(key, [{"q_q1": "B"}, {"q_q1": "C", "q_q2": "False"}])
+    assert matrix.shape == (2, 3)
+    report = grade_matrix(key, matrix)
+    assert report.correct.tolist() == [[True, False, False], [False, True, False]]
+    assert report.scores.tolist() == [3, 1]
+
+def test_empty_batch_and_empty_exam():
+    assert grade_submissions(make_key(), []).scores.tolist() == []
+    empty = make_key(version=99, questions=[])
+    report = grade_submissions(empty, [{}, {}])
+    assert report.scores.tolist() == [0, 0]
+    assert np.array_equal(report.percentages, np.zeros(2))
+
+def test_compiled_key_is_cached_per_version():
+    snapshot = build_snapshot("exam-cache", 1, QUESTIONS)
+    assert compile_answer_key(snapshot) is compile_answer_key(snapshot)
+    changed = [dict(q, correct_answer="C") if q["id"] == "q1" else q for q in QUESTIONS]
+    new_key = compile_answer_key(build_snapshot("exam-cache", 2, changed))
+    assert grade_submission(new_key, {"q_q1": "C"})["score"] == 3
@@ -0,0 +1,31 @@
+import pytest
+
+from firebase_config import db
+from utils import db_operations, leaderboards
+
+@pytest.fixture
+def exam():
+    db.collection("users").document("lb-student").set({"email": "lb@example.com", "full_name": "Leader Board"})
+    exam_id = db_operations.create_exam({"name": "Leaderboard", "duration": 10})
+    db_operations.submit_exam_results({"student_id": "lb-student", "exam_id": exam_id, "score": 1, "max_score": 4}, "first")
+    assert [e["score"] for e in db_operations.get_leaderboard(exam_id)] == [1]  # builds the board
+    return exam_id
+
+def _fail(*args, **kwargs):
+    raise RuntimeError("leaderboard unavailable")
+
+def test_failed_update_does_not_fail_the_submission(exam, monkeypatch, caplog):
+    monkeypatch.setattr(leaderboards, "_insert_entry", _fail)
+    db_operations.submit_exam_results({"student_id": "lb-student", "exam_id": exam, "score": 3, "max_score": 4}, "second")
+    assert "Leaderboard update failed" in caplog.text
+    monkeypatch.undo()
+    assert [e["score"] for e in db_operations.get_leaderboard(exam)] == [3, 1]
+
+def test_board_is_rebuilt_even_if_it_cannot_be_deleted(exam, monkeypatch):
+    monkeypatch.setattr(leaderboards, "_insert_entry", _fail)
+    monkeypatch.setattr(type(db.collection(leaderboards.LEADERBOARDS_COLLECTION).document("x")), "delete", _fail)
+    db_operations.submit_exam_results({"student_id": "lb-student", "exam_id": exam, "score": 4, "max_score": 4}, "third")
+    monkeypatch.undo()
+    # The stored board still lacks the new score, but this worker doesn't serve it
+    assert [e["score"] for e in db_operations.get_leaderboard(exam)] == [4, 1]
+    assert [e["score"] for e in leaderboards.read_leaderboard(exam)] == [4, 1]
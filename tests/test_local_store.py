@@ -0,0 +1,29 @@
+import pytest
+
+from utils.local_store import DocumentStore, MemoryStore, SQLiteStore
+
+def test_incomplete_store_fails_on_creation():
+    class GetOnly(DocumentStore):
+        def get(self, path):
+            return None
+
+    with pytest.raises(TypeError):
+        GetOnly()
+
+@pytest.mark.parametrize("make_store", [MemoryStore, lambda: SQLiteStore(":memory:")], ids=["memory", "sqlite"])
+def test_stores_round_trip_and_roll_back(make_store):
+    store = make_store()
+    with store.atomic():
+        store.put("exams/e1", {"name": "Math", "is_active": True})
+    assert store.get("exams/e1") == {"name": "Math", "is_active": True}
+    assert [doc_id for doc_id, _ in store.scan("exams", {"is_active": True})] == ["e1"]
+
+    with pytest.raises(RuntimeError):
+        with store.atomic():
+            store.put("exams/e2", {"name": "Art"})
+            raise RuntimeError("abort")
+    assert store.get("exams/e2") is None
+
+    with store.atomic():
+        store.delete("exams/e1")
+    assert store.get("exams/e1") is None
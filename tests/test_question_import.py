@@ -0,0 +1,52 @@
+import json
+
+from utils.question_import import CSV_TEMPLATE, MAX_OPTIONS, MAX_POINTS, parse_question_file, validate_question, validate_questions
+
+def mc(**changes):
+    question = {"text": "2 + 2?", "type": "Multiple Choice", "options": ["3", "4"], "correct_answer": "4", "points": 1}
+    question.update(changes)
+    return question
+
+def test_template_parses_and_validates():
+    questions = parse_question_file("questions.csv", CSV_TEMPLATE.encode())
+    assert [q["type"] for q in questions] == ["Multiple Choice", "True/False"]
+    assert questions[0]["options"] == ["3", "4", "5"]
+    assert questions[1]["options"] == ["True", "False"]
+    assert validate_questions(questions) == []
+
+def test_json_accepts_a_list_or_a_questions_object():
+    rows = [{"text": "Sky is blue", "type": "True/False", "correct_answer": "True", "points": 2}]
+    assert parse_question_file("bank.json", json.dumps(rows).encode()) == \
+        parse_question_file("bank.JSON", json.dumps({"questions": rows}).encode())
+
+def test_csv_with_bom_and_blank_question_number():
+    content = "\ufefftext,type,points,question_number,options,correct_answer\nQ,Short Answer,2,,,yes\n".encode("utf-8")
+    question, = parse_question_file("bank.csv", content)
+    assert question["text"] == "Q"
+    assert "question_number" not in question
+    assert validate_question(question) == []
+
+def test_valid_questions_have_no_problems():
+    assert validate_question(mc()) == []
+    assert validate_question({"text": "Essay", "type": "Essay", "points": MAX_POINTS}) == []
+
+def test_each_rule_is_reported():
+    assert validate_question(mc(text="")) == ["question text is required"]
+    assert validate_question(mc(type="Matching"))[0].startswith("type must be one of")
+    assert validate_question(mc(points=0)) == [f"points must be between 1 and {MAX_POINTS}"]
+    assert validate_question(mc(points="many")) == ["points must be a whole number"]
+    assert validate_question(mc(question_number=0)) == ["question number must be positive"]
+    assert validate_question(mc(question_number="x")) == ["question number must be a whole number"]
+    assert validate_question(mc(options=["4"])) == [f"multiple choice needs 2 to {MAX_OPTIONS} options"]
+    assert validate_question(mc(options=["4", ""])) == ["all options must be filled"]
+    assert validate_question(mc(correct_answer="5")) == ["correct answer must be one of the options"]
+    assert validate_question({"text": "Q", "type": "Short Answer", "points": 1}) == \
+        ["short answer questions need a correct answer"]
+
+def test_validate_questions_numbers_rows_from_one():
+    problems = validate_questions([mc(), mc(text=""), mc(points=20, correct_answer="9")])
+    assert problems == [
+        (2, "question text is required"),
+        (3, f"points must be between 1 and {MAX_POINTS}"),
+        (3, "correct answer must be one of the options"),
+    ]
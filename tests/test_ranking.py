@@ -0,0 +1,75 @@
+import random
+
+from firebase_config import db
+from utils.ranking import (FenwickTree, NUM_BINS, apply_bin_deltas, bin_deltas, get_rank, percentage_bin,
+                           rebuild_rank_index, record_score)
+
+def test_prefix_sums_match_a_plain_sum():
+    rng = random.Random(7)
+    counts = [0] * 50
+    tree = FenwickTree(len(counts))
+    for _ in range(500):
+        index, delta = rng.randrange(len(counts)), rng.choice([1, 1, 2, -1])
+        counts[index] += delta
+        tree.add(index, delta)
+    assert tree.total == sum(counts)
+    for index in range(len(counts)):
+        assert tree.prefix_sum(index) == sum(counts[:index + 1])
+
+def test_prefix_sum_past_the_end_is_the_total():
+    tree = FenwickTree(4)
+    tree.add(0, 2)
+    tree.add(3, 5)
+    assert tree.prefix_sum(100) == 7
+    assert tree.prefix_sum(-1) == 0
+
+def test_percentage_bins_are_clamped():
+    assert percentage_bin(0) == 0
+    assert percentage_bin(75.04) == 750
+    assert percentage_bin(100) == NUM_BINS - 1
+    assert percentage_bin(-5) == 0
+    assert percentage_bin(150) == NUM_BINS - 1
+
+def test_bin_deltas():
+    assert bin_deltas(None, 50.0) == {"500": 1}
+    assert bin_deltas(40.0, 60.0) == {"600": 1, "400": -1}
+    assert bin_deltas(60.0, 60.01) == {}
+
+def _bins(board):
+    return {k: v for k, v in (db.collection("exam_ranks").document(board).get().to_dict() or {}).get("bins", {}).items() if v}
+
+def test_summed_deltas_match_a_rebuild():
+    db.collection("results").document("r1").set({"exam_id": "exam-rank", "percentage": 30.0})
+    db.collection("results").document("r2").set({"exam_id": "exam-rank", "percentage": 80.0})
+    rebuild_rank_index("exam-rank")
+
+    # Regrade both attempts and apply the moves as one summed write per index
+    deltas = {}
+    for old, new in ((30.0, 50.0), (80.0, 50.0)):
+        for bin_index, delta in bin_deltas(old, new).items():
+            deltas[bin_index] = deltas.get(bin_index, 0) + delta
+    batch = db.batch()
+    apply_bin_deltas(batch, "exam-rank", deltas)
+    batch.commit()
+    db.collection("results").document("r1").update({"percentage": 50.0})
+    db.collection("results").document("r2").update({"percentage": 50.0})
+
+    assert _bins("exam-rank") == {"500": 2}
+    rebuild_rank_index("exam-rank")
+    assert _bins("exam-rank") == {"500": 2}
+
+def test_get_rank_shares_ranks_on_ties():
+    for i, percentage in enumerate((90.0, 70.0, 70.0, 40.0)):
+        db.collection("results").document(f"tie{i}").set({"exam_id": "exam-ties", "percentage": percentage})
+    rebuild_rank_index("exam-ties")
+    assert get_rank("exam-ties", 90.0) == {"rank": 1, "total": 4, "percentile": 75.0}
+    assert get_rank("exam-ties", 70.0)["rank"] == 2
+    assert get_rank("exam-ties", 40.0) == {"rank": 4, "total": 4, "percentile": 0.0}
+
+def test_record_score_updates_exam_and_all_exams_index():
+    before = _bins("_all").get("123", 0)
+    batch = db.batch()
+    record_score(batch, "exam-record", 12.3)
+    batch.commit()
+    assert _bins("exam-record") == {"123": 1}
+    assert _bins("_all")["123"] == before + 1
@@ -0,0 +1,51 @@
+from utils.search_index import MAX_PREFIX_LENGTH, UserSearchIndex, matches, query_token, search_tokens
+
+def test_tokens_cover_prefixes_of_email_parts_and_name_words():
+    tokens = set(search_tokens("Mary.Jones+x@Example.com", "Mary  Ann Jones"))
+    for token in ("m", "mary.jones+x@exampl", "mary.j", "@example", "example.c", "jones", "x",
+                  "com", "mary ann", "ann", "jo"):
+        assert token in tokens
+    # Only prefixes: inner substrings aren't tokens
+    assert "ary" not in tokens
+    assert "xample" not in tokens
+
+def test_tokens_are_capped_and_tolerate_missing_fields():
+    tokens = search_tokens("a" * 40 + "@b.com", None)
+    assert max(len(t) for t in tokens) == MAX_PREFIX_LENGTH
+    assert search_tokens(None, None) == []
+
+def test_query_token_normalizes_the_term():
+    assert query_token("  Mary   JONES ") == "mary jones"
+    assert len(query_token("x" * 50)) == MAX_PREFIX_LENGTH
+
+def test_matches_is_a_case_insensitive_substring_match():
+    user = {"email": "mary.jones@example.com", "full_name": "Mary Jones"}
+    assert matches(user, "JONES")
+    assert matches(user, "ry jo")
+    assert matches(user, " @example ")
+    assert not matches(user, "smith")
+    assert not matches({}, "a")
+
+def test_local_index_finds_inner_substrings():
+    index = UserSearchIndex()
+    index.add([
+        {"id": "u1", "email": "john@example.com", "full_name": "John Smith"},
+        {"id": "u2", "email": "ann@other.org", "full_name": "Ann Smithers"},
+        {"id": "u3", "email": "bob@example.com", "full_name": "Bob Brown"},
+    ])
+    assert [u["id"] for u in index.search("mith")] == ["u2", "u1"]  # sorted by email
+    assert [u["id"] for u in index.search("xam")] == ["u3", "u1"]
+    assert index.search("zzz") == []
+    assert index.search("  ") == []
+
+def test_local_index_updates_and_evicts():
+    index = UserSearchIndex(max_users=2)
+    index.add([{"id": "u1", "email": "a@x.com", "full_name": "Old Name"}])
+    index.add([{"id": "u1", "email": "a@x.com", "full_name": "New Name"}])
+    assert index.search("old") == []
+    assert [u["id"] for u in index.search("new")] == ["u1"]
+    index.add([{"id": "u2", "email": "b@x.com"}, {"id": "u3", "email": "c@x.com"}])
+    assert len(index) == 2
+    assert index.search("a@x") == []
+    index.remove("u2")
+    assert [u["id"] for u in index.search("@x")] == ["u3"]
@@ -0,0 +1,137 @@
+from firebase_config import db
+from firebase_admin import firestore
+from utils.models import Result, ResultColumns
+from typing import Dict, Iterable, List, Mapping, Optional
+import argparse
+import math
+import numpy as np
+
+# Per-exam aggregates are maintained with server-side transforms (Increment,
+# Maximum, Minimum) in the same batch as the result write, so analytics cost
+# one document read however many attempts an exam has.
+EXAM_STATS_COLLECTION = "exam_stats"
+PASS_PERCENTAGE = 60
+HISTOGRAM_BUCKETS = 10  # fixed 10%-wide percentage buckets, 100% lands in the last
+BACKFILL_PAGE_SIZE = 500
+
+def _stats_ref(exam_id: str):
+    return db.collection(EXAM_STATS_COLLECTION).document(exam_id)
+
+def histogram_bucket(percentage: float) -> int:
+    """Histogram bucket index for a percentage score"""
+    return min(HISTOGRAM_BUCKETS - 1, max(0, int(percentage // (100 / HISTOGRAM_BUCKETS))))
+
+def bucket_labels() -> List[str]:
+    width = 100 // HISTOGRAM_BUCKETS
+    return [f"{i * width}-{i * width + width - 1}%" if i < HISTOGRAM_BUCKETS - 1 else f"{i * width}-100%"
+            for i in range(HISTOGRAM_BUCKETS)]
+
+def record_submission(batch, result_data: Dict) -> None:
+    """Queue aggregate updates for a new result on a write batch or transaction"""
+    score = result_data["score"]
+    percentage = result_data["percentage"]
+    batch.set(_stats_ref(result_data["exam_id"]), {
+        "exam_id": result_data["exam_id"],
+        "count": firestore.Increment(1),
+        "score_sum": firestore.Increment(score),
+        "score_sum_sq": firestore.Increment(score * score),
+        "highest_score": firestore.Maximum(score),
+        "lowest_score": firestore.Minimum(score),
+        "pass_count": firestore.Increment(1 if percentage >= PASS_PERCENTAGE else 0),
+        "histogram": {str(histogram_bucket(percentage)): firestore.Increment(1)}
+    }, merge=True)
+
+def compute_stats(exam_id: str, results: Iterable[Mapping]) -> Dict:
+    """Build an aggregate document from scratch out of results"""
+    stats = {
+        "exam_id": exam_id,
+        "count": 0,
+        "score_sum": 0,
+        "score_sum_sq": 0,
+        "highest_score": None,
+        "lowest_score": None,
+        "pass_count": 0,
+        "histogram": {}
+    }
+    columns = ResultColumns.from_records(results, fields=("score", "percentage"))
+    if not len(columns):
+        return stats
+    
+    scores, percentages = columns.score, columns.percentage
+    buckets = np.clip(percentages // (100 / HISTOGRAM_BUCKETS), 0, HISTOGRAM_BUCKETS - 1).astype(np.int64)
+    stats.update({
+        "count": len(columns),
+        "score_sum": scores.sum().item(),
+        "score_sum_sq": (scores * scores).sum().item(),
+        "highest_score": scores.max().item(),
+        "lowest_score": scores.min().item(),
+        "pass_count": int((percentages >= PASS_PERCENTAGE).sum()),
+        "histogram": {str(bucket): int(count) for bucket, count in enumerate(np.bincount(buckets, minlength=HISTOGRAM_BUCKETS)) if count}
+    })
+    return stats
+
+def _stream_exam_results(exam_id: str):
+    """Stream an exam's scores a page at a time"""
+    cursor = None
+    while True:
+        query = db.collection("results").where("exam_id", "==", exam_id) \
+                  .select(["score", "percentage"]).order_by("__name__").limit(BACKFILL_PAGE_SIZE)
+        if cursor:
+            query = query.start_after({"__name__": cursor})
+        page = list(query.stream())
+        for result in page:
+            yield Result.from_snapshot(result)
+        if len(page) < BACKFILL_PAGE_SIZE:
+            return
+        cursor = page[-1].id
+
+def rebuild_exam_stats(exam_id: str) -> Dict:
+    """Recompute an exam's aggregates from its results"""
+    try:
+        stats = compute_stats(exam_id, _stream_exam_results(exam_id))
+        _stats_ref(exam_id).set(stats)
+        return stats
+    except Exception as e:
+        raise Exception(f"Failed to rebuild exam stats: {str(e)}")
+
+def backfill_exam_stats(exam_ids: Optional[List[str]] = None) -> Dict[str, int]:
+    """Rebuild aggregates for the given exams, or for every exam"""
+    if not exam_ids:
+        exam_ids = [exam.id for exam in db.collection("exams").select([]).stream()]
+    return {exam_id: rebuild_exam_stats(exam_id)["count"] for exam_id in exam_ids}
+
+def get_exam_analytics(exam_id: str) -> Dict:
+    """Get summary statistics for an exam's results"""
+    try:
+        snapshot = _stats_ref(exam_id).get()
+        stats = snapshot.to_dict() if snapshot.exists else rebuild_exam_stats(exam_id)
+
+        count = stats.get("count", 0)
+        average = stats.get("score_sum", 0) / count if count else 0.0
+        variance = stats.get("score_sum_sq", 0) / count - average ** 2 if count else 0.0
+        histogram = stats.get("histogram", {})
+        return {
+            "count": count,
+            "average": average,
+            "stddev": math.sqrt(max(0.0, variance)),
+            "highest_score": stats.get("highest_score"),
+            "lowest_score": stats.get("lowest_score"),
+            "pass_rate": stats.get("pass_count", 0) / count * 100 if count else 0.0,
+            "histogram": [histogram.get(str(i), 0) for i in range(HISTOGRAM_BUCKETS)]
+        }
+    except Exception as e:
+        raise Exception(f"Failed to get exam analytics: {str(e)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Exam analytics maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill = subparsers.add_parser("backfill", help="Rebuild per-exam aggregates from existing results")
+    backfill.add_argument("exam_ids", nargs="*", help="Exams to rebuild (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        for exam_id, count in backfill_exam_stats(args.exam_ids).items():
+            print(f"{exam_id}: {count} results")
+
+if __name__ == "__main__":
+    main()
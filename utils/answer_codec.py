@@ -0,0 +1,213 @@
+from firebase_config import db
+from firebase_admin import firestore
+from google.api_core.exceptions import AlreadyExists, Conflict
+from utils.exam_snapshot import ExamSnapshot, get_exam_snapshot
+from cachetools import LRUCache
+from typing import Dict, List, Mapping, Optional
+import argparse
+import threading
+
+# Results store answers packed against the exam snapshot they were given
+# for, instead of {"q_<questionId>": "<full option text>"}:
+#
+#   answer_encoding    format version (ANSWER_ENCODING)
+#   questions_version  the exam's questions_version at submission
+#   choices            one character per question in snapshot order: the
+#                      chosen option's index in base 36, or "-" for none
+#   texts              free-text answers keyed by question position, plus
+#                      answers to questions that aren't in the manifest,
+#                      keyed by their answer key
+#
+# The question order and options of each version are kept once per exam in
+# answer_manifests/<exam>_v<version>, which never changes once written, so
+# old results decode correctly after questions are edited. Results without
+# answer_encoding still carry the plain "answers" map; decode_answers
+# accepts both, and `python -m utils.answer_codec migrate` converts them.
+ANSWER_ENCODING = 1
+MANIFESTS_COLLECTION = "answer_manifests"
+CHOICE_TYPES = ("Multiple Choice", "True/False")
+NO_CHOICE = "-"
+DIGITS = "0123456789abcdefghijklmnopqrstuvwxyz"
+MANIFEST_CACHE_SIZE = 256
+MIGRATION_PAGE_SIZE = 400
+
+_manifests = LRUCache(maxsize=MANIFEST_CACHE_SIZE)
+_manifests_lock = threading.Lock()
+
+def manifest_id(exam_id: str, version: int) -> str:
+    return f"{exam_id}_v{version}"
+
+def _options(question: Mapping) -> List[str]:
+    if question.get("type") == "True/False":
+        return ["True", "False"]
+    if question.get("type") in CHOICE_TYPES:
+        return list(question.get("options") or [])
+    return []
+
+def build_manifest(snapshot: ExamSnapshot) -> Dict:
+    """Question order and options for one version of an exam"""
+    return {
+        "exam_id": snapshot.exam_id,
+        "version": snapshot.version,
+        "questions": [{"id": q["id"], "options": _options(q)} for q in snapshot.questions]
+    }
+
+def ensure_manifest(snapshot: ExamSnapshot) -> Dict:
+    """Write the manifest for a snapshot's version unless it already exists"""
+    key = (snapshot.exam_id, snapshot.version)
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+    if manifest is not None:
+        return manifest
+    manifest = build_manifest(snapshot)
+    ref = db.collection(MANIFESTS_COLLECTION).document(manifest_id(*key))
+    try:
+        ref.create(manifest)
+    except (AlreadyExists, Conflict):
+        # Written by another worker first; answers must be packed against the stored one
+        manifest = ref.get().to_dict()
+    with _manifests_lock:
+        _manifests[key] = manifest
+    return manifest
+
+def get_manifest(exam_id: str, version: int) -> Optional[Dict]:
+    """The manifest an encoded result was packed against"""
+    key = (exam_id, version)
+    with _manifests_lock:
+        manifest = _manifests.get(key)
+    if manifest is None:
+        snapshot = db.collection(MANIFESTS_COLLECTION).document(manifest_id(exam_id, version)).get()
+        if not snapshot.exists:
+            return None
+        manifest = snapshot.to_dict()
+        with _manifests_lock:
+            _manifests[key] = manifest
+    return manifest
+
+def pack_answers(manifest: Mapping, answers: Mapping) -> Dict:
+    """Encode an answers map against a manifest"""
+    choices = []
+    texts = {}
+    known = set()
+    for position, question in enumerate(manifest["questions"]):
+        key = f"q_{question['id']}"
+        known.add(key)
+        value = answers.get(key)
+        options = question.get("options") or []
+        if value in options and options.index(value) < len(DIGITS):
+            choices.append(DIGITS[options.index(value)])
+            continue
+        choices.append(NO_CHOICE)
+        if value not in (None, ""):
+            texts[str(position)] = value
+    for key, value in answers.items():
+        if key not in known and value not in (None, ""):
+            texts[key] = value
+    return {
+        "answer_encoding": ANSWER_ENCODING,
+        "questions_version": manifest["version"],
+        "choices": "".join(choices),
+        "texts": texts
+    }
+
+def encode_answers(snapshot: ExamSnapshot, answers: Mapping) -> Dict:
+    """Result fields holding `answers` in the compact form (plain form if the manifest can't be saved)"""
+    try:
+        manifest = ensure_manifest(snapshot)
+    except Exception:
+        return {"answers": dict(answers)}
+    return pack_answers(manifest, answers)
+
+def unpack_answers(manifest: Mapping, result: Mapping) -> Dict[str, str]:
+    """Decode a result's compact answers against its manifest"""
+    answers = {}
+    questions = manifest["questions"]
+    for position, (question, choice) in enumerate(zip(questions, result.get("choices", ""))):
+        if choice != NO_CHOICE:
+            answers[f"q_{question['id']}"] = question["options"][DIGITS.index(choice)]
+    for key, value in (result.get("texts") or {}).items():
+        if key.isdigit():
+            answers[f"q_{questions[int(key)]['id']}"] = value
+        else:
+            answers[key] = value
+    return answers
+
+def decode_answers(result: Mapping) -> Dict[str, str]:
+    """A result's answers as {"q_<questionId>": answer}, whichever form it was stored in.
+
+    Empty answers aren't kept by the compact form, so they don't appear here;
+    grading treats a missing answer and an empty one the same.
+    """
+    encoding = result.get("answer_encoding")
+    if encoding is None:
+        return dict(result.get("answers") or {})
+    if encoding != ANSWER_ENCODING:
+        raise ValueError(f"Unknown answer encoding {encoding}")
+    manifest = get_manifest(result["exam_id"], result["questions_version"])
+    if manifest is None:
+        raise ValueError(f"Missing answer manifest {manifest_id(result['exam_id'], result['questions_version'])}")
+    return unpack_answers(manifest, result)
+
+def migrate_exam_results(exam_id: str, page_size: int = MIGRATION_PAGE_SIZE) -> Dict[str, int]:
+    """Re-encode an exam's plain-answer results against its current snapshot.
+
+    Results that are already encoded are skipped, so the migration can be
+    stopped and re-run. A result is only rewritten if its encoding decodes
+    back to the same non-empty answers.
+    """
+    try:
+        snapshot = get_exam_snapshot(exam_id)
+        if snapshot is None:
+            raise ValueError(f"Exam {exam_id} not found")
+        manifest = ensure_manifest(snapshot)
+
+        report = {"scanned": 0, "migrated": 0, "skipped": 0}
+        cursor = None
+        while True:
+            query = db.collection("results").where("exam_id", "==", exam_id).order_by("__name__").limit(page_size)
+            if cursor:
+                query = query.start_after({"__name__": cursor})
+            page = list(query.stream())
+            if not page:
+                return report
+
+            batch = db.batch()
+            writes = 0
+            for result in page:
+                data = result.to_dict()
+                report["scanned"] += 1
+                if "answer_encoding" in data:
+                    continue
+                answers = data.get("answers") or {}
+                packed = pack_answers(manifest, answers)
+                if unpack_answers(manifest, packed) != {k: v for k, v in answers.items() if v not in (None, "")}:
+                    report["skipped"] += 1
+                    continue
+                batch.update(result.reference, {**packed, "answers": firestore.DELETE_FIELD})
+                writes += 1
+            if writes:
+                batch.commit()
+            report["migrated"] += writes
+            cursor = page[-1].id
+    except Exception as e:
+        raise Exception(f"Failed to migrate results: {str(e)}")
+
+def migrate_results(exam_ids: Optional[List[str]] = None) -> Dict[str, Dict[str, int]]:
+    """Migrate the given exams' results, or every exam's"""
+    if not exam_ids:
+        exam_ids = [exam.id for exam in db.collection("exams").select([]).stream()]
+    return {exam_id: migrate_exam_results(exam_id) for exam_id in exam_ids}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compact answer encoding maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    migrate = subparsers.add_parser("migrate", help="Re-encode results stored with plain answers")
+    migrate.add_argument("exam_ids", nargs="*", help="Exams to migrate (default: all)")
+    args = parser.parse_args()
+
+    if args.command == "migrate":
+        for exam_id, report in migrate_results(args.exam_ids).items():
+            print(f"{exam_id}: {report['migrated']} migrated, {report['skipped']} skipped, {report['scanned']} scanned")
+
+if __name__ == "__main__":
+    main()
@@ -1,5 +1,6 @@
 import streamlit as st
 from firebase_config import db, auth
+from utils.search_index import search_fields
 import time
 from datetime import datetime
 import hashlib
@@ -44,7 +45,7 @@ def login_page():
             
             st.success("Login successful!")
             time.sleep(1)
-            st.experimental_rerun()
+            st.rerun()
             
         except auth.UserNotFoundError:
             st.error("User not found. Please check your email or sign up.")
@@ -62,6 +63,9 @@ def signup_page():
     role = st.selectbox("Role", ["student", "instructor", "admin"])
     
     if st.button("Sign Up"):
+        # Imported here so the auth pages render without loading the Firestore SDK
+        from utils.stats import increment_counters
+        
         if not all([email, password, confirm_password, full_name]):
             st.error("Please fill in all fields")
             return
@@ -91,12 +95,16 @@ def signup_page():
                 'created_at': datetime.now(),
                 'last_login': datetime.now()
             }
+            user_data.update(search_fields(user_data))
             
-            db.collection('users').document(user.uid).set(user_data)
+            batch = db.batch()
+            batch.set(db.collection('users').document(user.uid), user_data)
+            increment_counters(batch, users=1)
+            batch.commit()
             
             st.success("Account created successfully! Please login.")
             time.sleep(2)
-            st.experimental_rerun()
+            st.rerun()
             
         except auth.EmailAlreadyExistsError:
             st.error("Email already exists. Please login instead.")
@@ -123,7 +131,7 @@ def forgot_password_page():
             db.collection('password_resets').add({
                 'email': email,
                 'requested_at': datetime.now(),
-                'ip': st.experimental_get_query_params().get('ip', [''])[0]
+                'ip': st.query_params.get('ip', '')
             })
             
         except Exception as e:
@@ -137,4 +145,4 @@ def logout():
             'last_login': datetime.now()
         })
         del st.session_state.user
-    st.experimental_rerun()
+    st.rerun()
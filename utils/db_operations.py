@@ -1,6 +1,148 @@
-from firebase_config import db
+from firebase_config import db, transactional
+from firebase_admin import firestore
+from google.api_core.exceptions import Conflict
+from utils.stats import increment_counters
+from utils.analytics import record_submission
+from utils.ranking import record_score
+from utils.question_import import validate_questions
+from utils.search_index import local_index, matches, query_token, search_fields
+from utils.models import Exam, Question, Record, Result, User
+from utils.leaderboards import LEADERBOARD_SIZE, make_entry, read_leaderboard, write_leaderboard, add_to_leaderboards, discard_leaderboards
+from cachetools import TTLCache
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import Any, Callable, List, Dict, Iterable, Optional, Tuple
+import contextvars
+import hashlib
+import logging
+import threading
+import time
+import uuid
+
+logger = logging.getLogger(__name__)
+
+MAX_BATCH_READ = 100  # documents per multi-document read
+MAX_BATCH_WRITES = 500  # Firestore's limit per batched commit
+# A submission writes the result, user, counters, exam aggregate and two rank indexes
+MAX_SUBMISSIONS_PER_BATCH = MAX_BATCH_WRITES // 6
+USERS_PAGE_SIZE = 25
+MAX_CONCURRENT_READS = 8  # shared by every session in the worker
+READ_TIMEOUT = 10  # seconds per call, including time queued for a thread
+USER_SEARCH_LIMIT = 50
+
+# Process-wide read-through caches: entity -> (max entries, TTL in seconds).
+# Writes made through this module invalidate the affected entries directly;
+# the TTL bounds staleness for changes made by other workers.
+CACHE_SETTINGS = {
+    "exam": (1000, 60),
+    "exam_list": (2, 30),
+    "questions": (500, 300),
+    "user": (10000, 120),
+    "user_search": (1000, 30),
+    "student_name": (10000, 600)
+}
+
+_caches = {name: TTLCache(maxsize=size, ttl=ttl) for name, (size, ttl) in CACHE_SETTINGS.items()}
+_cache_stats = {name: {"hits": 0, "misses": 0} for name in CACHE_SETTINGS}
+_cache_lock = threading.RLock()
+
+def _copy(value):
+    """Hand out copies so callers can't mutate cached entries; records are read-only and shared"""
+    if isinstance(value, list):
+        return [item if isinstance(item, Record) else dict(item) for item in value]
+    if isinstance(value, dict):
+        return dict(value)
+    return value
+
+def _cache_lookup(cache_name: str, key):
+    """Return (found, value) from a cache, recording the hit or miss"""
+    with _cache_lock:
+        cache = _caches[cache_name]
+        if key in cache:
+            _cache_stats[cache_name]["hits"] += 1
+            return True, cache[key]
+        _cache_stats[cache_name]["misses"] += 1
+        return False, None
+
+def _cache_store(cache_name: str, key, value) -> None:
+    with _cache_lock:
+        _caches[cache_name][key] = value
+
+def _cached(cache_name: str, key, loader):
+    """Read through a cache, calling loader on a miss; missing documents aren't cached"""
+    found, value = _cache_lookup(cache_name, key)
+    if not found:
+        value = loader()
+        if value is not None:
+            _cache_store(cache_name, key, value)
+    return _copy(value)
+
+_read_pool = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_READS, thread_name_prefix="db-read")
+
+def run_concurrently(calls: Dict[str, Callable[[], Any]], timeout: float = READ_TIMEOUT,
+                     return_exceptions: bool = False) -> Dict[str, Any]:
+    """Run independent reads in parallel and return their results by name.
+    
+    Each call must finish within `timeout` seconds of being submitted. By
+    default the first failure is raised; with return_exceptions=True failed
+    calls map to their exception instead, so a page can still render the rest.
+    """
+    submitted_at = time.monotonic()
+    # Each call runs in a copy of the caller's context so metrics stay attributed to its page
+    futures = {name: _read_pool.submit(contextvars.copy_context().run, call) for name, call in calls.items()}
+    results = {}
+    for name, future in futures.items():
+        try:
+            remaining = max(0.0, timeout - (time.monotonic() - submitted_at))
+            try:
+                results[name] = future.result(timeout=remaining)
+            except FutureTimeoutError:
+                future.cancel()
+                raise TimeoutError(f"{name} did not finish within {timeout}s")
+        except Exception as e:
+            if not return_exceptions:
+                for pending in futures.values():
+                    pending.cancel()
+                raise
+            results[name] = e
+    return results
+
+def invalidate_exam(exam_id: str) -> None:
+    """Drop cached data for an exam after it or its questions change"""
+    with _cache_lock:
+        _caches["exam"].pop(exam_id, None)
+        _caches["questions"].pop(exam_id, None)
+        _caches["exam_list"].clear()
+
+def invalidate_user(user_id: str) -> None:
+    """Drop cached data for a user after their document changes"""
+    with _cache_lock:
+        _caches["user"].pop(user_id, None)
+        _caches["student_name"].pop(user_id, None)
+        _caches["user_search"].clear()
+    local_index.remove(user_id)
+
+def clear_caches() -> None:
+    """Empty every cache, e.g. after bulk changes made outside this module"""
+    with _cache_lock:
+        for cache in _caches.values():
+            cache.clear()
+
+def get_cache_stats() -> Dict[str, Dict]:
+    """Get hit/miss counts and occupancy for each cache"""
+    with _cache_lock:
+        stats = {}
+        for name, cache in _caches.items():
+            hits, misses = _cache_stats[name]["hits"], _cache_stats[name]["misses"]
+            stats[name] = {
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "size": len(cache),
+                "maxsize": cache.maxsize,
+                "ttl": cache.ttl
+            }
+        return stats
 
 def create_exam(exam_data: Dict) -> str:
     """Create a new exam in Firestore"""
@@ -12,135 +154,469 @@ def create_exam(exam_data: Dict) -> str:
             "total_questions": 0,
             "total_points": 0
         })
-        exam_ref.set(exam_data)
+        batch = db.batch()
+        batch.set(exam_ref, exam_data)
+        increment_counters(batch, exams=1, active_exams=1 if exam_data["is_active"] else 0)
+        batch.commit()
+        invalidate_exam(exam_ref.id)
         return exam_ref.id
     except Exception as e:
         raise Exception(f"Failed to create exam: {str(e)}")
 
-def get_exam(exam_id: str) -> Dict:
+def get_exam(exam_id: str) -> Optional[Exam]:
     """Fetch exam details"""
     try:
-        exam = db.collection("exams").document(exam_id).get()
-        if exam.exists:
-            return exam.to_dict()
-        return None
+        def load():
+            return Exam.from_snapshot(db.collection("exams").document(exam_id).get())
+        return _cached("exam", exam_id, load)
     except Exception as e:
         raise Exception(f"Failed to get exam: {str(e)}")
 
-def get_all_exams(active_only: bool = True) -> List[Dict]:
+def get_all_exams(active_only: bool = True) -> List[Exam]:
     """Get all exams, optionally filtered by active status"""
     try:
-        query = db.collection("exams")
-        if active_only:
-            query = query.where("is_active", "==", True)
-        exams = query.stream()
-        return [{"id": exam.id, **exam.to_dict()} for exam in exams]
+        def load():
+            query = db.collection("exams")
+            if active_only:
+                query = query.where("is_active", "==", True)
+            return [Exam.from_snapshot(exam) for exam in query.stream()]
+        return _cached("exam_list", active_only, load)
     except Exception as e:
         raise Exception(f"Failed to get exams: {str(e)}")
 
+@transactional
+def _update_exam_status(transaction, exam_ref, update_data: Dict) -> None:
+    """Update an exam and keep the active exam counter in step"""
+    was_active = exam_ref.get(transaction=transaction).get("is_active")
+    transaction.update(exam_ref, update_data)
+    delta = int(bool(update_data["is_active"])) - int(bool(was_active))
+    increment_counters(transaction, active_exams=delta)
+
 def update_exam(exam_id: str, update_data: Dict) -> None:
     """Update exam details"""
     try:
-        db.collection("exams").document(exam_id).update(update_data)
+        exam_ref = db.collection("exams").document(exam_id)
+        if "is_active" in update_data:
+            _update_exam_status(db.transaction(), exam_ref, update_data)
+        else:
+            exam_ref.update(update_data)
+        invalidate_exam(exam_id)
     except Exception as e:
         raise Exception(f"Failed to update exam: {str(e)}")
 
 def add_question_to_exam(exam_id: str, question_data: Dict) -> str:
     """Add a question to an exam"""
     try:
-        # Add question to subcollection
-        question_ref = db.collection("exams").document(exam_id).collection("questions").document()
+        # Add the question and bump the exam totals and version in one commit,
+        # so no snapshot can see the new question under the old version
+        exam_ref = db.collection("exams").document(exam_id)
+        question_ref = exam_ref.collection("questions").document()
         question_data.update({
             "created_at": datetime.now(),
             "question_number": question_data.get("question_number", 0)
         })
-        question_ref.set(question_data)
-        
-        # Update exam totals
-        exam_ref = db.collection("exams").document(exam_id)
-        exam_ref.update({
+        batch = db.batch()
+        batch.set(question_ref, question_data)
+        batch.update(exam_ref, {
             "total_questions": firestore.Increment(1),
-            "total_points": firestore.Increment(question_data.get("points", 1))
+            "total_points": firestore.Increment(question_data.get("points", 1)),
+            "questions_version": firestore.Increment(1)
         })
+        batch.commit()
+        invalidate_exam(exam_id)
         
         return question_ref.id
     except Exception as e:
         raise Exception(f"Failed to add question: {str(e)}")
 
-def get_exam_questions(exam_id: str) -> List[Dict]:
+def add_questions_bulk(exam_id: str, questions: List[Dict]) -> List[str]:
+    """Add many questions to an exam with chunked batched writes.
+    
+    Everything is validated before anything is written. The exam totals are
+    updated once, in the final chunk; if a chunk fails, the questions already
+    written are removed again.
+    """
+    problems = validate_questions(questions)
+    if problems:
+        raise ValueError("; ".join(f"Row {row}: {error}" for row, error in problems))
+    
+    try:
+        exam_ref = db.collection("exams").document(exam_id)
+        exam = exam_ref.get()
+        if not exam.exists:
+            raise ValueError(f"Exam {exam_id} not found")
+        next_number = (exam.get("total_questions") or 0) + 1
+        
+        refs = []
+        docs = []
+        for question in questions:
+            question_data = dict(question)
+            question_data["points"] = int(question_data.get("points", 1))
+            if question_data.get("question_number") is None:
+                question_data["question_number"] = next_number
+            question_data["question_number"] = int(question_data["question_number"])
+            next_number = max(next_number, question_data["question_number"] + 1)
+            question_data["created_at"] = datetime.now()
+            refs.append(exam_ref.collection("questions").document())
+            docs.append(question_data)
+        
+        # Leave room for the totals update in the last chunk
+        chunk_size = MAX_BATCH_WRITES - 1
+        committed = 0
+        try:
+            for start in range(0, len(refs), chunk_size):
+                batch = db.batch()
+                for ref, question_data in zip(refs[start:start + chunk_size], docs[start:start + chunk_size]):
+                    batch.set(ref, question_data)
+                if start + chunk_size >= len(refs):
+                    batch.update(exam_ref, {
+                        "total_questions": firestore.Increment(len(docs)),
+                        "total_points": firestore.Increment(sum(q["points"] for q in docs)),
+                        "questions_version": firestore.Increment(1)
+                    })
+                batch.commit()
+                committed = start + chunk_size
+        except Exception:
+            for start in range(0, min(committed, len(refs)), MAX_BATCH_WRITES):
+                batch = db.batch()
+                for ref in refs[start:start + MAX_BATCH_WRITES]:
+                    batch.delete(ref)
+                batch.commit()
+            raise
+        finally:
+            invalidate_exam(exam_id)
+        
+        return [ref.id for ref in refs]
+    except Exception as e:
+        raise Exception(f"Failed to import questions: {str(e)}")
+
+def get_exam_questions(exam_id: str, use_cache: bool = True) -> List[Question]:
     """Get all questions for an exam"""
     try:
-        questions = db.collection("exams").document(exam_id).collection("questions").order_by("question_number").stream()
-        return [{"id": q.id, **q.to_dict()} for q in questions]
+        def load():
+            questions = db.collection("exams").document(exam_id).collection("questions").order_by("question_number").stream()
+            return [Question.from_snapshot(q) for q in questions]
+        if not use_cache:
+            return load()
+        return _cached("questions", exam_id, load)
     except Exception as e:
         raise Exception(f"Failed to get questions: {str(e)}")
 
-def submit_exam_results(result_data: Dict) -> str:
-    """Save exam results"""
+def update_question(exam_id: str, question_id: str, update_data: Dict) -> None:
+    """Update a question, e.g. to fix its correct answer"""
     try:
-        result_ref = db.collection("results").document()
-        result_data.update({
-            "submitted_at": datetime.now(),
-            "percentage": (result_data["score"] / result_data["max_score"]) * 100
-        })
-        result_ref.set(result_data)
-        
-        # Update user's exam history
-        user_ref = db.collection("users").document(result_data["student_id"])
-        user_ref.update({
-            "exams_taken": firestore.Increment(1),
-            "total_points": firestore.Increment(result_data["score"]),
-            "last_exam_taken": datetime.now()
+        exam_ref = db.collection("exams").document(exam_id)
+        batch = db.batch()
+        batch.update(exam_ref.collection("questions").document(question_id), update_data)
+        batch.update(exam_ref, {"questions_version": firestore.Increment(1)})
+        batch.commit()
+        invalidate_exam(exam_id)
+    except Exception as e:
+        raise Exception(f"Failed to update question: {str(e)}")
+
+def delete_question(exam_id: str, question_id: str, points: int) -> None:
+    """Delete a question and take it out of the exam totals"""
+    try:
+        exam_ref = db.collection("exams").document(exam_id)
+        batch = db.batch()
+        batch.delete(exam_ref.collection("questions").document(question_id))
+        batch.update(exam_ref, {
+            "total_questions": firestore.Increment(-1),
+            "total_points": firestore.Increment(-points),
+            "questions_version": firestore.Increment(1)
         })
-        
-        return result_ref.id
+        batch.commit()
+        invalidate_exam(exam_id)
+    except Exception as e:
+        raise Exception(f"Failed to delete question: {str(e)}")
+
+def make_attempt_id(student_id: str, exam_id: str, attempt_nonce: str) -> str:
+    """Deterministic result id for one attempt at an exam"""
+    return hashlib.sha256(f"{student_id}:{exam_id}:{attempt_nonce}".encode()).hexdigest()[:32]
+
+def _queue_submission(batch, result_data: Dict, attempt_nonce: Optional[str]) -> str:
+    """Queue every write for one submission on a batch; returns the attempt id"""
+    attempt_id = make_attempt_id(result_data["student_id"], result_data["exam_id"], attempt_nonce or uuid.uuid4().hex)
+    result_data.setdefault("submitted_at", datetime.now())
+    result_data["percentage"] = (result_data["score"] / result_data["max_score"]) * 100 if result_data["max_score"] else 0.0
+    batch.create(db.collection("results").document(attempt_id), result_data)
+    
+    # Update user's exam history
+    user_ref = db.collection("users").document(result_data["student_id"])
+    batch.update(user_ref, {
+        "exams_taken": firestore.Increment(1),
+        "total_points": firestore.Increment(result_data["score"]),
+        "last_exam_taken": datetime.now(),
+        f"exams_taken_ids.{result_data['exam_id']}": True
+    })
+    increment_counters(batch, submissions=1)
+    record_submission(batch, result_data)
+    record_score(batch, result_data["exam_id"], result_data["percentage"])
+    return attempt_id
+
+def _after_submission(attempt_id: str, result_data: Dict) -> None:
+    """Follow-up work once a submission is committed"""
+    invalidate_user(result_data["student_id"])
+    
+    # Materialized leaderboards only do work when the score can place. The
+    # result is already committed, and a retry would stop at its Conflict, so
+    # a failure here must not fail the submission: drop the boards instead
+    # and let the next read rebuild them from the results.
+    try:
+        student_name = get_student_names([result_data["student_id"]]).get(result_data["student_id"])
+        add_to_leaderboards(make_entry(attempt_id, result_data, student_name))
+    except Exception:
+        logger.exception("Leaderboard update failed for %s; discarding the boards", attempt_id)
+        try:
+            discard_leaderboards(result_data["exam_id"])
+        except Exception:
+            logger.exception("Could not discard leaderboards for exam %s; this worker rebuilds them on read",
+                             result_data["exam_id"])
+
+def submit_exam_results(result_data: Dict, attempt_nonce: Optional[str] = None) -> str:
+    """Save exam results.
+    
+    The result, user history, counters and aggregates go out in one batched
+    commit. The result id is derived from the student, exam and attempt nonce
+    and written with a create precondition, so resubmitting the same attempt
+    (double click, rerun, retry) changes nothing and returns the same id.
+    """
+    try:
+        batch = db.batch()
+        attempt_id = _queue_submission(batch, result_data, attempt_nonce)
+        try:
+            batch.commit()
+        except Conflict:
+            # This attempt was already recorded; nothing in the batch was applied
+            return attempt_id
+        _after_submission(attempt_id, result_data)
+        return attempt_id
+    except Exception as e:
+        raise Exception(f"Failed to submit results: {str(e)}")
+
+def submit_exam_results_batch(submissions: List[Tuple[Dict, str]]) -> List[str]:
+    """Save many (result_data, attempt_nonce) submissions with as few commits as possible.
+    
+    If a commit is rejected because one of its attempts was already
+    recorded, that chunk is submitted one by one so the rest still go through.
+    """
+    try:
+        attempt_ids = []
+        for start in range(0, len(submissions), MAX_SUBMISSIONS_PER_BATCH):
+            chunk = [(dict(result_data), nonce) for result_data, nonce in submissions[start:start + MAX_SUBMISSIONS_PER_BATCH]]
+            batch = db.batch()
+            chunk_ids = [_queue_submission(batch, result_data, nonce) for result_data, nonce in chunk]
+            try:
+                batch.commit()
+            except Conflict:
+                attempt_ids += [submit_exam_results(dict(result_data), nonce) for result_data, nonce in submissions[start:start + MAX_SUBMISSIONS_PER_BATCH]]
+                continue
+            for attempt_id, (result_data, _) in zip(chunk_ids, chunk):
+                _after_submission(attempt_id, result_data)
+            attempt_ids += chunk_ids
+        return attempt_ids
     except Exception as e:
         raise Exception(f"Failed to submit results: {str(e)}")
 
-def get_student_results(student_id: str) -> List[Dict]:
+def get_recent_results(limit: int = 5, exam_id: Optional[str] = None) -> List[Result]:
+    """Get the most recently submitted results, optionally for one exam"""
+    try:
+        query = db.collection("results")
+        if exam_id:
+            query = query.where("exam_id", "==", exam_id)
+        results = query.order_by("submitted_at", direction=firestore.Query.DESCENDING).limit(limit).stream()
+        return [Result.from_snapshot(r) for r in results]
+    except Exception as e:
+        raise Exception(f"Failed to get recent results: {str(e)}")
+
+def get_student_results(student_id: str) -> List[Result]:
     """Get all results for a student"""
     try:
         results = db.collection("results").where("student_id", "==", student_id).order_by("submitted_at", direction=firestore.Query.DESCENDING).stream()
-        return [{"id": r.id, **r.to_dict()} for r in results]
+        return [Result.from_snapshot(r) for r in results]
     except Exception as e:
         raise Exception(f"Failed to get student results: {str(e)}")
 
-def get_leaderboard(exam_id: Optional[str] = None, limit: int = 10) -> List[Dict]:
-    """Get top results, optionally filtered by exam"""
+def get_best_percentage(student_id: str, exam_id: Optional[str] = None) -> Optional[float]:
+    """A student's best percentage on an exam (or across exams), from a single result read"""
     try:
-        query = db.collection("results")
+        query = db.collection("results").where("student_id", "==", student_id)
         if exam_id:
             query = query.where("exam_id", "==", exam_id)
-        results = query.order_by("percentage", direction=firestore.Query.DESCENDING).limit(limit).stream()
+        best = list(query.order_by("percentage", direction=firestore.Query.DESCENDING).select(["percentage"]).limit(1).stream())
+        return best[0].get("percentage") if best else None
+    except Exception as e:
+        raise Exception(f"Failed to get best result: {str(e)}")
+
+def _display_name(user_data: Dict) -> Optional[str]:
+    """Pick the name shown for a user on leaderboards"""
+    return user_data.get("full_name") or (user_data.get("email") or "").split("@")[0] or None
+
+def get_student_names(student_ids: Iterable[str]) -> Dict[str, str]:
+    """Resolve display names for many students using batched reads"""
+    try:
+        names = {}
+        missing = []
+        for student_id in dict.fromkeys(student_ids):
+            found, name = _cache_lookup("student_name", student_id)
+            if found:
+                names[student_id] = name
+            else:
+                missing.append(student_id)
         
-        # Enhance results with additional data
-        enhanced_results = []
-        for result in results:
-            result_data = result.to_dict()
-            # Get student name
-            student = db.collection("users").document(result_data["student_id"]).get()
-            if student.exists:
-                result_data["student_name"] = student.get("full_name") or student.get("email").split("@")[0]
-            enhanced_results.append({"id": result.id, **result_data})
+        # Fetch the remaining users a chunk at a time, only pulling the name fields
+        for start in range(0, len(missing), MAX_BATCH_READ):
+            refs = [db.collection("users").document(student_id) for student_id in missing[start:start + MAX_BATCH_READ]]
+            for student in db.get_all(refs, field_paths=["full_name", "email"]):
+                if not student.exists:
+                    continue
+                name = _display_name(student.to_dict())
+                if name:
+                    names[student.id] = name
+                    _cache_store("student_name", student.id, name)
         
-        return enhanced_results
+        return names
+    except Exception as e:
+        raise Exception(f"Failed to get student names: {str(e)}")
+
+def get_leaderboard(exam_id: Optional[str] = None, limit: int = 10) -> List[Dict]:
+    """Get top results, optionally filtered by exam"""
+    try:
+        if limit <= LEADERBOARD_SIZE:
+            # Served from the materialized leaderboard, built on first use
+            entries = read_leaderboard(exam_id)
+            if entries is None:
+                entries = rebuild_leaderboard(exam_id)
+            return entries[:limit]
+        return _query_leaderboard(exam_id, limit)
     except Exception as e:
         raise Exception(f"Failed to get leaderboard: {str(e)}")
 
-def get_all_users() -> List[Dict]:
+def rebuild_leaderboard(exam_id: Optional[str] = None) -> List[Dict]:
+    """Rebuild a materialized leaderboard from the results collection"""
+    try:
+        entries = [make_entry(r["id"], r) for r in _query_leaderboard(exam_id, LEADERBOARD_SIZE)]
+        write_leaderboard(exam_id, entries)
+        return entries
+    except Exception as e:
+        raise Exception(f"Failed to rebuild leaderboard: {str(e)}")
+
+def _query_leaderboard(exam_id: Optional[str], limit: int) -> List[Result]:
+    """Query top results directly, resolving student names"""
+    query = db.collection("results")
+    if exam_id:
+        query = query.where("exam_id", "==", exam_id)
+    results = [Result.from_snapshot(r) for r in query.order_by("percentage", direction=firestore.Query.DESCENDING).limit(limit).stream()]
+    
+    # Enhance results with student names resolved in bulk
+    names = get_student_names(r["student_id"] for r in results)
+    return [r.replace(student_name=names[r["student_id"]]) if r["student_id"] in names else r for r in results]
+
+def get_all_users() -> List[User]:
     """Get all users from Firestore"""
     try:
         users = db.collection("users").stream()
-        return [{"id": u.id, **u.to_dict()} for u in users]
+        return [User.from_snapshot(u) for u in users]
     except Exception as e:
         raise Exception(f"Failed to get users: {str(e)}")
 
-def get_user(user_id: str) -> Dict:
+def get_users_page(cursor: Optional[str] = None, page_size: int = USERS_PAGE_SIZE,
+                   role: Optional[str] = None) -> Tuple[List[User], Optional[str]]:
+    """Get one page of users ordered by email, optionally filtered by role.
+    
+    Returns the page and the cursor for the next page (None on the last page).
+    """
+    try:
+        query = db.collection("users")
+        if role:
+            query = query.where("role", "==", role)
+        query = query.order_by("email")
+        if cursor:
+            query = query.start_after({"email": cursor})
+        
+        # One extra document tells us whether another page exists
+        users = [User.from_snapshot(u) for u in query.limit(page_size + 1).stream()]
+        next_cursor = users[page_size - 1]["email"] if len(users) > page_size else None
+        local_index.add(users)
+        return users[:page_size], next_cursor
+    except Exception as e:
+        raise Exception(f"Failed to get users: {str(e)}")
+
+def search_users(term: str, role: Optional[str] = None, limit: int = USER_SEARCH_LIMIT) -> List[User]:
+    """Search users by name or email.
+    
+    Firestore answers prefix matches through the search_tokens index; the
+    worker's in-memory n-gram index adds substring matches among recently
+    loaded users.
+    """
+    try:
+        term = term.strip()
+        if not term:
+            return []
+        
+        token = query_token(term)
+        def load():
+            query = db.collection("users").where("search_tokens", "array_contains", token)
+            if role:
+                query = query.where("role", "==", role)
+            return [User.from_snapshot(u) for u in query.limit(limit).stream()]
+        server_users = _cached("user_search", (token, role, limit), load)
+        local_index.add(server_users)
+        
+        found = {u["id"]: u for u in server_users if matches(u, term)}
+        for user in local_index.search(term, limit):
+            found.setdefault(user["id"], user)
+        
+        users = [u for u in found.values() if not role or u.get("role") == role]
+        users.sort(key=lambda u: u.get("email") or "")
+        return users[:limit]
+    except Exception as e:
+        raise Exception(f"Failed to search users: {str(e)}")
+
+def get_user(user_id: str) -> Optional[User]:
     """Get a single user's data"""
     try:
-        user = db.collection("users").document(user_id).get()
-        if user.exists:
-            return user.to_dict()
-        return None
+        def load():
+            return User.from_snapshot(db.collection("users").document(user_id).get())
+        return _cached("user", user_id, load)
     except Exception as e:
         raise Exception(f"Failed to get user: {str(e)}")
+
+def get_taken_exam_ids(student_id: str) -> set:
+    """Get the ids of every exam a student has submitted"""
+    try:
+        user = get_user(student_id) or {}
+        exam_ids = set(user.get("exams_taken_ids", {}))
+        if user.get("exams_taken_indexed") or user.get("exams_taken", 0) <= len(exam_ids):
+            return exam_ids
+        
+        # Attempts from before the index existed: one projected query, then backfill the map
+        results = db.collection("results").where("student_id", "==", student_id).select(["exam_id"]).stream()
+        exam_ids |= {r.get("exam_id") for r in results}
+        db.collection("users").document(student_id).update({
+            "exams_taken_indexed": True,
+            **{f"exams_taken_ids.{exam_id}": True for exam_id in exam_ids}
+        })
+        invalidate_user(student_id)
+        return exam_ids
+    except Exception as e:
+        raise Exception(f"Failed to get taken exams: {str(e)}")
+
+def update_user_profile(user_id: str, update_data: Dict) -> None:
+    """Update a user's profile, keeping their search tokens current"""
+    try:
+        if "email" in update_data or "full_name" in update_data:
+            current = get_user(user_id) or {}
+            update_data = {**update_data, **search_fields({**current, **update_data})}
+        db.collection("users").document(user_id).update(update_data)
+        invalidate_user(user_id)
+    except Exception as e:
+        raise Exception(f"Failed to update profile: {str(e)}")
+
+def update_user_role(user_id: str, role: str) -> None:
+    """Change a user's role"""
+    try:
+        db.collection("users").document(user_id).update({"role": role})
+        invalidate_user(user_id)
+    except Exception as e:
+        raise Exception(f"Failed to update role: {str(e)}")
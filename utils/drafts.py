@@ -0,0 +1,187 @@
+from firebase_config import db
+from google.api_core.exceptions import Conflict, NotFound
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+import logging
+import threading
+import time
+import uuid
+
+# In-progress answers are kept in drafts/<student>_<exam>. Reruns only stage
+# the answers that differ from what was last saved; a background thread
+# coalesces a student's staged changes and writes them as a single
+# field-level update once they've been quiet for DEBOUNCE_SECONDS (or have
+# waited MAX_DELAY_SECONDS), so write volume follows edits, not reruns.
+# The draft also fixes the attempt's deadline when it is first opened, so
+# reconnecting or starting a new session can't reset the clock. A draft that
+# can't be deleted after submission is retried by the same thread, since a
+# leftover draft would bring back the submitted attempt's nonce and deadline.
+DRAFTS_COLLECTION = "drafts"
+DEBOUNCE_SECONDS = 2.0
+MAX_DELAY_SECONDS = 10.0
+FLUSH_POLL_SECONDS = 0.5
+
+_saved: Dict[str, Dict] = {}     # draft id -> answers as last written
+_pending: Dict[str, Dict] = {}   # draft id -> {"answers": {...}, "first": t, "last": t}
+_discards: Dict[str, Tuple[str, str]] = {}  # draft id -> (student, exam) still to be deleted
+_lock = threading.Lock()
+_flusher: Optional[threading.Thread] = None
+_metrics = {"saved": 0, "save_failures": 0, "discard_failures": 0, "last_error": None}
+
+logger = logging.getLogger(__name__)
+
+def draft_id(student_id: str, exam_id: str) -> str:
+    return f"{student_id}_{exam_id}"
+
+def _draft_ref(student_id: str, exam_id: str):
+    return db.collection(DRAFTS_COLLECTION).document(draft_id(student_id, exam_id))
+
+def open_draft(student_id: str, exam_id: str, duration_seconds: float) -> Dict:
+    """Resume a student's in-progress attempt at an exam, or start a new one"""
+    try:
+        ref = _draft_ref(student_id, exam_id)
+        key = draft_id(student_id, exam_id)
+        with _lock:
+            submitted = key in _discards
+        if submitted:
+            # Left over from a submitted attempt; never resume it
+            ref.delete()
+            with _lock:
+                _discards.pop(key, None)
+        draft = ref.get()
+        if not draft.exists:
+            started_at = time.time()
+            data = {
+                "student_id": student_id,
+                "exam_id": exam_id,
+                "attempt_nonce": uuid.uuid4().hex,
+                "started_at": started_at,
+                "deadline": started_at + duration_seconds,
+                "answers": {}
+            }
+            try:
+                ref.create(data)
+            except Conflict:
+                # Another session started it first; use theirs
+                data = ref.get().to_dict()
+        else:
+            data = draft.to_dict()
+        # Drafts opened before deadlines were stored run from their start time
+        data.setdefault("deadline", data["started_at"] + duration_seconds)
+
+        with _lock:
+            _saved[key] = dict(data.get("answers", {}))
+            _pending.pop(key, None)
+        return data
+    except Exception as e:
+        raise Exception(f"Failed to open draft: {str(e)}")
+
+def stage_answers(student_id: str, exam_id: str, answers: Dict) -> int:
+    """Stage whatever changed since the last save; returns the number of changed answers"""
+    key = draft_id(student_id, exam_id)
+    now = time.monotonic()
+    with _lock:
+        saved = _saved.setdefault(key, {})
+        entry = _pending.get(key)
+        current = {**saved, **(entry["answers"] if entry else {})}
+        changes = {k: v for k, v in answers.items() if current.get(k, None) != v}
+        if not changes:
+            return 0
+        if entry is None:
+            entry = _pending[key] = {"student_id": student_id, "exam_id": exam_id, "answers": {}, "first": now}
+        entry["answers"].update(changes)
+        entry["last"] = now
+    _start_flusher()
+    return len(changes)
+
+def _write(entry: Dict) -> None:
+    updates = {f"answers.{k}": v for k, v in entry["answers"].items()}
+    updates["updated_at"] = datetime.now()
+    _draft_ref(entry["student_id"], entry["exam_id"]).update(updates)
+
+def flush_drafts(force: bool = False) -> int:
+    """Write staged changes that are due (or all of them); returns the number of drafts written"""
+    now = time.monotonic()
+    with _lock:
+        due = {key: entry for key, entry in _pending.items()
+               if force or now - entry["last"] >= DEBOUNCE_SECONDS or now - entry["first"] >= MAX_DELAY_SECONDS}
+        for key in due:
+            del _pending[key]
+
+    written = 0
+    for key, entry in due.items():
+        try:
+            _write(entry)
+            with _lock:
+                _saved.setdefault(key, {}).update(entry["answers"])
+                _metrics["saved"] += 1
+            written += 1
+        except NotFound:
+            pass  # discarded (submitted) while the write was in flight
+        except Exception as e:
+            logger.warning("Saving draft %s failed, will retry: %s", key, e)
+            # Put the changes back (newer staged values win) and retry on a later pass
+            with _lock:
+                _metrics["save_failures"] += 1
+                _metrics["last_error"] = str(e)
+                current = _pending.get(key)
+                if current is None:
+                    _pending[key] = entry
+                else:
+                    current["answers"] = {**entry["answers"], **current["answers"]}
+                    current["first"] = min(current["first"], entry["first"])
+
+    with _lock:
+        discards = dict(_discards)
+    for key, (student_id, exam_id) in discards.items():
+        try:
+            _draft_ref(student_id, exam_id).delete()
+            with _lock:
+                _discards.pop(key, None)
+        except Exception as e:
+            logger.warning("Discarding draft %s failed, will retry: %s", key, e)
+            with _lock:
+                _metrics["discard_failures"] += 1
+                _metrics["last_error"] = str(e)
+    return written
+
+def _flush_forever() -> None:
+    while True:
+        time.sleep(FLUSH_POLL_SECONDS)
+        flush_drafts()
+
+def _start_flusher() -> None:
+    global _flusher
+    with _lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_forever, name="draft-autosave", daemon=True)
+            _flusher.start()
+
+def discard_draft(student_id: str, exam_id: str) -> None:
+    """Drop a draft once its attempt has been submitted"""
+    try:
+        key = draft_id(student_id, exam_id)
+        with _lock:
+            _pending.pop(key, None)
+            _saved.pop(key, None)
+        try:
+            _draft_ref(student_id, exam_id).delete()
+        except Exception as e:
+            # Keep trying in the background until the draft is gone
+            with _lock:
+                _discards[key] = (student_id, exam_id)
+                _metrics["discard_failures"] += 1
+                _metrics["last_error"] = str(e)
+            _start_flusher()
+            raise
+        with _lock:
+            _discards.pop(key, None)
+    except Exception as e:
+        raise Exception(f"Failed to discard draft: {str(e)}")
+
+def get_draft_metrics() -> Dict:
+    """Autosave counters and backlog for this worker"""
+    with _lock:
+        metrics = dict(_metrics)
+        metrics.update({"pending_saves": len(_pending), "pending_discards": len(_discards)})
+    return metrics
@@ -0,0 +1,106 @@
+from firebase_config import db
+from utils.db_operations import get_exam, get_exam_questions, invalidate_exam
+from utils.models import Question
+from cachetools import LRUCache
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Tuple
+import threading
+
+# Snapshots are keyed by (exam_id, questions_version). Every question write
+# bumps the version in the same commit, so a changed exam simply resolves to
+# a new key and the old snapshot ages out of the LRU. The version a snapshot
+# is stored under is read fresh around the question load, never taken from
+# the exam cache, so questions can't end up under another version's key.
+SNAPSHOT_CACHE_SIZE = 64
+MAX_LOAD_ATTEMPTS = 3
+
+@dataclass(frozen=True)
+class ExamSnapshot:
+    """Read-only view of an exam's questions shared by every session"""
+    exam_id: str
+    version: int
+    questions: Tuple[Mapping, ...]
+    answer_key: Mapping[str, str]
+    points: Mapping[str, int]
+    max_score: int
+
+_snapshots = LRUCache(maxsize=SNAPSHOT_CACHE_SIZE)
+_snapshots_lock = threading.Lock()
+_load_locks: Dict[Tuple[str, int], threading.Lock] = {}
+
+def answer_key_for(question: Mapping) -> str:
+    """Session/answers key used for a question"""
+    return f"q_{question['id']}"
+
+def _freeze_question(question: Mapping) -> Mapping:
+    if isinstance(question, Question):
+        return question  # already read-only, with its options as a tuple
+    frozen = dict(question)
+    if isinstance(frozen.get("options"), list):
+        frozen["options"] = tuple(frozen["options"])
+    return MappingProxyType(frozen)
+
+def build_snapshot(exam_id: str, version: int, questions) -> ExamSnapshot:
+    """Freeze a question list and precompute its answer key and max score"""
+    ordered = sorted(questions, key=lambda q: q.get("question_number", 0))
+    frozen = tuple(_freeze_question(q) for q in ordered)
+    return ExamSnapshot(
+        exam_id=exam_id,
+        version=version,
+        questions=frozen,
+        answer_key=MappingProxyType({answer_key_for(q): q.get("correct_answer") for q in frozen}),
+        points=MappingProxyType({answer_key_for(q): q.get("points", 1) for q in frozen}),
+        max_score=sum(q.get("points", 1) for q in frozen)
+    )
+
+def _questions_version(exam_id: str) -> Optional[int]:
+    exam = db.collection("exams").document(exam_id).get(["questions_version"])
+    if not exam.exists:
+        return None
+    return (exam.to_dict() or {}).get("questions_version", 0)
+
+def load_snapshot(exam_id: str) -> Optional[ExamSnapshot]:
+    """Read an exam's questions and the version they belong to, uncached"""
+    for _ in range(MAX_LOAD_ATTEMPTS):
+        version = _questions_version(exam_id)
+        if version is None:
+            return None
+        questions = get_exam_questions(exam_id, use_cache=False)
+        # Unchanged across the load, so no question write landed in between
+        if _questions_version(exam_id) == version:
+            return build_snapshot(exam_id, version, questions)
+    raise Exception(f"Questions of exam {exam_id} kept changing while loading")
+
+def get_exam_snapshot(exam_id: str) -> Optional[ExamSnapshot]:
+    """Get the current snapshot of an exam, loading its questions at most once per version"""
+    try:
+        exam = get_exam(exam_id)
+        if exam is None:
+            return None
+        key = (exam_id, exam.get("questions_version", 0))
+
+        with _snapshots_lock:
+            snapshot = _snapshots.get(key)
+            if snapshot is not None:
+                return snapshot
+            load_lock = _load_locks.setdefault(key, threading.Lock())
+
+        # Only one session per process loads a given version; the rest wait for it
+        with load_lock:
+            with _snapshots_lock:
+                snapshot = _snapshots.get(key)
+            if snapshot is None:
+                snapshot = load_snapshot(exam_id)
+                if snapshot is not None:
+                    with _snapshots_lock:
+                        _snapshots[(exam_id, snapshot.version)] = snapshot
+                    if snapshot.version != key[1]:
+                        # The cached exam is behind (e.g. changed by another worker)
+                        invalidate_exam(exam_id)
+
+        with _snapshots_lock:
+            _load_locks.pop(key, None)
+        return snapshot
+    except Exception as e:
+        raise Exception(f"Failed to load exam snapshot: {str(e)}")
@@ -0,0 +1,63 @@
+import streamlit as st
+import streamlit.components.v1 as components
+import time
+
+# The deadline is stored with the attempt's draft (see utils/drafts.py), so
+# a reconnect or a new session resumes the same countdown. The countdown is
+# drawn by a small browser-side component that ticks on its own without
+# rerunning the script. A fragment checks the deadline every few seconds
+# and reruns the app once it has passed, so the attempt gets submitted even
+# if the student does nothing. The browser display is only a convenience:
+# take_exam always checks the deadline against the server's clock.
+WARNING_SECONDS = 300  # the countdown turns red with 5 minutes left
+DEADLINE_CHECK_SECONDS = 5
+
+_COUNTDOWN_HTML = """
+<div style="font-family: sans-serif;">
+  <div style="height: 6px; background: #e6e6e6; border-radius: 3px; overflow: hidden;">
+    <div id="bar" style="height: 100%; width: 0; background: #ff4b4b;"></div>
+  </div>
+  <p id="clock" style="margin: 8px 0 0 0;"></p>
+</div>
+<script>
+  const deadline = __DEADLINE__ * 1000, duration = __DURATION__ * 1000, warning = __WARNING__ * 1000;
+  function tick() {
+    const left = Math.max(0, deadline - Date.now());
+    const minutes = String(Math.floor(left / 60000)).padStart(2, "0");
+    const seconds = String(Math.floor(left / 1000) % 60).padStart(2, "0");
+    const clock = document.getElementById("clock");
+    document.getElementById("bar").style.width = Math.min(100, 100 * (1 - left / duration)) + "%";
+    if (left === 0) {
+      clock.textContent = "Time's up! Your exam is being submitted.";
+    } else {
+      clock.textContent = "Time remaining: " + minutes + ":" + seconds + (left <= warning ? " - Hurry up!" : "");
+    }
+    clock.style.color = left <= warning ? "#ff4b4b" : "inherit";
+    clock.style.fontWeight = left <= warning ? "bold" : "normal";
+    if (left > 0) setTimeout(tick, 250);
+  }
+  tick();
+</script>
+"""
+
+def remaining_seconds(deadline: float) -> float:
+    """Seconds left before the deadline, by the server's clock"""
+    return max(0.0, deadline - time.time())
+
+def render_countdown(deadline: float, duration_seconds: float) -> None:
+    """Draw a countdown that updates in the browser without rerunning the script"""
+    # The markup only depends on the attempt, so reruns leave the running component alone
+    html = (_COUNTDOWN_HTML
+            .replace("__DEADLINE__", repr(float(deadline)))
+            .replace("__DURATION__", repr(float(max(duration_seconds, 1))))
+            .replace("__WARNING__", str(WARNING_SECONDS)))
+    components.html(html, height=50)
+
+def watch_deadline(deadline: float) -> None:
+    """Rerun the app when the deadline passes; between checks only this fragment runs"""
+    @st.fragment(run_every=DEADLINE_CHECK_SECONDS)
+    def check_deadline():
+        if time.time() >= deadline:
+            st.rerun()
+
+    check_deadline()
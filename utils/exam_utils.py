@@ -1,71 +1,146 @@
 import streamlit as st
 from utils.db_operations import *
-from firebase_config import db
-from datetime import datetime, timedelta
+from utils.stats import get_dashboard_stats
+from utils.exam_snapshot import get_exam_snapshot, answer_key_for
+from utils.grading import compile_answer_key, grade_submission
+from utils.answer_codec import encode_answers
+from utils.regrade import regrade_exam
+from utils.analytics import get_exam_analytics, bucket_labels
+from utils.ranking import get_rank
+from utils.outbox import enqueue_submission, get_outbox_metrics, pending_exam_ids
+from utils.drafts import open_draft, stage_answers, discard_draft, get_draft_metrics
+from utils.exam_timer import remaining_seconds, render_countdown, watch_deadline
+from utils.question_import import CSV_TEMPLATE, MAX_OPTIONS, parse_question_file, validate_questions
+from utils.metrics import get_operation_metrics, get_page_metrics, get_session_metrics, prometheus_text, reset_metrics
+from datetime import datetime
+import logging
 import time
-from typing import Dict, List
+from typing import Dict
+
+logger = logging.getLogger(__name__)
 
 # Constants
 DEFAULT_EXAM_DURATION = 30  # minutes
-MAX_QUESTIONS = 50
-MAX_OPTIONS = 5
+MAX_QUESTIONS = 500
+QUESTIONS_PER_SECTION = 10  # take_exam renders one section of questions at a time
 
 def admin_dashboard():
     """Admin dashboard with enhanced analytics"""
     st.title("Admin Dashboard")
     
+    # Independent reads go out together
+    data = run_concurrently({
+        "stats": get_dashboard_stats,
+        "recent_results": lambda: get_recent_results(limit=5)
+    }, return_exceptions=True)
+    
     # Real-time statistics in columns
     col1, col2, col3, col4 = st.columns(4)
     
-    users_count = len(get_all_users())
-    exams_count = len(get_all_exams(active_only=False))
-    active_exams = len(get_all_exams(active_only=True))
-    results_count = len(get_leaderboard(limit=1000))  # Get all results
+    if isinstance(data['stats'], Exception):
+        st.error(f"Could not load statistics: {str(data['stats'])}")
+        stats = {'users': 0, 'exams': 0, 'active_exams': 0, 'submissions': 0}
+    else:
+        stats = data['stats']
     
-    col1.metric("Total Users", users_count)
-    col2.metric("Total Exams", exams_count)
-    col3.metric("Active Exams", active_exams)
-    col4.metric("Exam Submissions", results_count)
+    col1.metric("Total Users", stats['users'])
+    col2.metric("Total Exams", stats['exams'])
+    col3.metric("Active Exams", stats['active_exams'])
+    col4.metric("Exam Submissions", stats['submissions'])
     
     # Recent activity section
     st.subheader("Recent Activity")
     
     # Last 5 exam submissions
     try:
-        recent_results = db.collection("results") \
-                          .order_by("submitted_at", direction=firestore.Query.DESCENDING) \
-                          .limit(5) \
-                          .stream()
+        if isinstance(data['recent_results'], Exception):
+            raise data['recent_results']
+        recent_results = data['recent_results']
+        
+        # Look up each distinct student and exam in parallel
+        lookups = run_concurrently({
+            **{f"user:{r['student_id']}": (lambda uid=r['student_id']: get_user(uid)) for r in recent_results},
+            **{f"exam:{r['exam_id']}": (lambda eid=r['exam_id']: get_exam(eid)) for r in recent_results}
+        })
         
         st.write("**Latest Exam Submissions:**")
-        for result in recent_results:
-            result_data = result.to_dict()
-            student = get_user(result_data['student_id'])
-            exam = get_exam(result_data['exam_id'])
+        for result_data in recent_results:
+            student = lookups[f"user:{result_data['student_id']}"]
+            exam = lookups[f"exam:{result_data['exam_id']}"]
             
             if student and exam:
                 st.write(f"- {student.get('full_name', student['email'])} scored {result_data['score']}/{result_data['max_score']} on {exam['name']} ({result_data['submitted_at'].strftime('%Y-%m-%d %H:%M')})")
     except Exception as e:
         st.error(f"Could not load recent activity: {str(e)}")
+    
+    # Submissions accepted by this worker but not yet written to Firestore
+    with st.expander("Submission Queue"):
+        queue = get_outbox_metrics()
+        q1, q2, q3 = st.columns(3)
+        q1.metric("Queued", queue['depth'])
+        q2.metric("Delivery Lag", f"{queue['lag_seconds']:.1f}s")
+        q3.metric("Retrying", queue['retrying'])
+        if queue['last_error']:
+            st.caption(f"Last error: {queue['last_error']}")
+    
+    # Draft autosaves and post-submission draft cleanup on this worker
+    with st.expander("Answer Autosave"):
+        drafts = get_draft_metrics()
+        d1, d2, d3 = st.columns(3)
+        d1.metric("Waiting to Save", drafts['pending_saves'])
+        d2.metric("Failed Saves", drafts['save_failures'])
+        d3.metric("Failed Draft Deletes", drafts['discard_failures'], help=f"{drafts['pending_discards']} still being retried")
+        if drafts['last_error']:
+            st.caption(f"Last error: {drafts['last_error']}")
+    
+    # Cache effectiveness, used to size the read-through caches
+    with st.expander("Cache Statistics"):
+        st.dataframe(
+            [{"Cache": name, **stats} for name, stats in get_cache_stats().items()],
+            use_container_width=True,
+            hide_index=True
+        )
 
 def manage_users():
     """Enhanced user management with search and filtering"""
     st.title("User Management")
     
     # Search and filter options
-    col1, col2 = st.columns(2)
-    search_term = col1.text_input("Search by name or email")
+    col1, col2, col3 = st.columns([2, 2, 1])
+    search_term = col1.text_input(
+        "Search by name or email",
+        help="Finds users whose name, a word of their name, their email, or a part of their email "
+             "(before or after the @, or between dots) starts with the search. Other matches inside "
+             "a name or email are only found among users already listed on this server."
+    )
     role_filter = col2.selectbox("Filter by role", ["All", "student", "instructor", "admin"])
+    page_size = col3.selectbox("Page size", [25, 50, 100])
     
-    # Get all users and apply filters
-    users = get_all_users()
+    role = None if role_filter == "All" else role_filter
     
     if search_term:
-        users = [u for u in users if search_term.lower() in u.get('email', '').lower() or 
-                search_term.lower() in u.get('full_name', '').lower()]
-    
-    if role_filter != "All":
-        users = [u for u in users if u.get('role') == role_filter]
+        # Indexed search returns the best matches instead of a page
+        users = search_users(search_term, role=role)
+    else:
+        # Keyset pagination: keep the cursor of every page visited so far,
+        # starting over whenever the filter or page size changes
+        page_key = (role_filter, page_size)
+        if st.session_state.get('users_page_key') != page_key:
+            st.session_state.users_page_key = page_key
+            st.session_state.users_page_cursors = [None]
+        cursors = st.session_state.users_page_cursors
+        
+        users, next_cursor = get_users_page(cursors[-1], page_size, role)
+        
+        # Page navigation
+        nav1, nav2, nav3 = st.columns([1, 2, 1])
+        if nav1.button("Previous", disabled=len(cursors) == 1):
+            cursors.pop()
+            st.rerun()
+        nav2.caption(f"Page {len(cursors)}")
+        if nav3.button("Next", disabled=next_cursor is None):
+            cursors.append(next_cursor)
+            st.rerun()
     
     # Display user table with pagination
     if not users:
@@ -101,10 +176,10 @@ def manage_users():
         
         if st.button("Update Role") and new_role != current_role:
             try:
-                db.collection('users').document(selected_user['uid']).update({'role': new_role})
+                update_user_role(selected_user['uid'], new_role)
                 st.success(f"Role updated to {new_role}")
                 time.sleep(1)
-                st.experimental_rerun()
+                st.rerun()
             except Exception as e:
                 st.error(f"Failed to update role: {str(e)}")
 
@@ -149,7 +224,7 @@ def manage_exams():
                         st.success(f"Exam created successfully! ID: {exam_id}")
                         time.sleep(1)
                         st.session_state.current_exam = exam_id
-                        st.experimental_rerun()
+                        st.rerun()
                     except Exception as e:
                         st.error(f"Failed to create exam: {str(e)}")
     
@@ -189,13 +264,13 @@ def manage_exams():
                                 update_exam(exam['id'], {'is_active': new_status})
                                 st.success(f"Exam {'activated' if new_status else 'deactivated'} successfully!")
                                 time.sleep(1)
-                                st.experimental_rerun()
+                                st.rerun()
                             except Exception as e:
                                 st.error(f"Failed to update exam status: {str(e)}")
                         
                         if st.button("Manage Questions", key=f"manage_{exam['id']}"):
                             st.session_state.manage_exam_id = exam['id']
-                            st.experimental_rerun()
+                            st.rerun()
     
     with tab3:
         st.subheader("Exam Analytics")
@@ -208,25 +283,24 @@ def manage_exams():
             
             if selected_exam:
                 exam = next(e for e in exams if e['name'] == selected_exam)
-                results = get_leaderboard(exam['id'], limit=1000)  # Get all results for this exam
+                analytics = get_exam_analytics(exam['id'])
                 
-                if not results:
+                if not analytics['count']:
                     st.info("No results available for this exam")
                 else:
                     # Basic statistics
-                    avg_score = sum(r['score'] for r in results) / len(results)
                     max_score = exam.get('total_points', 100)
-                    pass_rate = sum(1 for r in results if r['score'] >= max_score * 0.6) / len(results) * 100
                     
                     col1, col2, col3 = st.columns(3)
-                    col1.metric("Total Attempts", len(results))
-                    col2.metric("Average Score", f"{avg_score:.1f}/{max_score}")
-                    col3.metric("Pass Rate", f"{pass_rate:.1f}%")
+                    col1.metric("Total Attempts", analytics['count'])
+                    col2.metric("Average Score", f"{analytics['average']:.1f}/{max_score}")
+                    col3.metric("Pass Rate", f"{analytics['pass_rate']:.1f}%")
+                    st.caption(f"Highest: {analytics['highest_score']} | Lowest: {analytics['lowest_score']} | Std Dev: {analytics['stddev']:.1f}")
                     
                     # Score distribution histogram
                     st.subheader("Score Distribution")
-                    scores = [r['score'] for r in results]
-                    st.bar_chart(scores)
+                    import pandas as pd
+                    st.bar_chart(pd.DataFrame({"Attempts": analytics['histogram']}, index=bucket_labels()))
 
 def manage_questions(exam_id=None):
     """Enhanced question management with bulk operations"""
@@ -243,7 +317,7 @@ def manage_questions(exam_id=None):
     
     st.title(f"Manage Questions: {exam['name']}")
     
-    tab1, tab2 = st.tabs(["Add Questions", "View/Edit Questions"])
+    tab1, tab2, tab3 = st.tabs(["Add Questions", "View/Edit Questions", "Bulk Import"])
     
     with tab1:
         st.subheader("Add New Question")
@@ -293,7 +367,7 @@ def manage_questions(exam_id=None):
                         add_question_to_exam(exam_id, question_data)
                         st.success("Question added successfully!")
                         time.sleep(1)
-                        st.experimental_rerun()
+                        st.rerun()
                     except Exception as e:
                         st.error(f"Failed to add question: {str(e)}")
     
@@ -307,6 +381,16 @@ def manage_questions(exam_id=None):
             # Sort by question number
             questions.sort(key=lambda x: x.get('question_number', 0))
             
+            # Re-score submitted attempts after fixing an answer key
+            if st.button("Regrade Existing Results", help="Re-score all submitted attempts against the current answer key"):
+                with st.spinner("Regrading results..."):
+                    try:
+                        report = regrade_exam(exam_id)
+                        st.success(f"Regraded {report['processed']} results ({report['changed']} changed, "
+                                   f"{report['results_per_second']:.0f} results/sec)")
+                    except Exception as e:
+                        st.error(f"Failed to regrade results: {str(e)}")
+            
             for i, question in enumerate(questions, 1):
                 with st.expander(f"Q{question.get('question_number', i)}: {question['text']} ({question['points']} pts)"):
                     col1, col2 = st.columns([3, 1])
@@ -320,30 +404,80 @@ def manage_questions(exam_id=None):
                                 st.write(f"- {opt}")
                         
                         st.write(f"**Correct Answer:** {question['correct_answer']}")
+                        
+                        # Fix a wrong answer key; existing results need a regrade afterwards
+                        if question['type'] in ["Multiple Choice", "True/False"]:
+                            fixed_answer = st.selectbox(
+                                "Fix Correct Answer",
+                                question['options'],
+                                index=question['options'].index(question['correct_answer']) if question['correct_answer'] in question['options'] else 0,
+                                key=f"fix_{question['id']}"
+                            )
+                        else:
+                            fixed_answer = st.text_input("Fix Correct Answer", value=question['correct_answer'], key=f"fix_{question['id']}")
+                        
+                        if fixed_answer != question['correct_answer'] and st.button("Save Answer", key=f"save_{question['id']}"):
+                            try:
+                                update_question(exam_id, question['id'], {'correct_answer': fixed_answer})
+                                st.success("Answer updated. Regrade existing results to apply it.")
+                                time.sleep(1)
+                                st.rerun()
+                            except Exception as e:
+                                st.error(f"Failed to update answer: {str(e)}")
                     
                     with col2:
                         if st.button("Delete", key=f"del_{question['id']}"):
                             try:
-                                db.collection('exams').document(exam_id).collection('questions').document(question['id']).delete()
-                                
-                                # Update exam totals
-                                db.collection('exams').document(exam_id).update({
-                                    'total_questions': firestore.Increment(-1),
-                                    'total_points': firestore.Increment(-question['points'])
-                                })
-                                
+                                delete_question(exam_id, question['id'], question['points'])
                                 st.success("Question deleted successfully!")
                                 time.sleep(1)
-                                st.experimental_rerun()
+                                st.rerun()
                             except Exception as e:
                                 st.error(f"Failed to delete question: {str(e)}")
+    
+    with tab3:
+        st.subheader("Import Questions from CSV or JSON")
+        st.caption("CSV columns: text, type, points, question_number, options (separated by '|'), correct_answer. "
+                   "JSON: a list of objects with the same keys, options as a list.")
+        st.download_button("Download CSV template", CSV_TEMPLATE, file_name="questions_template.csv", mime="text/csv")
+        
+        uploaded = st.file_uploader("Question bank", type=["csv", "json"], key="bulk_questions")
+        if uploaded is not None:
+            try:
+                questions = parse_question_file(uploaded.name, uploaded.getvalue())
+            except Exception as e:
+                st.error(f"Could not read file: {str(e)}")
+                questions = []
+            
+            problems = validate_questions(questions)
+            if problems:
+                st.error(f"{len(problems)} problem(s) found, nothing will be imported:")
+                for row, error in problems[:20]:
+                    st.write(f"- Row {row}: {error}")
+            elif questions:
+                st.success(f"{len(questions)} questions ready to import ({sum(int(q['points']) for q in questions)} points)")
+                if st.button("Import Questions"):
+                    try:
+                        add_questions_bulk(exam_id, questions)
+                        st.success(f"Imported {len(questions)} questions!")
+                        time.sleep(1)
+                        st.rerun()
+                    except Exception as e:
+                        st.error(f"Failed to import questions: {str(e)}")
 
 def student_dashboard():
     """Enhanced student dashboard with progress tracking"""
     st.title("Student Dashboard")
     
+    # Profile and exam list are independent reads (worker threads can't touch session state)
+    uid = st.session_state.user['uid']
+    data = run_concurrently({
+        "user": lambda: get_user(uid),
+        "exams": lambda: get_all_exams(active_only=True)
+    })
+    
     # Welcome message with progress stats
-    user_data = get_user(st.session_state.user['uid'])
+    user_data = data['user']
     exams_taken = user_data.get('exams_taken', 0)
     total_points = user_data.get('total_points', 0)
     
@@ -353,34 +487,34 @@ def student_dashboard():
     
     # Available exams
     st.subheader("Available Exams")
-    exams = get_all_exams(active_only=True)
+    exams = data['exams']
     
     if not exams:
         st.info("No active exams available at this time")
     else:
+        taken_exam_ids = get_taken_exam_ids(st.session_state.user['uid'])
+        # Submissions still in the outbox (e.g. during an outage) count as taken
+        pending_ids = pending_exam_ids(st.session_state.user['uid'])
+        
         for exam in exams:
             with st.expander(f"{exam['name']} - {exam['duration']} mins ({exam.get('total_questions', 0)} questions)"):
                 st.write(exam['description'])
                 st.caption(f"Total Points: {exam.get('total_points', 100)} | Passing Score: {exam.get('total_points', 100) * 0.6:.0f}+")
                 
                 # Check if student has already taken this exam
-                results = db.collection("results") \
-                          .where("student_id", "==", st.session_state.user['uid']) \
-                          .where("exam_id", "==", exam['id']) \
-                          .limit(1) \
-                          .stream()
-                
-                has_taken = any(results)
+                has_taken = exam['id'] in taken_exam_ids
                 
-                if has_taken:
+                if exam['id'] in pending_ids and not has_taken:
+                    st.info("Your submission is being saved. Results will appear shortly.")
+                elif has_taken:
                     st.warning("You've already taken this exam")
                     if st.button("View Results", key=f"results_{exam['id']}"):
                         st.session_state.view_exam_results = exam['id']
-                        st.experimental_rerun()
+                        st.rerun()
                 else:
                     if st.button("Take Exam", key=f"take_{exam['id']}"):
                         st.session_state.current_exam = exam
-                        st.experimental_rerun()
+                        st.rerun()
 
 def take_exam():
     """Enhanced exam taking interface with better UX"""
@@ -390,121 +524,266 @@ def take_exam():
     
     exam = st.session_state.current_exam
     st.title(f"Exam: {exam['name']}")
+    exam_duration = exam['duration'] * 60  # Convert to seconds
     
-    # Initialize session variables
+    # Initialize session variables, resuming a saved draft of this attempt if there is one
     if 'exam_start_time' not in st.session_state:
-        st.session_state.exam_start_time = time.time()
-        st.session_state.answers = {}
+        if exam['id'] in pending_exam_ids(st.session_state.user['uid']):
+            st.info("You've already submitted this exam. Your submission is being saved.")
+            return
+        try:
+            draft = open_draft(st.session_state.user['uid'], exam['id'], exam_duration)
+        except Exception as e:
+            st.error(f"Could not load your saved answers: {str(e)}")
+            return
+        st.session_state.exam_start_time = draft['started_at']
+        # Fixed when the attempt started and stored with the draft
+        st.session_state.exam_deadline = draft['deadline']
+        st.session_state.answers = dict(draft.get('answers', {}))
+        # Identifies this attempt so a resubmission can't be recorded twice
+        st.session_state.attempt_nonce = draft['attempt_nonce']
+        if st.session_state.answers:
+            st.info(f"Restored {len(st.session_state.answers)} saved answers.")
+    
+    # Questions come from the shared, pre-sorted exam snapshot
+    snapshot = get_exam_snapshot(exam['id'])
+    if snapshot is None:
+        st.error("Exam not found")
+        return
     
-    # Timer
-    exam_duration = exam['duration'] * 60  # Convert to seconds
-    elapsed_time = time.time() - st.session_state.exam_start_time
-    remaining_time = max(0, exam_duration - elapsed_time)
+    # The server's clock decides; answers edited after the deadline are not taken
+    deadline = st.session_state.exam_deadline
+    if remaining_seconds(deadline) <= 0:
+        st.error("Time's up! Your exam has been submitted automatically.")
+        submit_attempt(exam, snapshot, auto_submitted=True)
+        return
     
-    # Convert to minutes and seconds
-    minutes, seconds = divmod(int(remaining_time), 60)
-    time_display = f"{minutes:02d}:{seconds:02d}"
+    # Counts down in the browser; the fragment reruns the app at the deadline
+    render_countdown(deadline, exam_duration)
+    watch_deadline(deadline)
     
-    # Progress bar
-    progress = min(1.0, elapsed_time / exam_duration)
-    st.progress(progress)
+    questions = snapshot.questions
     
-    # Time warning system
-    if remaining_time <= 300:  # 5 minutes remaining
-        st.error(f"Time remaining: {time_display} - Hurry up!")
-    else:
-        st.write(f"Time remaining: {time_display}")
+    # Exam instructions
+    st.write(f"**Instructions:** Answer all {len(questions)} questions. Total points: {exam.get('total_points', 100)}")
+    
+    # Long exams are split into sections and only the current one is rendered;
+    # answers to the others stay in session state (and the draft). There is
+    # nothing to prefetch for the next section: every question already sits
+    # in the shared exam snapshot, so switching sections does no reads
+    section_count = max(1, -(-len(questions) // QUESTIONS_PER_SECTION))
+    if st.session_state.get('exam_section', 0) >= section_count:
+        st.session_state.exam_section = 0
+    if section_count > 1:
+        # Filled in once this run's answers are known
+        progress = st.empty()
+        st.selectbox(
+            "Section",
+            range(section_count),
+            key='exam_section',
+            format_func=lambda s: f"Section {s + 1} of {section_count}: questions {s * QUESTIONS_PER_SECTION + 1}-{min((s + 1) * QUESTIONS_PER_SECTION, len(questions))}"
+        )
+    section = st.session_state.get('exam_section', 0)
+    first = section * QUESTIONS_PER_SECTION
+    
+    # Answers are plain widgets (not a form) so each edit reaches the script and can be autosaved
+    for i, question in enumerate(questions[first:first + QUESTIONS_PER_SECTION], first + 1):
+        st.subheader(f"Question {question.get('question_number', i)} ({question['points']} pts)")
+        st.write(question['text'])
+        
+        # Store answers in session state; only what the student actually entered
+        # counts, so rendering a section doesn't answer its questions
+        answer_key = answer_key_for(question)
+        saved_answer = st.session_state.answers.get(answer_key)
+        
+        if question['type'] in ("Multiple Choice", "True/False"):
+            options = list(question['options']) if question['type'] == "Multiple Choice" else ["True", "False"]
+            answer = st.radio(
+                "Select your answer",
+                options,
+                key=answer_key,
+                index=options.index(saved_answer) if saved_answer in options else None
+            )
+        elif question['type'] == "Short Answer":
+            answer = st.text_input(
+                "Your answer",
+                key=answer_key,
+                value=saved_answer or "")
+        else:  # Essay
+            answer = st.text_area(
+                "Your answer",
+                key=answer_key,
+                value=saved_answer or "",
+                height=200)
+        # A cleared text answer is kept as "" so the draft forgets the old text too
+        if answer or answer_key in st.session_state.answers:
+            st.session_state.answers[answer_key] = answer or ""
+        
+        st.divider()
     
-    if remaining_time <= 0:
-        st.error("Time's up! Your exam will be automatically submitted.")
-        # Auto-submit logic would go here
+    if section_count > 1:
+        answered = sum(1 for question in questions if st.session_state.answers.get(answer_key_for(question)))
+        progress.caption(f"{answered} of {len(questions)} questions answered")
+    
+    # Only answers that changed since the last save are written, a couple of seconds after typing stops
+    stage_answers(st.session_state.user['uid'], exam['id'], st.session_state.answers)
+    
+    # Section navigation; the callbacks run before the next rerun renders the new section
+    if section_count > 1:
+        col1, col2 = st.columns(2)
+        col1.button("Previous Section", disabled=section == 0, on_click=go_to_section, args=(section - 1,))
+        col2.button("Next Section", disabled=section == section_count - 1, on_click=go_to_section, args=(section + 1,))
+    
+    # Submit button
+    if st.button("Submit Exam", type="primary"):
+        submit_attempt(exam, snapshot)
+
+def go_to_section(section: int) -> None:
+    """Button callback for moving between sections of an exam"""
+    st.session_state.exam_section = section
+
+def submit_attempt(exam: Dict, snapshot, auto_submitted: bool = False) -> None:
+    """Grade and queue the current attempt, then leave the exam page"""
+    # Calculate score
+    grade = grade_submission(compile_answer_key(snapshot), st.session_state.answers)
+    score = grade['score']
+    max_score = grade['max_score']
+    
+    # Time spent stops counting at the deadline
+    submitted_at = min(time.time(), st.session_state.exam_deadline)
+    
+    # Save results
+    results = {
+        'exam_id': exam['id'],
+        'exam_name': exam['name'],
+        'student_id': st.session_state.user['uid'],
+        'student_name': st.session_state.user['display_name'],
+        'score': score,
+        'max_score': max_score,
+        # Packed against this snapshot's version (see utils/answer_codec.py)
+        **encode_answers(snapshot, st.session_state.answers),
+        'submitted_at': datetime.now(),
+        'time_taken': submitted_at - st.session_state.exam_start_time,
+        'auto_submitted': auto_submitted
+    }
+    
+    try:
+        # Accepted locally right away and delivered in the background
+        receipt = enqueue_submission(results, attempt_nonce=st.session_state.get('attempt_nonce'))
+        st.success(f"Exam submitted! Your score: {score}/{max_score} (receipt {receipt[:10]})")
+        
+        try:
+            discard_draft(st.session_state.user['uid'], exam['id'])
+        except Exception:
+            # The result is already queued; the draft is deleted by a background retry
+            logger.exception("Discarding the draft after submission failed")
+        
+        # Clear exam state
+        del st.session_state.current_exam
+        del st.session_state.exam_start_time
+        del st.session_state.exam_deadline
+        st.session_state.pop('attempt_nonce', None)
+        st.session_state.pop('exam_section', None)
+        del st.session_state.answers
+    except Exception as e:
+        st.error(f"Failed to submit exam: {str(e)}")
         return
     
-    # Get questions
-    questions = get_exam_questions(exam['id'])
-    questions.sort(key=lambda x: x.get('question_number', 0))
+    time.sleep(2)
+    st.rerun()
+
+def view_results():
+    """Browse submitted results across exams"""
+    st.title("Exam Results")
     
-    # Exam instructions
-    st.write(f"**Instructions:** Answer all {len(questions)} questions. Total points: {exam.get('total_points', 100)}")
+    exams = get_all_exams(active_only=False)
+    exam_options = {"All Exams": None, **{exam['name']: exam['id'] for exam in exams}}
     
-    # Form for answers
-    with st.form("exam_form"):
-        for i, question in enumerate(questions, 1):
-            st.subheader(f"Question {question.get('question_number', i)} ({question['points']} pts)")
-            st.write(question['text'])
-            
-            # Store answers in session state
-            answer_key = f"q_{question['id']}"
-            
-            if question['type'] == "Multiple Choice":
-                st.session_state.answers[answer_key] = st.radio(
-                    "Select your answer",
-                    question['options'],
-                    key=answer_key,
-                    index=st.session_state.answers.get(answer_key, 0)
-                )
-            elif question['type'] == "True/False":
-                st.session_state.answers[answer_key] = st.radio(
-                    "Select your answer",
-                    ["True", "False"],
-                    key=answer_key,
-                    index=st.session_state.answers.get(answer_key, 0)
-                )
-            elif question['type'] == "Short Answer":
-                st.session_state.answers[answer_key] = st.text_input(
-                    "Your answer",
-                    key=answer_key,
-                    value=st.session_state.answers.get(answer_key, ""))
-            else:  # Essay
-                st.session_state.answers[answer_key] = st.text_area(
-                    "Your answer",
-                    key=answer_key,
-                    value=st.session_state.answers.get(answer_key, ""),
-                    height=200)
-            
-            st.divider()
+    col1, col2 = st.columns(2)
+    selected_exam = col1.selectbox("Select Exam", list(exam_options.keys()))
+    limit = col2.number_input("Results to Show", min_value=10, max_value=500, value=50, step=10)
+    
+    results = get_recent_results(limit=limit, exam_id=exam_options[selected_exam])
+    
+    if not results:
+        st.info("No results submitted yet.")
+        return
+    
+    results_data = []
+    for result in results:
+        results_data.append({
+            "Student": result.get('student_name', result['student_id']),
+            "Exam": result['exam_name'],
+            "Score": f"{result['score']}/{result['max_score']}",
+            "Percentage": f"{result.get('percentage', 0):.1f}%",
+            "Time Taken": f"{int(result.get('time_taken', 0)) // 60} min",
+            "Submitted": result['submitted_at'].strftime('%Y-%m-%d %H:%M')
+        })
+    
+    st.dataframe(results_data, use_container_width=True, hide_index=True)
+
+def performance_dashboard():
+    """Database reads, writes and latency per page, for setting per-page budgets"""
+    st.title("Performance")
+    
+    if st.session_state.get('user', {}).get('role') != 'admin':
+        st.error("Only administrators can view performance metrics.")
+        return
+    
+    st.caption("Counts since this worker started (or was last reset). Reads and writes are what Firestore bills; sizes are approximate.")
+    
+    pages = get_page_metrics()
+    if not pages:
+        st.info("No database activity recorded yet.")
+    else:
+        st.subheader("By Page")
+        st.dataframe([{
+            "Page": page['page'],
+            "Renders": page['renders'],
+            "Reads": page['reads'],
+            "Writes": page['writes'],
+            "Reads / Render": round(page['reads_per_render'], 1),
+            "Writes / Render": round(page['writes_per_render'], 1),
+            "KB Read / Render": round(page['bytes_read_per_render'] / 1024, 1),
+            "Render p50 (ms)": page['render_p50_ms'],
+            "Render p95 (ms)": page['render_p95_ms']
+        } for page in pages], use_container_width=True, hide_index=True)
         
-        # Submit button
-        submitted = st.form_submit_button("Submit Exam")
+        st.subheader("By Operation")
+        page_filter = st.selectbox("Page", ["All Pages"] + [page['page'] for page in pages])
+        operations = get_operation_metrics(None if page_filter == "All Pages" else page_filter)
+        st.dataframe([{
+            "Page": op['page'],
+            "Operation": op['operation'],
+            "Calls": op['calls'],
+            "Reads": op['reads'],
+            "Writes": op['writes'],
+            "KB Read": round(op['bytes_read'] / 1024, 1),
+            "KB Written": round(op['bytes_written'] / 1024, 1),
+            "p50 (ms)": op['p50_ms'],
+            "p95 (ms)": op['p95_ms']
+        } for op in operations], use_container_width=True, hide_index=True)
         
-        if submitted:
-            # Calculate score
-            score = 0
-            max_score = sum(q['points'] for q in questions)
-            
-            for question in questions:
-                answer_key = f"q_{question['id']}"
-                user_answer = st.session_state.answers.get(answer_key, "")
-                
-                if user_answer == question['correct_answer']:
-                    score += question['points']
-            
-            # Save results
-            results = {
-                'exam_id': exam['id'],
-                'exam_name': exam['name'],
-                'student_id': st.session_state.user['uid'],
-                'student_name': st.session_state.user['display_name'],
-                'score': score,
-                'max_score': max_score,
-                'answers': st.session_state.answers,
-                'submitted_at': datetime.now(),
-                'time_taken': elapsed_time
-            }
-            
-            try:
-                submit_exam_results(results)
-                st.success(f"Exam submitted! Your score: {score}/{max_score}")
-                
-                # Clear exam state
-                del st.session_state.current_exam
-                del st.session_state.exam_start_time
-                del st.session_state.answers
-                
-                time.sleep(2)
-                st.experimental_rerun()
-            except Exception as e:
-                st.error(f"Failed to submit exam: {str(e)}")
+        with st.expander("Top Sessions"):
+            st.dataframe([{
+                "Session": session['session'][:8],
+                "User": session.get('user_id') or "-",
+                "Renders": session['renders'],
+                "Reads": session['reads'],
+                "Writes": session['writes'],
+                "KB": round(session['bytes'] / 1024, 1),
+                "Last Page": session['last_page'],
+                "Last Seen": session['last_seen'].strftime('%Y-%m-%d %H:%M:%S')
+            } for session in get_session_metrics()], use_container_width=True, hide_index=True)
+    
+    metrics_text = prometheus_text()
+    col1, col2 = st.columns(2)
+    col1.download_button("Download Prometheus Metrics", metrics_text, file_name="exam_metrics.prom", mime="text/plain")
+    if col2.button("Reset Metrics"):
+        reset_metrics()
+        st.success("Metrics reset.")
+    with st.expander("Prometheus Text"):
+        st.code(metrics_text, language="text")
 
 def view_student_results():
     """Enhanced results viewing with more details"""
@@ -534,9 +813,12 @@ def view_student_results():
             st.write(f"**First Attempt:** {attempts[-1]['submitted_at'].strftime('%Y-%m-%d %H:%M')}")
             st.write(f"**Latest Attempt:** {attempts[0]['submitted_at'].strftime('%Y-%m-%d %H:%M')}")
             
+            rank = get_rank(best_attempt['exam_id'], best_attempt['percentage'])
+            st.write(f"**Rank:** {rank['rank']} of {rank['total']} attempts (better than {rank['percentile']:.1f}%)")
+            
             if st.button("View Details", key=f"details_{exam_name}"):
                 st.session_state.view_exam_results = attempts[0]['exam_id']
-                st.experimental_rerun()
+                st.rerun()
 
 def view_leaderboard():
     """Enhanced leaderboard with more filtering options"""
@@ -570,6 +852,13 @@ def view_leaderboard():
     
     st.dataframe(leaderboard_data, use_container_width=True, hide_index=True)
     
+    # The student's own standing, even outside the top results
+    best = get_best_percentage(st.session_state.user['uid'], exam_options[selected_exam])
+    if best is not None:
+        rank = get_rank(exam_options[selected_exam], best)
+        st.info(f"Your best rank: {rank['rank']} of {rank['total']} attempts "
+                f"({best:.1f}%, better than {rank['percentile']:.1f}%)")
+    
     # Visualizations
     if selected_exam != "All Exams" and len(results) > 1:
         st.subheader("Performance Distribution")
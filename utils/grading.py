@@ -0,0 +1,80 @@
+from utils.exam_snapshot import ExamSnapshot
+from cachetools import LRUCache
+from dataclasses import dataclass
+from typing import Dict, Mapping, Sequence, Tuple
+import numpy as np
+import threading
+
+# Compiled keys are tied to a snapshot version, so they never go stale
+COMPILED_KEY_CACHE_SIZE = 64
+
+@dataclass(frozen=True)
+class CompiledKey:
+    """An exam's answer key laid out as arrays, one column per question"""
+    exam_id: str
+    version: int
+    answer_keys: Tuple[str, ...]
+    correct: np.ndarray
+    points: np.ndarray
+    max_score: int
+
+@dataclass(frozen=True)
+class GradeReport:
+    """Grades for a batch of submissions (rows) against a compiled key (columns)"""
+    key: CompiledKey
+    correct: np.ndarray
+    scores: np.ndarray
+
+    @property
+    def percentages(self) -> np.ndarray:
+        if not self.key.max_score:
+            return np.zeros(len(self.scores))
+        return self.scores / self.key.max_score * 100
+
+_compiled = LRUCache(maxsize=COMPILED_KEY_CACHE_SIZE)
+_compiled_lock = threading.Lock()
+
+def compile_answer_key(snapshot: ExamSnapshot) -> CompiledKey:
+    """Compile a snapshot's answer key into arrays, once per snapshot version"""
+    cache_key = (snapshot.exam_id, snapshot.version)
+    with _compiled_lock:
+        compiled = _compiled.get(cache_key)
+    if compiled is None:
+        answer_keys = tuple(snapshot.answer_key)
+        compiled = CompiledKey(
+            exam_id=snapshot.exam_id,
+            version=snapshot.version,
+            answer_keys=answer_keys,
+            correct=np.array([snapshot.answer_key[k] for k in answer_keys], dtype=object),
+            points=np.array([snapshot.points[k] for k in answer_keys], dtype=np.int64),
+            max_score=snapshot.max_score
+        )
+        with _compiled_lock:
+            _compiled[cache_key] = compiled
+    return compiled
+
+def answer_matrix(key: CompiledKey, submissions: Sequence[Mapping]) -> np.ndarray:
+    """Lay out submitted answers as a (students x questions) matrix"""
+    matrix = np.empty((len(submissions), len(key.answer_keys)), dtype=object)
+    for row, answers in enumerate(submissions):
+        matrix[row] = [answers.get(k, "") for k in key.answer_keys]
+    return matrix
+
+def grade_matrix(key: CompiledKey, answers: np.ndarray) -> GradeReport:
+    """Grade an answer matrix built by answer_matrix"""
+    correct = answers == key.correct if answers.size else np.zeros(answers.shape, dtype=bool)
+    correct = correct.astype(bool)
+    return GradeReport(key=key, correct=correct, scores=correct.astype(np.int64) @ key.points)
+
+def grade_submissions(key: CompiledKey, submissions: Sequence[Mapping]) -> GradeReport:
+    """Grade many answer dicts (as stored in results) at once"""
+    return grade_matrix(key, answer_matrix(key, submissions))
+
+def grade_submission(key: CompiledKey, answers: Mapping) -> Dict:
+    """Grade a single submission"""
+    report = grade_submissions(key, [answers])
+    return {
+        "score": int(report.scores[0]),
+        "max_score": key.max_score,
+        "correct": dict(zip(key.answer_keys, report.correct[0].tolist()))
+    }
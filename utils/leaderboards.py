@@ -0,0 +1,101 @@
+from firebase_config import db, transactional
+from cachetools import TTLCache
+from datetime import datetime
+from typing import Dict, List, Optional
+import threading
+
+# Each leaderboard document holds the top LEADERBOARD_SIZE results of an exam
+# (or of all exams) with student names already resolved, so showing a
+# leaderboard costs a single document read.
+LEADERBOARDS_COLLECTION = "leaderboards"
+ALL_EXAMS_BOARD = "_all"
+LEADERBOARD_SIZE = 50
+ENTRY_FIELDS = ("student_id", "student_name", "exam_id", "exam_name", "score", "max_score", "percentage", "submitted_at")
+
+# Lowest percentage on each full board. Scores at or below it can't qualify,
+# so most submissions skip the leaderboard transaction entirely. Entries
+# expire because a rebuild (e.g. after a regrade) can lower the cutoff.
+_cutoffs = TTLCache(maxsize=1000, ttl=60)
+_cutoffs_lock = threading.Lock()
+# Boards that missed an update and couldn't be deleted; this worker rebuilds
+# them on the next read instead of serving the stored copy
+_stale = set()
+
+def board_id(exam_id: Optional[str]) -> str:
+    return exam_id or ALL_EXAMS_BOARD
+
+def _board_ref(exam_id: Optional[str]):
+    return db.collection(LEADERBOARDS_COLLECTION).document(board_id(exam_id))
+
+def make_entry(result_id: str, result_data: Dict, student_name: Optional[str] = None) -> Dict:
+    """Trim a result down to what a leaderboard row shows"""
+    entry = {"id": result_id, **{field: result_data.get(field) for field in ENTRY_FIELDS}}
+    if student_name:
+        entry["student_name"] = student_name
+    return entry
+
+def _remember_cutoff(exam_id: Optional[str], entries: List[Dict]) -> None:
+    with _cutoffs_lock:
+        if len(entries) >= LEADERBOARD_SIZE:
+            _cutoffs[board_id(exam_id)] = entries[-1]["percentage"]
+        else:
+            _cutoffs.pop(board_id(exam_id), None)
+
+def read_leaderboard(exam_id: Optional[str]) -> Optional[List[Dict]]:
+    """Get a materialized leaderboard, or None if it hasn't been built yet (or is stale)"""
+    with _cutoffs_lock:
+        if board_id(exam_id) in _stale:
+            return None
+    board = _board_ref(exam_id).get()
+    if not board.exists:
+        return None
+    entries = board.get("entries") or []
+    _remember_cutoff(exam_id, entries)
+    return entries
+
+def write_leaderboard(exam_id: Optional[str], entries: List[Dict]) -> None:
+    """Replace a materialized leaderboard with already ranked entries"""
+    entries = entries[:LEADERBOARD_SIZE]
+    _board_ref(exam_id).set({"entries": entries, "updated_at": datetime.now()})
+    _remember_cutoff(exam_id, entries)
+    with _cutoffs_lock:
+        _stale.discard(board_id(exam_id))
+
+@transactional
+def _insert_entry(transaction, board_ref, entry: Dict) -> Optional[List[Dict]]:
+    board = board_ref.get(transaction=transaction)
+    if not board.exists:
+        # Never seed a board from a single result; the read path builds it from a query
+        return None
+    entries = board.get("entries") or []
+    if any(e["id"] == entry["id"] for e in entries):
+        return entries
+    if len(entries) >= LEADERBOARD_SIZE and entry["percentage"] <= entries[-1]["percentage"]:
+        return entries
+
+    # Stable sort keeps earlier submissions ahead of later ones on ties
+    entries = sorted(entries + [entry], key=lambda e: -e["percentage"])[:LEADERBOARD_SIZE]
+    transaction.update(board_ref, {"entries": entries, "updated_at": datetime.now()})
+    return entries
+
+def add_to_leaderboards(entry: Dict) -> None:
+    """Offer a new result to its exam's leaderboard and the all-exams leaderboard"""
+    for exam_id in (entry["exam_id"], None):
+        with _cutoffs_lock:
+            cutoff = _cutoffs.get(board_id(exam_id))
+        if cutoff is not None and entry["percentage"] <= cutoff:
+            continue
+        entries = _insert_entry(db.transaction(), _board_ref(exam_id), entry)
+        if entries is not None:
+            _remember_cutoff(exam_id, entries)
+
+def discard_leaderboards(exam_id: str) -> None:
+    """Drop an exam's board and the all-exams board so the next read rebuilds them"""
+    boards = [board_id(board) for board in (exam_id, None)]
+    with _cutoffs_lock:
+        for board in boards:
+            _cutoffs.pop(board, None)
+        # Until the deletes succeed, at least this worker stops serving them
+        _stale.update(boards)
+    for board in boards:
+        db.collection(LEADERBOARDS_COLLECTION).document(board).delete()
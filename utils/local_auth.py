@@ -0,0 +1,84 @@
+from utils.local_store import LocalClient
+from google.api_core.exceptions import AlreadyExists
+from datetime import datetime
+from typing import Optional
+import hashlib
+import os
+import uuid
+
+# Stand-in for firebase_admin.auth on the local storage backends. Accounts
+# live in the same document store as everything else; an index document
+# per email makes duplicate sign-ups fail atomically.
+ACCOUNTS_COLLECTION = "_auth_users"
+EMAILS_COLLECTION = "_auth_emails"
+PBKDF2_ITERATIONS = 100_000
+
+class UserNotFoundError(Exception):
+    pass
+
+class EmailAlreadyExistsError(Exception):
+    pass
+
+class UserRecord:
+    """The fields of firebase_admin.auth.UserRecord the app reads"""
+    __slots__ = ("uid", "email", "display_name", "disabled")
+
+    def __init__(self, uid: str, email: str, display_name: Optional[str] = None, disabled: bool = False):
+        self.uid = uid
+        self.email = email
+        self.display_name = display_name
+        self.disabled = disabled
+
+def _email_key(email: str) -> str:
+    return email.strip().lower()
+
+def _hash_password(password: str, salt: bytes) -> str:
+    return hashlib.pbkdf2_hmac("sha256", password.encode(), salt, PBKDF2_ITERATIONS).hex()
+
+class LocalAuth:
+    """Account management with the same calls and exceptions as firebase_admin.auth"""
+    UserNotFoundError = UserNotFoundError
+    EmailAlreadyExistsError = EmailAlreadyExistsError
+
+    def __init__(self, client: LocalClient):
+        self._client = client
+
+    def _record(self, uid: str) -> UserRecord:
+        account = self._client.collection(ACCOUNTS_COLLECTION).document(uid).get()
+        if not account.exists:
+            raise UserNotFoundError(f"No user record found for uid: {uid}")
+        data = account.to_dict()
+        return UserRecord(uid, data["email"], data.get("display_name"), data.get("disabled", False))
+
+    def create_user(self, email: str, password: Optional[str] = None, display_name: Optional[str] = None,
+                    uid: Optional[str] = None, **kwargs) -> UserRecord:
+        uid = uid or uuid.uuid4().hex[:28]
+        account = {"email": email.strip(), "display_name": display_name, "disabled": False, "created_at": datetime.now()}
+        if password:
+            salt = os.urandom(16)
+            account.update({"password_salt": salt.hex(), "password_hash": _hash_password(password, salt)})
+
+        batch = self._client.batch()
+        batch.create(self._client.collection(EMAILS_COLLECTION).document(_email_key(email)), {"uid": uid})
+        batch.create(self._client.collection(ACCOUNTS_COLLECTION).document(uid), account)
+        try:
+            batch.commit()
+        except AlreadyExists:
+            raise EmailAlreadyExistsError(f"The user with the provided email already exists: {email}")
+        return UserRecord(uid, account["email"], display_name)
+
+    def get_user(self, uid: str) -> UserRecord:
+        return self._record(uid)
+
+    def get_user_by_email(self, email: str) -> UserRecord:
+        index = self._client.collection(EMAILS_COLLECTION).document(_email_key(email)).get()
+        if not index.exists:
+            raise UserNotFoundError(f"No user record found for the provided email: {email}")
+        return self._record(index.get("uid"))
+
+    def delete_user(self, uid: str) -> None:
+        record = self._record(uid)
+        batch = self._client.batch()
+        batch.delete(self._client.collection(EMAILS_COLLECTION).document(_email_key(record.email)))
+        batch.delete(self._client.collection(ACCOUNTS_COLLECTION).document(uid))
+        batch.commit()
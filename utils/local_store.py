@@ -0,0 +1,648 @@
+from google.api_core.exceptions import AlreadyExists, NotFound
+from google.cloud.firestore_v1 import transforms
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from datetime import datetime
+from typing import ContextManager, Dict, Iterator, List, Optional, Tuple
+import copy
+import heapq
+import json
+import math
+import re
+import sqlite3
+import threading
+import uuid
+
+# Local stand-ins for the Firestore client so the app (and its benchmarks)
+# can run without credentials or network. LocalClient speaks the part of the
+# google-cloud-firestore API this app uses - collections, documents,
+# queries, projections, count aggregations, batches, transactions and field
+# transforms - on top of a DocumentStore holding plain dicts per document
+# path. MemoryStore keeps them in a dict; SQLiteStore keeps them in a single
+# table so data survives restarts.
+ASCENDING = "ASCENDING"
+DESCENDING = "DESCENDING"
+AUTO_ID_LENGTH = 20
+# Sentinels are compared by identity, so copies of queued writes must keep them
+_SENTINELS = {id(transforms.DELETE_FIELD): transforms.DELETE_FIELD, id(transforms.SERVER_TIMESTAMP): transforms.SERVER_TIMESTAMP}
+_SIMPLE_FIELD_PATH = re.compile(r"[A-Za-z_][A-Za-z0-9_]*(\.[A-Za-z_][A-Za-z0-9_]*)*")
+
+def _split(path: str) -> Tuple[str, str]:
+    collection, _, doc_id = path.rpartition("/")
+    return collection, doc_id
+
+class DocumentStore(ABC):
+    """Documents as plain dicts keyed by collection path and id.
+
+    Callers hold `lock` for reads and use `atomic()` for writes; `put` takes
+    ownership of the dict it is given.
+    """
+
+    def __init__(self):
+        self.lock = threading.RLock()
+
+    @abstractmethod
+    def get(self, path: str) -> Optional[Dict]:
+        """A document's data, or None if it doesn't exist"""
+
+    @abstractmethod
+    def put(self, path: str, data: Dict) -> None:
+        """Create or replace a document"""
+
+    @abstractmethod
+    def delete(self, path: str) -> None:
+        """Remove a document if it exists"""
+
+    @abstractmethod
+    def scan(self, collection: str, equals: Dict) -> List[Tuple[str, Dict]]:
+        """Documents of a collection, not to be modified; `equals` is a hint the store may use to skip non-matches"""
+
+    @abstractmethod
+    def atomic(self) -> ContextManager[None]:
+        """Context manager whose writes are applied all together or not at all; nests"""
+
+class MemoryStore(DocumentStore):
+    """Process-local store, empty on every start.
+
+    Equality filters are answered from per-field indexes that are built the
+    first time a collection is queried on that field and kept current on
+    every write, so `where(field, "==", value)` doesn't scan the collection.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._collections: Dict[str, Dict[str, Dict]] = {}
+        self._indexes: Dict[str, Dict[str, Dict[object, set]]] = {}  # collection -> field -> value -> ids
+        self._undo: Optional[Dict[Tuple[str, str], Optional[Dict]]] = None
+
+    def get(self, path: str) -> Optional[Dict]:
+        collection, doc_id = _split(path)
+        data = self._collections.get(collection, {}).get(doc_id)
+        return copy.deepcopy(data) if data is not None else None
+
+    def _replace(self, collection: str, doc_id: str, data: Optional[Dict]) -> None:
+        docs = self._collections.setdefault(collection, {})
+        old = docs.pop(doc_id, None)
+        if data is not None:
+            docs[doc_id] = data
+        for field, index in self._indexes.get(collection, {}).items():
+            for doc, change in ((old, set.discard), (data, set.add)):
+                value, indexable = _index_value(doc, field)
+                if indexable:
+                    change(index.setdefault(value, set()), doc_id)
+
+    def _remember(self, collection: str, doc_id: str) -> None:
+        if self._undo is not None and (collection, doc_id) not in self._undo:
+            self._undo[(collection, doc_id)] = self._collections.get(collection, {}).get(doc_id)
+
+    def put(self, path: str, data: Dict) -> None:
+        collection, doc_id = _split(path)
+        self._remember(collection, doc_id)
+        self._replace(collection, doc_id, data)
+
+    def delete(self, path: str) -> None:
+        collection, doc_id = _split(path)
+        self._remember(collection, doc_id)
+        self._replace(collection, doc_id, None)
+
+    def _index(self, collection: str, field: str) -> Dict[object, set]:
+        indexes = self._indexes.setdefault(collection, {})
+        if field not in indexes:
+            index: Dict[object, set] = {}
+            for doc_id, data in self._collections.get(collection, {}).items():
+                value, indexable = _index_value(data, field)
+                if indexable:
+                    index.setdefault(value, set()).add(doc_id)
+            indexes[field] = index
+        return indexes[field]
+
+    def scan(self, collection: str, equals: Dict) -> List[Tuple[str, Dict]]:
+        # Returns the stored dicts themselves; the query copies what it hands out
+        docs = self._collections.get(collection, {})
+        buckets = []
+        for field, value in equals.items():
+            if _index_value({"v": value}, "v")[1]:
+                buckets.append(self._index(collection, field).get(value, set()))
+        if not buckets:
+            return list(docs.items())
+        buckets.sort(key=len)
+        doc_ids = set.intersection(*buckets) if len(buckets) > 1 else buckets[0]
+        return [(doc_id, docs[doc_id]) for doc_id in doc_ids]
+
+    @contextmanager
+    def atomic(self) -> Iterator[None]:
+        with self.lock:
+            if self._undo is not None:
+                yield  # joins the enclosing batch or transaction
+                return
+            self._undo = {}
+            try:
+                yield
+            except BaseException:
+                for (collection, doc_id), data in self._undo.items():
+                    self._replace(collection, doc_id, data)
+                raise
+            finally:
+                self._undo = None
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot store {type(value).__name__}")
+
+def _decode(obj: Dict):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+class SQLiteStore(DocumentStore):
+    """Documents as JSON rows in one SQLite table"""
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS documents (
+                collection TEXT NOT NULL,
+                id TEXT NOT NULL,
+                data TEXT NOT NULL,
+                PRIMARY KEY (collection, id)
+            )
+        """)
+        self._depth = 0
+
+    def get(self, path: str) -> Optional[Dict]:
+        collection, doc_id = _split(path)
+        row = self._conn.execute(
+            "SELECT data FROM documents WHERE collection = ? AND id = ?", (collection, doc_id)
+        ).fetchone()
+        return json.loads(row[0], object_hook=_decode) if row else None
+
+    def put(self, path: str, data: Dict) -> None:
+        collection, doc_id = _split(path)
+        self._conn.execute(
+            "INSERT OR REPLACE INTO documents (collection, id, data) VALUES (?, ?, ?)",
+            (collection, doc_id, json.dumps(data, default=_encode))
+        )
+
+    def delete(self, path: str) -> None:
+        collection, doc_id = _split(path)
+        self._conn.execute("DELETE FROM documents WHERE collection = ? AND id = ?", (collection, doc_id))
+
+    def scan(self, collection: str, equals: Dict) -> List[Tuple[str, Dict]]:
+        # Equality filters on plain values are pushed into SQL; the query re-checks everything
+        sql = "SELECT id, data FROM documents WHERE collection = ?"
+        params = [collection]
+        for field, value in equals.items():
+            if isinstance(value, (str, int, float)) and _SIMPLE_FIELD_PATH.fullmatch(field):
+                sql += " AND json_extract(data, ?) = ?"
+                params += [f"$.{field}", value]
+        return [(doc_id, json.loads(data, object_hook=_decode)) for doc_id, data in self._conn.execute(sql, params)]
+
+    @contextmanager
+    def atomic(self) -> Iterator[None]:
+        with self.lock:
+            if self._depth == 0:
+                self._conn.execute("BEGIN IMMEDIATE")
+            self._depth += 1
+            try:
+                yield
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self._conn.execute("ROLLBACK")
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self._conn.execute("COMMIT")
+
+# Field values and transforms
+
+def _lookup(data: Optional[Dict], field_path: str) -> Tuple[object, bool]:
+    current = data
+    for part in field_path.split("."):
+        if not isinstance(current, dict) or part not in current:
+            return None, False
+        current = current[part]
+    return current, True
+
+def _index_value(data: Optional[Dict], field_path: str) -> Tuple[object, bool]:
+    value, present = _lookup(data, field_path)
+    if not present:
+        return None, False
+    try:
+        hash(value)
+    except TypeError:
+        return None, False
+    return value, True
+
+def _assign(target: Dict, key: str, value) -> None:
+    """Store one field value, resolving transforms against what is already there"""
+    if value is transforms.DELETE_FIELD:
+        target.pop(key, None)
+    elif value is transforms.SERVER_TIMESTAMP:
+        target[key] = datetime.now()
+    elif isinstance(value, transforms.Increment):
+        current = target.get(key)
+        target[key] = (current if isinstance(current, (int, float)) and not isinstance(current, bool) else 0) + value.value
+    elif isinstance(value, transforms.Maximum):
+        current = target.get(key)
+        target[key] = value.value if not isinstance(current, (int, float)) else max(current, value.value)
+    elif isinstance(value, transforms.Minimum):
+        current = target.get(key)
+        target[key] = value.value if not isinstance(current, (int, float)) else min(current, value.value)
+    elif isinstance(value, transforms.ArrayUnion):
+        current = list(target.get(key) or [])
+        target[key] = current + [copy.deepcopy(v) for v in value.values if v not in current]
+    elif isinstance(value, transforms.ArrayRemove):
+        target[key] = [v for v in (target.get(key) or []) if v not in value.values]
+    elif isinstance(value, dict):
+        target[key] = {}
+        _merge(target[key], value)
+    elif isinstance(value, tuple):
+        target[key] = copy.deepcopy(list(value))
+    else:
+        target[key] = copy.deepcopy(value)
+
+def _merge(target: Dict, data: Dict) -> Dict:
+    """set(..., merge=True): nested maps are merged rather than replaced"""
+    for key, value in data.items():
+        if isinstance(value, dict) and isinstance(target.get(key), dict):
+            _merge(target[key], value)
+        else:
+            _assign(target, key, value)
+    return target
+
+def _update(target: Dict, updates: Dict) -> Dict:
+    """update(): keys are dotted field paths"""
+    for field_path, value in updates.items():
+        parts = field_path.split(".")
+        current = target
+        for part in parts[:-1]:
+            if not isinstance(current.get(part), dict):
+                current[part] = {}
+            current = current[part]
+        _assign(current, parts[-1], value)
+    return target
+
+def _project(data: Dict, field_paths: List[str]) -> Dict:
+    projected = {}
+    for field_path in field_paths:
+        value, present = _lookup(data, field_path)
+        if present:
+            _update(projected, {field_path: value})
+    return projected
+
+# Firestore orders values of different types by type first
+def _type_rank(value) -> int:
+    if value is None:
+        return 0
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float)):
+        return 2
+    if isinstance(value, datetime):
+        return 3
+    if isinstance(value, str):
+        return 4
+    if isinstance(value, bytes):
+        return 5
+    if isinstance(value, (list, tuple)):
+        return 8
+    return 9
+
+def _sort_key(value) -> Tuple:
+    rank = _type_rank(value)
+    if rank == 3:
+        return (rank, value.timestamp())
+    if rank >= 8:
+        return (rank, json.dumps(value, default=str, sort_keys=True))
+    return (rank, value)
+
+class _Descending:
+    """Inverts the ordering of a sort key"""
+    __slots__ = ("key",)
+
+    def __init__(self, key):
+        self.key = key
+
+    def __eq__(self, other):
+        return self.key == other.key
+
+    def __lt__(self, other):
+        return self.key > other.key
+
+    def __gt__(self, other):
+        return self.key < other.key
+
+def _compare(actual, op: str, expected) -> bool:
+    if op == "==":
+        return actual == expected
+    if op == "!=":
+        return actual != expected
+    if op == "in":
+        return actual in expected
+    if op == "not-in":
+        return actual not in expected
+    if op == "array_contains":
+        return isinstance(actual, list) and expected in actual
+    if op == "array_contains_any":
+        return isinstance(actual, list) and any(v in actual for v in expected)
+    # Range filters only match values of the same type
+    if _type_rank(actual) != _type_rank(expected):
+        return False
+    a, b = _sort_key(actual), _sort_key(expected)
+    return {"<": a < b, "<=": a <= b, ">": a > b, ">=": a >= b}[op]
+
+# Firestore-shaped client
+
+class DocumentSnapshot:
+    def __init__(self, reference: "DocumentReference", data: Optional[Dict]):
+        self.reference = reference
+        self.id = reference.id
+        self.exists = data is not None
+        self._data = data
+
+    def to_dict(self) -> Optional[Dict]:
+        return copy.deepcopy(self._data) if self._data is not None else None
+
+    def get(self, field_path: str):
+        if not self.exists:
+            return None
+        value, present = _lookup(self._data, field_path)
+        if not present:
+            raise KeyError(f"{field_path} is not contained in the data")
+        return copy.deepcopy(value)
+
+class DocumentReference:
+    def __init__(self, client: "LocalClient", collection: str, doc_id: str):
+        self._client = client
+        self.id = doc_id
+        self.path = f"{collection}/{doc_id}"
+        self._collection = collection
+
+    @property
+    def parent(self) -> "CollectionReference":
+        return CollectionReference(self._client, self._collection)
+
+    def collection(self, name: str) -> "CollectionReference":
+        return CollectionReference(self._client, f"{self.path}/{name}")
+
+    def get(self, field_paths: Optional[List[str]] = None, transaction=None) -> DocumentSnapshot:
+        store = self._client.store
+        with store.lock:
+            data = store.get(self.path)
+        self._client.record_usage(reads=1)
+        if data is not None and field_paths is not None:
+            data = _project(data, field_paths)
+        return DocumentSnapshot(self, data)
+
+    def _apply(self, op: str, data: Optional[Dict] = None, merge: bool = False) -> None:
+        store = self._client.store
+        if op == "delete":
+            store.delete(self.path)
+            return
+        current = store.get(self.path)
+        if op == "create":
+            if current is not None:
+                raise AlreadyExists(f"Document already exists: {self.path}")
+            store.put(self.path, _merge({}, data))
+        elif op == "set":
+            store.put(self.path, _merge(current or {}, data) if merge else _merge({}, data))
+        elif op == "update":
+            if current is None:
+                raise NotFound(f"No document to update: {self.path}")
+            store.put(self.path, _update(current, data))
+
+    def _write(self, op: str, data: Optional[Dict] = None, merge: bool = False) -> None:
+        with self._client.store.atomic():
+            self._apply(op, data, merge)
+        self._client.record_usage(writes=1)
+
+    def create(self, document_data: Dict) -> None:
+        self._write("create", document_data)
+
+    def set(self, document_data: Dict, merge: bool = False) -> None:
+        self._write("set", document_data, merge)
+
+    def update(self, field_updates: Dict) -> None:
+        self._write("update", field_updates)
+
+    def delete(self) -> None:
+        self._write("delete")
+
+class AggregationResult:
+    def __init__(self, alias: str, value: int):
+        self.alias = alias
+        self.value = value
+
+class CountQuery:
+    def __init__(self, query: "Query", alias: Optional[str]):
+        self._query = query
+        self._alias = alias or "field_1"
+
+    def get(self, transaction=None) -> List[List[AggregationResult]]:
+        count = len(self._query._run())
+        # Billed like Firestore: one read per 1000 index entries counted
+        self._query._client.record_usage(reads=max(1, math.ceil(count / 1000)))
+        return [[AggregationResult(self._alias, count)]]
+
+class Query:
+    def __init__(self, client: "LocalClient", collection: str, filters=(), orders=(),
+                 limit: Optional[int] = None, offset: int = 0, cursor=None, fields=None):
+        self._client = client
+        self._collection = collection
+        self._filters = tuple(filters)
+        self._orders = tuple(orders)
+        self._limit = limit
+        self._offset = offset
+        self._cursor = cursor
+        self._fields = fields
+
+    def _copy(self, **changes) -> "Query":
+        args = {"filters": self._filters, "orders": self._orders, "limit": self._limit,
+                "offset": self._offset, "cursor": self._cursor, "fields": self._fields}
+        args.update(changes)
+        return Query(self._client, self._collection, **args)
+
+    def where(self, field_path: Optional[str] = None, op_string: Optional[str] = None, value=None, *, filter=None) -> "Query":
+        if filter is not None:
+            field_path, op_string, value = filter.field_path, filter.op_string, filter.value
+        return self._copy(filters=self._filters + ((field_path, op_string, value),))
+
+    def order_by(self, field_path: str, direction: str = ASCENDING) -> "Query":
+        return self._copy(orders=self._orders + ((field_path, direction),))
+
+    def limit(self, count: int) -> "Query":
+        return self._copy(limit=count)
+
+    def offset(self, num_to_skip: int) -> "Query":
+        return self._copy(offset=num_to_skip)
+
+    def start_after(self, document_fields_or_snapshot) -> "Query":
+        return self._copy(cursor=document_fields_or_snapshot)
+
+    def select(self, field_paths: List[str]) -> "Query":
+        return self._copy(fields=list(field_paths))
+
+    def count(self, alias: Optional[str] = None) -> CountQuery:
+        return CountQuery(self, alias)
+
+    def _value(self, doc_id: str, data: Dict, field_path: str) -> Tuple[object, bool]:
+        if field_path == "__name__":
+            return doc_id, True
+        return _lookup(data, field_path)
+
+    def _row_key(self, doc_id: str, data: Dict) -> Tuple:
+        key = [_sort_key(self._value(doc_id, data, field)[0]) for field, _ in self._orders]
+        key = [k if direction != DESCENDING else _Descending(k) for k, (_, direction) in zip(key, self._orders)]
+        return tuple(key) + (_sort_key(doc_id),)
+
+    def _cursor_key(self) -> Tuple:
+        cursor = self._cursor
+        if isinstance(cursor, DocumentSnapshot):
+            return self._row_key(cursor.id, cursor._data or {})
+        values = [cursor.get(field) for field, _ in self._orders] if isinstance(cursor, dict) else list(cursor)
+        key = [_sort_key(v.id if isinstance(v, DocumentReference) else v) for v in values]
+        return tuple(k if direction != DESCENDING else _Descending(k) for k, (_, direction) in zip(key, self._orders))
+
+    def _run(self) -> List[Tuple[str, Dict]]:
+        """Matching (id, data) pairs in query order; the data are private copies"""
+        store = self._client.store
+        equals = {field: value for field, op, value in self._filters if op == "==" and field != "__name__"}
+        with store.lock:
+            rows = store.scan(self._collection, equals)
+
+            def keep(doc_id: str, data: Dict) -> bool:
+                for field, op, expected in self._filters:
+                    actual, present = self._value(doc_id, data, field)
+                    if not present or not _compare(actual, op, expected):
+                        return False
+                # Documents missing an ordered field are left out, as in Firestore
+                return all(self._value(doc_id, data, field)[1] for field, _ in self._orders)
+
+            rows = [(self._row_key(doc_id, data), doc_id, data) for doc_id, data in rows if keep(doc_id, data)]
+            if self._cursor is not None:
+                cursor_key = self._cursor_key()
+                rows = [row for row in rows if row[0][:len(cursor_key)] > cursor_key]
+            if self._limit is not None:
+                rows = heapq.nsmallest(self._offset + self._limit, rows, key=lambda row: row[0])
+            else:
+                rows.sort(key=lambda row: row[0])
+            rows = rows[self._offset:]
+            return [(doc_id, copy.deepcopy(data)) for _, doc_id, data in rows]
+
+    def stream(self, transaction=None) -> Iterator[DocumentSnapshot]:
+        rows = self._run()
+        self._client.record_usage(reads=max(1, len(rows)))
+        for doc_id, data in rows:
+            if self._fields is not None:
+                data = _project(data, self._fields)
+            yield DocumentSnapshot(DocumentReference(self._client, self._collection, doc_id), data)
+
+    def get(self, transaction=None) -> List[DocumentSnapshot]:
+        return list(self.stream(transaction=transaction))
+
+class CollectionReference(Query):
+    def __init__(self, client: "LocalClient", path: str):
+        super().__init__(client, path)
+        self.id = path.rpartition("/")[2]
+
+    def document(self, document_id: Optional[str] = None) -> DocumentReference:
+        return DocumentReference(self._client, self._collection, document_id or uuid.uuid4().hex[:AUTO_ID_LENGTH])
+
+    def add(self, document_data: Dict, document_id: Optional[str] = None) -> Tuple[datetime, DocumentReference]:
+        ref = self.document(document_id)
+        ref.create(document_data)
+        return datetime.now(), ref
+
+def _copy_write(data: Dict) -> Dict:
+    return copy.deepcopy(data, dict(_SENTINELS))
+
+class WriteBatch:
+    def __init__(self, client: "LocalClient"):
+        self._client = client
+        self._writes: List[Tuple] = []
+
+    def create(self, reference: DocumentReference, document_data: Dict) -> None:
+        self._writes.append((reference, "create", _copy_write(document_data), False))
+
+    def set(self, reference: DocumentReference, document_data: Dict, merge: bool = False) -> None:
+        self._writes.append((reference, "set", _copy_write(document_data), merge))
+
+    def update(self, reference: DocumentReference, field_updates: Dict) -> None:
+        self._writes.append((reference, "update", _copy_write(field_updates), False))
+
+    def delete(self, reference: DocumentReference) -> None:
+        self._writes.append((reference, "delete", None, False))
+
+    def commit(self) -> None:
+        # All or nothing, like a Firestore batch
+        with self._client.store.atomic():
+            for reference, op, data, merge in self._writes:
+                reference._apply(op, data, merge)
+        self._client.record_usage(writes=len(self._writes))
+        self._writes = []
+
+    def __len__(self) -> int:
+        return len(self._writes)
+
+class Transaction(WriteBatch):
+    """Runs its function while holding the store, so reads and writes are serializable"""
+
+    def get(self, ref_or_query):
+        if isinstance(ref_or_query, DocumentReference):
+            return ref_or_query.get()
+        return ref_or_query.stream()
+
+    def get_all(self, references: List[DocumentReference]) -> Iterator[DocumentSnapshot]:
+        return self._client.get_all(references)
+
+    def run(self, fn, *args, **kwargs):
+        with self._client.store.atomic():
+            self._writes = []
+            result = fn(self, *args, **kwargs)
+            self.commit()
+            return result
+
+class LocalClient:
+    """The subset of google.cloud.firestore.Client the app uses, over a DocumentStore"""
+
+    def __init__(self, store: DocumentStore):
+        self.store = store
+        self._usage = {"reads": 0, "writes": 0}
+        self._usage_lock = threading.Lock()
+
+    def record_usage(self, reads: int = 0, writes: int = 0) -> None:
+        with self._usage_lock:
+            self._usage["reads"] += reads
+            self._usage["writes"] += writes
+
+    def usage(self) -> Dict[str, int]:
+        """Billable document reads and writes so far, counted the way Firestore bills them"""
+        with self._usage_lock:
+            return dict(self._usage)
+
+    def reset_usage(self) -> None:
+        with self._usage_lock:
+            self._usage = {"reads": 0, "writes": 0}
+
+    def collection(self, path: str) -> CollectionReference:
+        return CollectionReference(self, path)
+
+    def document(self, path: str) -> DocumentReference:
+        collection, doc_id = _split(path)
+        return DocumentReference(self, collection, doc_id)
+
+    def get_all(self, references: List[DocumentReference], field_paths: Optional[List[str]] = None,
+                transaction=None) -> Iterator[DocumentSnapshot]:
+        for reference in references:
+            yield reference.get(field_paths=field_paths)
+
+    def batch(self) -> WriteBatch:
+        return WriteBatch(self)
+
+    def transaction(self, **kwargs) -> Transaction:
+        return Transaction(self)
@@ -0,0 +1,471 @@
+from collections import OrderedDict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+import bisect
+import math
+import threading
+import time
+
+# Every database call goes through an instrumented wrapper around the client
+# (see instrument()), which records document reads, writes, approximate
+# bytes and latency. Calls are attributed to the page being rendered and the
+# browser session through context variables that app.py sets around each
+# page; work done by background threads is attributed to "background".
+# Everything is per worker process and kept in memory.
+BACKGROUND = "background"
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)  # seconds
+MAX_SESSIONS = 1000
+METRIC_PREFIX = "exam_db"
+
+_current_page: ContextVar[str] = ContextVar("metrics_page", default=BACKGROUND)
+_current_session: ContextVar[Optional[str]] = ContextVar("metrics_session", default=None)
+_lock = threading.Lock()
+
+class LatencyHistogram:
+    """Cumulative-bucket latency histogram, Prometheus style"""
+    __slots__ = ("counts", "total", "count")
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, seconds: float) -> None:
+        self.counts[bisect.bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+
+    def quantile(self, q: float) -> float:
+        """Estimated quantile in seconds (upper bound of the bucket it falls in)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS + (math.inf,), self.counts):
+            seen += count
+            if seen >= rank:
+                return bound if bound != math.inf else LATENCY_BUCKETS[-1]
+        return LATENCY_BUCKETS[-1]
+
+class _Usage:
+    __slots__ = ("calls", "reads", "writes", "bytes_read", "bytes_written", "latency")
+
+    def __init__(self):
+        self.calls = self.reads = self.writes = self.bytes_read = self.bytes_written = 0
+        self.latency = LatencyHistogram()
+
+_operations: Dict[Tuple[str, str], _Usage] = {}      # (page, operation) -> usage
+_renders: Dict[str, LatencyHistogram] = {}            # page -> render latency
+_sessions: "OrderedDict[str, Dict]" = OrderedDict()   # session -> totals, most recent last
+
+def document_size(value) -> int:
+    """Approximate stored size in bytes, following Firestore's storage size rules"""
+    if value is None or isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, float, datetime)):
+        return 8
+    if isinstance(value, str):
+        return len(value.encode("utf-8")) + 1
+    if isinstance(value, bytes):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(len(str(k).encode("utf-8")) + 1 + document_size(v) for k, v in value.items())
+    if isinstance(value, (list, tuple)):
+        return sum(document_size(v) for v in value)
+    return 8  # field transforms and other sentinels
+
+def _snapshot_size(snapshot) -> int:
+    if not getattr(snapshot, "exists", False):
+        return 0
+    data = getattr(snapshot, "_data", None)
+    return document_size(data if data is not None else snapshot.to_dict()) + 32
+
+def record(operation: str, seconds: float, reads: int = 0, writes: int = 0,
+           bytes_read: int = 0, bytes_written: int = 0) -> None:
+    """Record one database call against the current page and session"""
+    page = _current_page.get()
+    session = _current_session.get()
+    with _lock:
+        usage = _operations.get((page, operation))
+        if usage is None:
+            usage = _operations[(page, operation)] = _Usage()
+        usage.calls += 1
+        usage.reads += reads
+        usage.writes += writes
+        usage.bytes_read += bytes_read
+        usage.bytes_written += bytes_written
+        usage.latency.observe(seconds)
+
+        if session is not None:
+            totals = _sessions.get(session)
+            if totals is not None:
+                totals["reads"] += reads
+                totals["writes"] += writes
+                totals["bytes"] += bytes_read + bytes_written
+
+@contextmanager
+def page_context(page: str, session_id: Optional[str] = None, user_id: Optional[str] = None) -> Iterator[None]:
+    """Attribute database work inside the block to a page render"""
+    page_token = _current_page.set(page)
+    session_token = _current_session.set(session_id)
+    if session_id is not None:
+        with _lock:
+            totals = _sessions.pop(session_id, None) or {"session": session_id, "renders": 0, "reads": 0, "writes": 0, "bytes": 0}
+            totals.update({"user_id": user_id, "last_page": page, "last_seen": datetime.now()})
+            totals["renders"] += 1
+            _sessions[session_id] = totals
+            while len(_sessions) > MAX_SESSIONS:
+                _sessions.popitem(last=False)
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        with _lock:
+            _renders.setdefault(page, LatencyHistogram()).observe(elapsed)
+        _current_session.reset(session_token)
+        _current_page.reset(page_token)
+
+# Reporting
+
+def get_page_metrics() -> List[Dict]:
+    """Per-page totals and per-render averages"""
+    with _lock:
+        pages = {}
+        for (page, _), usage in _operations.items():
+            totals = pages.setdefault(page, {"page": page, "calls": 0, "reads": 0, "writes": 0, "bytes_read": 0, "bytes_written": 0})
+            totals["calls"] += usage.calls
+            totals["reads"] += usage.reads
+            totals["writes"] += usage.writes
+            totals["bytes_read"] += usage.bytes_read
+            totals["bytes_written"] += usage.bytes_written
+        for page, histogram in _renders.items():
+            totals = pages.setdefault(page, {"page": page, "calls": 0, "reads": 0, "writes": 0, "bytes_read": 0, "bytes_written": 0})
+            totals.update({
+                "renders": histogram.count,
+                "render_p50_ms": histogram.quantile(0.5) * 1000,
+                "render_p95_ms": histogram.quantile(0.95) * 1000
+            })
+    for totals in pages.values():
+        renders = totals.setdefault("renders", 0)
+        totals.setdefault("render_p50_ms", 0.0)
+        totals.setdefault("render_p95_ms", 0.0)
+        for field in ("reads", "writes", "bytes_read", "bytes_written"):
+            totals[f"{field}_per_render"] = totals[field] / renders if renders else 0.0
+    return sorted(pages.values(), key=lambda p: -p["reads"])
+
+def get_operation_metrics(page: Optional[str] = None) -> List[Dict]:
+    """Per-operation totals and latency, optionally for one page"""
+    with _lock:
+        rows = [{
+            "page": p,
+            "operation": operation,
+            "calls": usage.calls,
+            "reads": usage.reads,
+            "writes": usage.writes,
+            "bytes_read": usage.bytes_read,
+            "bytes_written": usage.bytes_written,
+            "p50_ms": usage.latency.quantile(0.5) * 1000,
+            "p95_ms": usage.latency.quantile(0.95) * 1000
+        } for (p, operation), usage in _operations.items() if page is None or p == page]
+    return sorted(rows, key=lambda r: -r["reads"])
+
+def get_session_metrics(limit: int = 20) -> List[Dict]:
+    """The sessions that have read the most"""
+    with _lock:
+        sessions = [dict(s) for s in _sessions.values()]
+    return sorted(sessions, key=lambda s: -s["reads"])[:limit]
+
+def reset_metrics() -> None:
+    with _lock:
+        _operations.clear()
+        _renders.clear()
+        _sessions.clear()
+
+def _labels(**labels: str) -> str:
+    return ",".join(f'{k}="{str(v)}"'.replace("\n", " ") for k, v in labels.items())
+
+def _histogram_lines(name: str, histogram: LatencyHistogram, **labels: str) -> List[str]:
+    lines = []
+    cumulative = 0
+    for bound, count in zip(LATENCY_BUCKETS + (math.inf,), histogram.counts):
+        cumulative += count
+        le = "+Inf" if bound == math.inf else repr(bound)
+        lines.append(f"{name}_bucket{{{_labels(**labels, le=le)}}} {cumulative}")
+    lines.append(f"{name}_sum{{{_labels(**labels)}}} {histogram.total:.6f}")
+    lines.append(f"{name}_count{{{_labels(**labels)}}} {histogram.count}")
+    return lines
+
+def prometheus_text() -> str:
+    """All metrics in the Prometheus text exposition format"""
+    counters = (
+        ("calls", "Database calls"),
+        ("reads", "Billable document reads"),
+        ("writes", "Billable document writes"),
+        ("bytes_read", "Approximate document bytes read"),
+        ("bytes_written", "Approximate document bytes written")
+    )
+    with _lock:
+        operations = sorted(_operations.items())
+        renders = sorted(_renders.items())
+        lines = []
+        for field, help_text in counters:
+            name = f"{METRIC_PREFIX}_{field}_total"
+            lines += [f"# HELP {name} {help_text} by page and operation", f"# TYPE {name} counter"]
+            for (page, operation), usage in operations:
+                lines.append(f"{name}{{{_labels(page=page, operation=operation)}}} {getattr(usage, field)}")
+
+        name = f"{METRIC_PREFIX}_operation_seconds"
+        lines += [f"# HELP {name} Database call latency by page and operation", f"# TYPE {name} histogram"]
+        for (page, operation), usage in operations:
+            lines += _histogram_lines(name, usage.latency, page=page, operation=operation)
+
+        name = "exam_page_render_seconds"
+        lines += [f"# HELP {name} Page render time", f"# TYPE {name} histogram"]
+        for page, histogram in renders:
+            lines += _histogram_lines(name, histogram, page=page)
+    return "\n".join(lines) + "\n"
+
+# Client wrappers. Each forwards everything it doesn't instrument to the
+# wrapped object, and unwraps references before handing them to it.
+
+def _unwrap(value):
+    return value._target if isinstance(value, _Wrapper) else value
+
+def _unwrap_kwargs(kwargs: Dict) -> Dict:
+    return {k: _unwrap(v) for k, v in kwargs.items()}
+
+class _Wrapper:
+    __slots__ = ("_target",)
+
+    def __init__(self, target):
+        object.__setattr__(self, "_target", target)
+
+    def __getattr__(self, name):
+        return getattr(self._target, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._target, name, value)
+
+    @property
+    def wrapped(self):
+        return self._target
+
+class _Query(_Wrapper):
+    __slots__ = ()
+
+    def _wrap(self, method: str, *args, **kwargs) -> "_Query":
+        return _Query(getattr(self._target, method)(*[_unwrap(a) for a in args], **_unwrap_kwargs(kwargs)))
+
+    def where(self, *args, **kwargs):
+        return self._wrap("where", *args, **kwargs)
+
+    def order_by(self, *args, **kwargs):
+        return self._wrap("order_by", *args, **kwargs)
+
+    def limit(self, *args, **kwargs):
+        return self._wrap("limit", *args, **kwargs)
+
+    def offset(self, *args, **kwargs):
+        return self._wrap("offset", *args, **kwargs)
+
+    def select(self, *args, **kwargs):
+        return self._wrap("select", *args, **kwargs)
+
+    def start_after(self, *args, **kwargs):
+        return self._wrap("start_after", *args, **kwargs)
+
+    def start_at(self, *args, **kwargs):
+        return self._wrap("start_at", *args, **kwargs)
+
+    def end_before(self, *args, **kwargs):
+        return self._wrap("end_before", *args, **kwargs)
+
+    def end_at(self, *args, **kwargs):
+        return self._wrap("end_at", *args, **kwargs)
+
+    def count(self, *args, **kwargs):
+        return _CountQuery(self._target.count(*args, **kwargs))
+
+    def stream(self, transaction=None, **kwargs):
+        started = time.perf_counter()
+        count = size = 0
+        try:
+            for snapshot in self._target.stream(transaction=_unwrap(transaction), **kwargs):
+                count += 1
+                size += _snapshot_size(snapshot)
+                yield snapshot
+        finally:
+            # A query costs at least one read even when it matches nothing
+            record("query", time.perf_counter() - started, reads=max(1, count), bytes_read=size)
+
+    def get(self, transaction=None, **kwargs):
+        return list(self.stream(transaction=transaction, **kwargs))
+
+class _CountQuery(_Wrapper):
+    __slots__ = ()
+
+    def get(self, *args, **kwargs):
+        started = time.perf_counter()
+        result = self._target.get(*args, **kwargs)
+        count = int(result[0][0].value) if result and result[0] else 0
+        # Aggregations bill one read per 1000 index entries
+        record("count", time.perf_counter() - started, reads=max(1, math.ceil(count / 1000)))
+        return result
+
+class _Collection(_Query):
+    __slots__ = ()
+
+    def document(self, *args, **kwargs):
+        return _Document(self._target.document(*args, **kwargs))
+
+    def add(self, document_data: Dict, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            update_time, reference = self._target.add(document_data, *args, **kwargs)
+            return update_time, _Document(reference)
+        finally:
+            record("document.add", time.perf_counter() - started, writes=1, bytes_written=document_size(document_data))
+
+class _Document(_Wrapper):
+    __slots__ = ()
+
+    def collection(self, *args, **kwargs):
+        return _Collection(self._target.collection(*args, **kwargs))
+
+    def get(self, *args, **kwargs):
+        started = time.perf_counter()
+        snapshot = self._target.get(*args, **_unwrap_kwargs(kwargs))
+        record("document.get", time.perf_counter() - started, reads=1, bytes_read=_snapshot_size(snapshot))
+        return snapshot
+
+    def _write(self, operation: str, data: Optional[Dict], *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            method = getattr(self._target, operation)
+            return method(*args, **kwargs) if data is None else method(data, *args, **kwargs)
+        finally:
+            record(f"document.{operation}", time.perf_counter() - started, writes=1,
+                   bytes_written=document_size(data) if data is not None else 0)
+
+    def set(self, document_data: Dict, *args, **kwargs):
+        return self._write("set", document_data, *args, **kwargs)
+
+    def create(self, document_data: Dict, *args, **kwargs):
+        return self._write("create", document_data, *args, **kwargs)
+
+    def update(self, field_updates: Dict, *args, **kwargs):
+        return self._write("update", field_updates, *args, **kwargs)
+
+    def delete(self, *args, **kwargs):
+        return self._write("delete", None, *args, **kwargs)
+
+class _WriteBatch(_Wrapper):
+    """Counts queued writes and records them when the batch commits"""
+    __slots__ = ("_writes", "_bytes")
+
+    def __init__(self, target):
+        super().__init__(target)
+        object.__setattr__(self, "_writes", 0)
+        object.__setattr__(self, "_bytes", 0)
+
+    def _queue(self, operation: str, reference, data: Optional[Dict], *args, **kwargs):
+        object.__setattr__(self, "_writes", self._writes + 1)
+        object.__setattr__(self, "_bytes", self._bytes + (document_size(data) if data is not None else 0))
+        method = getattr(self._target, operation)
+        if data is None:
+            return method(_unwrap(reference), *args, **kwargs)
+        return method(_unwrap(reference), data, *args, **kwargs)
+
+    def set(self, reference, document_data: Dict, *args, **kwargs):
+        return self._queue("set", reference, document_data, *args, **kwargs)
+
+    def create(self, reference, document_data: Dict, *args, **kwargs):
+        return self._queue("create", reference, document_data, *args, **kwargs)
+
+    def update(self, reference, field_updates: Dict, *args, **kwargs):
+        return self._queue("update", reference, field_updates, *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        return self._queue("delete", reference, None, *args, **kwargs)
+
+    def commit(self, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return self._target.commit(*args, **kwargs)
+        finally:
+            record("batch.commit", time.perf_counter() - started, writes=self._writes, bytes_written=self._bytes)
+            object.__setattr__(self, "_writes", 0)
+            object.__setattr__(self, "_bytes", 0)
+
+class _Transaction(_Wrapper):
+    """Transaction writes are recorded as they are queued (commit happens inside the client)"""
+    __slots__ = ()
+
+    def get(self, ref_or_query, *args, **kwargs):
+        if isinstance(ref_or_query, _Wrapper):
+            ref_or_query = ref_or_query._target
+        started = time.perf_counter()
+        result = self._target.get(ref_or_query, *args, **kwargs)
+        if hasattr(result, "exists"):
+            snapshots = [result]
+        else:
+            # Firestore returns a generator for documents as well as queries
+            snapshots = list(result)
+        record("transaction.get", time.perf_counter() - started, reads=max(1, len(snapshots)),
+               bytes_read=sum(_snapshot_size(s) for s in snapshots))
+        return result if hasattr(result, "exists") else iter(snapshots)
+
+    def _queue(self, operation: str, reference, data: Optional[Dict], *args, **kwargs):
+        record("transaction.write", 0.0, writes=1, bytes_written=document_size(data) if data is not None else 0)
+        method = getattr(self._target, operation)
+        if data is None:
+            return method(_unwrap(reference), *args, **kwargs)
+        return method(_unwrap(reference), data, *args, **kwargs)
+
+    def set(self, reference, document_data: Dict, *args, **kwargs):
+        return self._queue("set", reference, document_data, *args, **kwargs)
+
+    def create(self, reference, document_data: Dict, *args, **kwargs):
+        return self._queue("create", reference, document_data, *args, **kwargs)
+
+    def update(self, reference, field_updates: Dict, *args, **kwargs):
+        return self._queue("update", reference, field_updates, *args, **kwargs)
+
+    def delete(self, reference, *args, **kwargs):
+        return self._queue("delete", reference, None, *args, **kwargs)
+
+class InstrumentedClient(_Wrapper):
+    """A database client whose calls are recorded; behaves like the client it wraps"""
+    __slots__ = ()
+
+    def collection(self, *args, **kwargs):
+        return _Collection(self._target.collection(*args, **kwargs))
+
+    def document(self, *args, **kwargs):
+        return _Document(self._target.document(*args, **kwargs))
+
+    def get_all(self, references, *args, **kwargs):
+        references = [_unwrap(r) for r in references]
+        started = time.perf_counter()
+        size = 0
+        try:
+            for snapshot in self._target.get_all(references, *args, **_unwrap_kwargs(kwargs)):
+                size += _snapshot_size(snapshot)
+                yield snapshot
+        finally:
+            record("get_all", time.perf_counter() - started, reads=len(references), bytes_read=size)
+
+    def batch(self, *args, **kwargs):
+        return _WriteBatch(self._target.batch(*args, **kwargs))
+
+    def transaction(self, *args, **kwargs):
+        return _Transaction(self._target.transaction(*args, **kwargs))
+
+def instrument(client):
+    """Wrap a Firestore (or local) client so every call is measured"""
+    if client is None or isinstance(client, InstrumentedClient):
+        return client
+    return InstrumentedClient(client)
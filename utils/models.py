@@ -0,0 +1,167 @@
+from collections.abc import Mapping
+from typing import Dict, Iterable, Iterator, Optional, Tuple
+import numpy as np
+
+# Typed, read-only records for the documents the pages pass around. Known
+# fields live in __slots__ (no per-instance dict); anything else a document
+# carries goes in a small overflow dict. Records still behave like the dicts
+# they replace (record["name"], .get(), **record), but they can't be
+# modified, so the read caches in db_operations hand out shared instances
+# instead of copying them for every caller. ResultColumns holds many results
+# as one array per field for bulk analytics.
+_MISSING = object()
+
+class Record(Mapping):
+    """Read-only, slotted view of a Firestore document"""
+    __slots__ = ("id", "_extra")
+    FIELDS: Tuple[str, ...] = ()
+    _field_set = frozenset()
+
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        cls._field_set = frozenset(cls.FIELDS)
+
+    def __init__(self, data: Dict, id: Optional[str] = None):
+        set_field = object.__setattr__
+        set_field(self, "id", id)
+        extra = None
+        for name, value in data.items():
+            if name in self._field_set:
+                set_field(self, name, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[name] = value
+        set_field(self, "_extra", extra)
+
+    @classmethod
+    def from_snapshot(cls, snapshot) -> Optional["Record"]:
+        """Build a record from a document snapshot, or None if it doesn't exist"""
+        if not snapshot.exists:
+            return None
+        return cls(snapshot.to_dict(), snapshot.id)
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only; use replace()")
+
+    def __reduce__(self):
+        return (type(self), (self.to_dict(), self.id))
+
+    def __getitem__(self, key: str):
+        if key in self._field_set:
+            value = getattr(self, key, _MISSING)
+        elif key == "id":
+            value = _MISSING if self.id is None else self.id
+        else:
+            value = self._extra.get(key, _MISSING) if self._extra else _MISSING
+        if value is _MISSING:
+            raise KeyError(key)
+        return value
+
+    def get(self, key: str, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def __contains__(self, key) -> bool:
+        return self.get(key, _MISSING) is not _MISSING
+
+    def __iter__(self) -> Iterator[str]:
+        if self.id is not None:
+            yield "id"
+        for name in self.FIELDS:
+            if hasattr(self, name):
+                yield name
+        if self._extra:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({dict(self)!r})"
+
+    def to_dict(self) -> Dict:
+        """The document's fields as a plain dict (without the id)"""
+        data = {name: getattr(self, name) for name in self.FIELDS if hasattr(self, name)}
+        if self._extra:
+            data.update(self._extra)
+        return data
+
+    def replace(self, **changes) -> "Record":
+        """A copy of this record with some fields changed"""
+        return type(self)({**self.to_dict(), **changes}, self.id)
+
+class Exam(Record):
+    FIELDS = ("name", "description", "duration", "is_active", "created_by", "created_at",
+              "total_questions", "total_points", "questions_version")
+    __slots__ = FIELDS
+
+class Question(Record):
+    FIELDS = ("question_number", "text", "type", "options", "correct_answer", "points", "created_at")
+    __slots__ = FIELDS
+
+    def __init__(self, data: Dict, id: Optional[str] = None):
+        super().__init__(data, id)
+        # Options are shared by every session rendering the question
+        if isinstance(getattr(self, "options", None), list):
+            object.__setattr__(self, "options", tuple(self.options))
+
+class Result(Record):
+    FIELDS = ("exam_id", "exam_name", "student_id", "student_name", "score", "max_score", "percentage",
+              "answer_encoding", "questions_version", "choices", "texts", "answers",
+              "submitted_at", "time_taken", "auto_submitted")
+    __slots__ = FIELDS
+
+class User(Record):
+    FIELDS = ("uid", "email", "full_name", "role", "created_at", "last_login", "last_exam_taken",
+              "exams_taken", "total_points", "exams_taken_ids", "exams_taken_indexed", "search_tokens")
+    __slots__ = FIELDS
+
+class ResultColumns:
+    """Many results as one array per field (struct of arrays)"""
+    __slots__ = ("id", "exam_id", "student_id", "score", "max_score", "percentage", "time_taken", "submitted_at")
+    NUMERIC = ("score", "max_score", "percentage", "time_taken")
+
+    def __init__(self, **columns: np.ndarray):
+        for name in self.__slots__:
+            setattr(self, name, columns.get(name))
+
+    @classmethod
+    def from_records(cls, results: Iterable[Mapping], fields: Optional[Iterable[str]] = None) -> "ResultColumns":
+        """Collect the given fields (default: all) of result records or dicts into arrays"""
+        fields = tuple(fields or cls.__slots__)
+        values = {name: [] for name in fields}
+        for result in results:
+            for name in fields:
+                values[name].append(result.get(name))
+
+        columns = {}
+        for name, column in values.items():
+            if name not in cls.NUMERIC:
+                columns[name] = np.array(column, dtype=object)
+            elif any(v is None for v in column):
+                columns[name] = np.array([np.nan if v is None else v for v in column], dtype=np.float64)
+            else:
+                # Integer scores stay integers so sums match what Firestore stores
+                columns[name] = np.array(column) if column else np.zeros(0, dtype=np.int64)
+        return cls(**columns)
+
+    def __len__(self) -> int:
+        for name in self.__slots__:
+            column = getattr(self, name)
+            if column is not None:
+                return len(column)
+        return 0
+
+    def order_by(self, field: str, descending: bool = False) -> np.ndarray:
+        """Row indices sorted by a column (stable, so ties keep their input order)"""
+        column = getattr(self, field)
+        if descending:
+            return np.argsort(-column, kind="stable") if field in self.NUMERIC else np.argsort(column, kind="stable")[::-1]
+        return np.argsort(column, kind="stable")
+
+    def take(self, rows) -> "ResultColumns":
+        """The given rows (indices or a boolean mask) as a new set of columns"""
+        return ResultColumns(**{name: getattr(self, name)[rows] for name in self.__slots__ if getattr(self, name) is not None})
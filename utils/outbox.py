@@ -0,0 +1,167 @@
+from utils.db_operations import make_attempt_id, submit_exam_results_batch, submit_exam_results
+from datetime import datetime
+from typing import Dict, List, Optional
+import json
+import os
+import random
+import sqlite3
+import threading
+import time
+import uuid
+
+# Submissions are accepted into a local SQLite outbox (WAL mode, so an insert
+# is a sub-millisecond append that survives a process restart) and drained to
+# Firestore by a background thread. Every row carries its attempt nonce, and
+# submission is idempotent per attempt, so a row that is flushed twice (e.g.
+# the process died between commit and delete) is still recorded once.
+OUTBOX_PATH = os.getenv("OUTBOX_PATH", "outbox.sqlite3")
+FLUSH_BATCH_SIZE = 50
+FLUSH_INTERVAL = 0.5  # seconds between polls when the queue is idle
+MAX_BACKOFF = 300  # seconds
+
+_local = threading.local()
+_flusher: Optional[threading.Thread] = None
+_flusher_lock = threading.Lock()
+_wakeup = threading.Event()
+_metrics = {"enqueued": 0, "flushed": 0, "failed_attempts": 0, "last_flush_at": None, "last_error": None}
+_metrics_lock = threading.Lock()
+
+def _connection() -> sqlite3.Connection:
+    """One SQLite connection per thread"""
+    conn = getattr(_local, "conn", None)
+    if conn is None:
+        conn = sqlite3.connect(OUTBOX_PATH, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS submissions (
+                attempt_id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                attempt_nonce TEXT NOT NULL,
+                enqueued_at REAL NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT
+            )
+        """)
+        _local.conn = conn
+    return conn
+
+def _encode(value):
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    raise TypeError(f"Cannot encode {type(value).__name__}")
+
+def _decode(obj: Dict):
+    if "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+def enqueue_submission(result_data: Dict, attempt_nonce: Optional[str] = None) -> str:
+    """Durably accept a submission for background delivery; returns its attempt id as a receipt"""
+    try:
+        attempt_nonce = attempt_nonce or uuid.uuid4().hex
+        attempt_id = make_attempt_id(result_data["student_id"], result_data["exam_id"], attempt_nonce)
+        payload = dict(result_data)
+        payload.setdefault("submitted_at", datetime.now())
+        now = time.time()
+        # Re-enqueueing the same attempt is a no-op
+        inserted = _connection().execute(
+            "INSERT OR IGNORE INTO submissions (attempt_id, payload, attempt_nonce, enqueued_at, next_attempt_at) VALUES (?, ?, ?, ?, ?)",
+            (attempt_id, json.dumps(payload, default=_encode), attempt_nonce, now, now)
+        ).rowcount
+        with _metrics_lock:
+            _metrics["enqueued"] += inserted
+        start_flusher()
+        _wakeup.set()
+        return attempt_id
+    except Exception as e:
+        raise Exception(f"Failed to queue submission: {str(e)}")
+
+def pending_exam_ids(student_id: str) -> set:
+    """Exams this student has submitted that are still waiting in the outbox"""
+    try:
+        rows = _connection().execute(
+            "SELECT DISTINCT json_extract(payload, '$.exam_id') FROM submissions WHERE json_extract(payload, '$.student_id') = ?",
+            (student_id,)
+        ).fetchall()
+        return {exam_id for (exam_id,) in rows}
+    except Exception as e:
+        raise Exception(f"Failed to read queued submissions: {str(e)}")
+
+def _due_rows(limit: int) -> List[sqlite3.Row]:
+    return _connection().execute(
+        "SELECT attempt_id, payload, attempt_nonce, attempts FROM submissions WHERE next_attempt_at <= ? ORDER BY enqueued_at LIMIT ?",
+        (time.time(), limit)
+    ).fetchall()
+
+def _record_failure(attempt_id: str, attempts: int, error: Exception) -> None:
+    # Exponential backoff with jitter so a Firestore outage isn't hammered
+    delay = min(MAX_BACKOFF, 2 ** attempts) * random.uniform(0.5, 1.0)
+    _connection().execute(
+        "UPDATE submissions SET attempts = ?, next_attempt_at = ?, last_error = ? WHERE attempt_id = ?",
+        (attempts + 1, time.time() + delay, str(error), attempt_id)
+    )
+    with _metrics_lock:
+        _metrics["failed_attempts"] += 1
+        _metrics["last_error"] = str(error)
+
+def flush_once(limit: int = FLUSH_BATCH_SIZE) -> int:
+    """Deliver up to `limit` due submissions; returns how many were delivered"""
+    rows = _due_rows(limit)
+    if not rows:
+        return 0
+    submissions = [(json.loads(payload, object_hook=_decode), nonce) for _, payload, nonce, _ in rows]
+
+    try:
+        submit_exam_results_batch(submissions)
+        delivered = [row[0] for row in rows]
+    except Exception:
+        # Fall back to one at a time so a single bad submission can't block the queue
+        delivered = []
+        for (attempt_id, _, _, attempts), (result_data, nonce) in zip(rows, submissions):
+            try:
+                submit_exam_results(result_data, nonce)
+                delivered.append(attempt_id)
+            except Exception as e:
+                _record_failure(attempt_id, attempts, e)
+
+    if delivered:
+        _connection().executemany("DELETE FROM submissions WHERE attempt_id = ?", [(a,) for a in delivered])
+        with _metrics_lock:
+            _metrics["flushed"] += len(delivered)
+            _metrics["last_flush_at"] = datetime.now()
+    return len(delivered)
+
+def _flush_forever() -> None:
+    while True:
+        try:
+            if flush_once() == FLUSH_BATCH_SIZE:
+                continue  # more waiting, keep draining
+        except Exception as e:
+            with _metrics_lock:
+                _metrics["last_error"] = str(e)
+        _wakeup.wait(FLUSH_INTERVAL)
+        _wakeup.clear()
+
+def start_flusher() -> None:
+    """Start the background flusher once per process; it also drains rows left by a previous run"""
+    global _flusher
+    with _flusher_lock:
+        if _flusher is None or not _flusher.is_alive():
+            _flusher = threading.Thread(target=_flush_forever, name="outbox-flusher", daemon=True)
+            _flusher.start()
+
+def get_outbox_metrics() -> Dict:
+    """Queue depth, delivery lag and delivery counters for this worker's outbox"""
+    depth, oldest, retrying = _connection().execute(
+        "SELECT COUNT(*), MIN(enqueued_at), SUM(attempts > 0) FROM submissions"
+    ).fetchone()
+    with _metrics_lock:
+        metrics = dict(_metrics)
+    metrics.update({
+        "depth": depth,
+        "retrying": retrying or 0,
+        "lag_seconds": time.time() - oldest if oldest else 0.0
+    })
+    return metrics
@@ -0,0 +1,85 @@
+from typing import Dict, List, Tuple
+import csv
+import io
+import json
+
+# Limits shared with the single-question form in manage_questions
+QUESTION_TYPES = ["Multiple Choice", "True/False", "Short Answer", "Essay"]
+MAX_OPTIONS = 5
+MAX_POINTS = 10
+OPTION_SEPARATOR = "|"
+
+CSV_TEMPLATE = (
+    "text,type,points,question_number,options,correct_answer\n"
+    "What is 2 + 2?,Multiple Choice,1,1,3|4|5,4\n"
+    "The sky is blue.,True/False,1,2,,True\n"
+)
+
+def _normalize(raw: Dict) -> Dict:
+    """Turn one uploaded row into question data as the add-question form builds it"""
+    question_type = str(raw.get("type") or "").strip()
+    options = raw.get("options") or []
+    if isinstance(options, str):
+        options = [o.strip() for o in options.split(OPTION_SEPARATOR)] if options.strip() else []
+    if question_type == "True/False":
+        options = ["True", "False"]
+
+    question = {
+        "text": str(raw.get("text") or "").strip(),
+        "type": question_type,
+        "options": [str(o) for o in options],
+        "correct_answer": str(raw.get("correct_answer") or "").strip(),
+        "points": raw.get("points") or 1
+    }
+    if raw.get("question_number") not in (None, ""):
+        question["question_number"] = raw["question_number"]
+    return question
+
+def parse_question_file(name: str, content: bytes) -> List[Dict]:
+    """Parse an uploaded CSV or JSON question bank"""
+    text = content.decode("utf-8-sig")
+    if name.lower().endswith(".json"):
+        rows = json.loads(text)
+        if isinstance(rows, dict):
+            rows = rows.get("questions", [])
+    else:
+        rows = list(csv.DictReader(io.StringIO(text)))
+    return [_normalize(row) for row in rows]
+
+def validate_question(question: Dict) -> List[str]:
+    """Problems with a question, empty if it can be saved"""
+    errors = []
+    if not question.get("text"):
+        errors.append("question text is required")
+    if question.get("type") not in QUESTION_TYPES:
+        errors.append(f"type must be one of {', '.join(QUESTION_TYPES)}")
+
+    try:
+        points = int(question.get("points", 1))
+        if not 1 <= points <= MAX_POINTS:
+            errors.append(f"points must be between 1 and {MAX_POINTS}")
+    except (TypeError, ValueError):
+        errors.append("points must be a whole number")
+
+    if question.get("question_number") is not None:
+        try:
+            if int(question["question_number"]) < 1:
+                errors.append("question number must be positive")
+        except (TypeError, ValueError):
+            errors.append("question number must be a whole number")
+
+    if question.get("type") in ("Multiple Choice", "True/False"):
+        options = question.get("options") or []
+        if question["type"] == "Multiple Choice" and not 2 <= len(options) <= MAX_OPTIONS:
+            errors.append(f"multiple choice needs 2 to {MAX_OPTIONS} options")
+        if not all(options):
+            errors.append("all options must be filled")
+        if question.get("correct_answer") not in options:
+            errors.append("correct answer must be one of the options")
+    elif question.get("type") == "Short Answer" and not question.get("correct_answer"):
+        errors.append("short answer questions need a correct answer")
+    return errors
+
+def validate_questions(questions: List[Dict]) -> List[Tuple[int, str]]:
+    """Validate a whole question bank, returning (row number, problem) pairs"""
+    return [(row, error) for row, question in enumerate(questions, 1) for error in validate_question(question)]
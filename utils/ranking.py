@@ -0,0 +1,163 @@
+from firebase_config import db
+from firebase_admin import firestore
+from cachetools import TTLCache
+from typing import Dict, Iterable, List, Optional
+import argparse
+import threading
+
+# Every exam (plus the all-exams board) keeps a histogram of attempt
+# percentages at 0.1% resolution in exam_ranks/<board>. Submissions bump one
+# bin with an Increment; readers load the histogram into a Fenwick tree so a
+# rank or percentile is an O(log bins) prefix sum instead of a results scan.
+EXAM_RANKS_COLLECTION = "exam_ranks"
+ALL_EXAMS_INDEX = "_all"
+BINS_PER_PERCENT = 10
+NUM_BINS = 100 * BINS_PER_PERCENT + 1
+RANK_INDEX_TTL = 30  # seconds before a worker reloads another worker's submissions
+REBUILD_PAGE_SIZE = 1000
+
+class FenwickTree:
+    """Binary indexed tree over a fixed number of bins"""
+    __slots__ = ("_tree", "total")
+
+    def __init__(self, size: int):
+        self._tree = [0] * (size + 1)
+        self.total = 0
+
+    def add(self, index: int, delta: int) -> None:
+        self.total += delta
+        index += 1
+        while index < len(self._tree):
+            self._tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, index: int) -> int:
+        """Sum of bins 0..index inclusive"""
+        result = 0
+        index = min(index + 1, len(self._tree) - 1)
+        while index > 0:
+            result += self._tree[index]
+            index -= index & -index
+        return result
+
+_indexes = TTLCache(maxsize=256, ttl=RANK_INDEX_TTL)
+_indexes_lock = threading.Lock()
+
+def index_id(exam_id: Optional[str]) -> str:
+    return exam_id or ALL_EXAMS_INDEX
+
+def _index_ref(exam_id: Optional[str]):
+    return db.collection(EXAM_RANKS_COLLECTION).document(index_id(exam_id))
+
+def percentage_bin(percentage: float) -> int:
+    return min(NUM_BINS - 1, max(0, int(round(percentage * BINS_PER_PERCENT))))
+
+def record_score(batch, exam_id: str, percentage: float) -> None:
+    """Queue a new attempt's percentage on the exam and all-exams rank indexes"""
+    move_score(batch, exam_id, None, percentage)
+
+def bin_deltas(old_percentage: Optional[float], new_percentage: float) -> Dict[str, int]:
+    """Bin count changes for moving an attempt from one percentage to another"""
+    old_bin = percentage_bin(old_percentage) if old_percentage is not None else None
+    new_bin = percentage_bin(new_percentage)
+    if old_bin == new_bin:
+        return {}
+    deltas = {str(new_bin): 1}
+    if old_bin is not None:
+        deltas[str(old_bin)] = -1
+    return deltas
+
+def apply_bin_deltas(batch, exam_id: str, deltas: Dict[str, int]) -> None:
+    """Queue summed bin changes: one write per rank index however many attempts moved"""
+    updates = {bin_index: firestore.Increment(delta) for bin_index, delta in deltas.items() if delta}
+    if not updates:
+        return
+    for board in (exam_id, None):
+        batch.set(_index_ref(board), {"bins": updates}, merge=True)
+
+def move_score(batch, exam_id: str, old_percentage: Optional[float], new_percentage: float) -> None:
+    """Queue moving an attempt between bins, e.g. after a regrade"""
+    apply_bin_deltas(batch, exam_id, bin_deltas(old_percentage, new_percentage))
+
+def _build_tree(bins: Dict[str, int]) -> FenwickTree:
+    tree = FenwickTree(NUM_BINS)
+    for bin_index, count in bins.items():
+        if count:
+            tree.add(int(bin_index), count)
+    return tree
+
+def _stream_percentages(exam_id: Optional[str]) -> Iterable[float]:
+    cursor = None
+    while True:
+        query = db.collection("results")
+        if exam_id:
+            query = query.where("exam_id", "==", exam_id)
+        query = query.select(["percentage"]).order_by("__name__").limit(REBUILD_PAGE_SIZE)
+        if cursor:
+            query = query.start_after({"__name__": cursor})
+        page = list(query.stream())
+        for result in page:
+            yield result.get("percentage")
+        if len(page) < REBUILD_PAGE_SIZE:
+            return
+        cursor = page[-1].id
+
+def rebuild_rank_index(exam_id: Optional[str] = None) -> int:
+    """Recompute a rank index from the results collection; returns the attempt count"""
+    try:
+        bins = {}
+        for percentage in _stream_percentages(exam_id):
+            key = str(percentage_bin(percentage))
+            bins[key] = bins.get(key, 0) + 1
+        _index_ref(exam_id).set({"bins": bins})
+        with _indexes_lock:
+            _indexes[index_id(exam_id)] = _build_tree(bins)
+        return sum(bins.values())
+    except Exception as e:
+        raise Exception(f"Failed to rebuild rank index: {str(e)}")
+
+def _get_tree(exam_id: Optional[str]) -> FenwickTree:
+    with _indexes_lock:
+        tree = _indexes.get(index_id(exam_id))
+    if tree is not None:
+        return tree
+    snapshot = _index_ref(exam_id).get()
+    if not snapshot.exists:
+        rebuild_rank_index(exam_id)
+        with _indexes_lock:
+            return _indexes[index_id(exam_id)]
+    tree = _build_tree(snapshot.get("bins") or {})
+    with _indexes_lock:
+        _indexes[index_id(exam_id)] = tree
+    return tree
+
+def get_rank(exam_id: Optional[str], percentage: float) -> Dict:
+    """Rank of a percentage among all attempts of an exam (or all exams); ties share a rank"""
+    try:
+        tree = _get_tree(exam_id)
+        bin_index = percentage_bin(percentage)
+        below = tree.prefix_sum(bin_index - 1) if bin_index else 0
+        at_or_below = tree.prefix_sum(bin_index)
+        total = max(tree.total, at_or_below, 1)
+        return {
+            "rank": total - at_or_below + 1,
+            "total": total,
+            "percentile": below / total * 100
+        }
+    except Exception as e:
+        raise Exception(f"Failed to get rank: {str(e)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Rank index maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    backfill = subparsers.add_parser("backfill", help="Rebuild rank indexes from existing results")
+    backfill.add_argument("exam_ids", nargs="*", help="Exams to rebuild (default: every exam and the all-exams index)")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        exam_ids: List[Optional[str]] = args.exam_ids or [e.id for e in db.collection("exams").select([]).stream()] + [None]
+        for exam_id in exam_ids:
+            print(f"{index_id(exam_id)}: {rebuild_rank_index(exam_id)} attempts")
+
+if __name__ == "__main__":
+    main()
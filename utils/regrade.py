@@ -0,0 +1,145 @@
+from firebase_config import db
+from firebase_admin import firestore
+from utils.analytics import rebuild_exam_stats
+from utils.answer_codec import decode_answers
+from utils.db_operations import clear_caches, invalidate_exam, rebuild_leaderboard
+from utils.exam_snapshot import get_exam_snapshot
+from utils.grading import compile_answer_key, grade_submissions
+from utils.ranking import apply_bin_deltas, bin_deltas
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Optional
+import argparse
+import time
+
+# A page's result updates, user deltas, rank index moves and checkpoint go out
+# in one batch so a page is applied exactly once even if the job dies and is
+# resumed. Firestore caps a batch at 500 writes: at most 2 per result (the
+# result and its student's total), plus the page's bin moves summed into one
+# write per rank index (exam and all-exams) and the checkpoint.
+DEFAULT_PAGE_SIZE = 200
+MAX_PAGE_SIZE = 248
+REGRADE_JOBS_COLLECTION = "regrade_jobs"
+
+def _job_ref(exam_id: str):
+    return db.collection(REGRADE_JOBS_COLLECTION).document(exam_id)
+
+def regrade_exam(exam_id: str, page_size: int = DEFAULT_PAGE_SIZE, restart: bool = False,
+                 max_pages: Optional[int] = None) -> Dict:
+    """Re-score an exam's results against its current answer key, resuming from the last checkpoint"""
+    try:
+        page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+        invalidate_exam(exam_id)  # grade against the latest answer key, not a cached one
+        snapshot = get_exam_snapshot(exam_id)
+        if snapshot is None:
+            raise ValueError(f"Exam {exam_id} not found")
+        key = compile_answer_key(snapshot)
+
+        # Resume only if the checkpoint was made against the same answer key
+        job = _job_ref(exam_id).get()
+        checkpoint = job.to_dict() if job.exists else None
+        if restart or not checkpoint or checkpoint.get("status") == "completed" or checkpoint.get("version") != snapshot.version:
+            checkpoint = {
+                "exam_id": exam_id,
+                "version": snapshot.version,
+                "cursor": None,
+                "processed": 0,
+                "changed": 0,
+                "points_delta": 0,
+                "started_at": datetime.now(),
+                "status": "running"
+            }
+            _job_ref(exam_id).set(checkpoint)
+
+        started = time.perf_counter()
+        processed_now = 0
+        pages = 0
+        while max_pages is None or pages < max_pages:
+            query = db.collection("results").where("exam_id", "==", exam_id).order_by("__name__").limit(page_size)
+            if checkpoint["cursor"]:
+                query = query.start_after({"__name__": checkpoint["cursor"]})
+            page = list(query.stream())
+            if not page:
+                # Aggregates can't be adjusted for changed scores (min/max), so rebuild them
+                rebuild_exam_stats(exam_id)
+                rebuild_leaderboard(exam_id)
+                rebuild_leaderboard(None)
+                checkpoint["status"] = "completed"
+                _job_ref(exam_id).update({"status": "completed", "updated_at": datetime.now()})
+                break
+
+            results = [r.to_dict() for r in page]
+            report = grade_submissions(key, [decode_answers(r) for r in results])
+
+            batch = db.batch()
+            user_deltas = defaultdict(int)
+            rank_deltas = defaultdict(int)
+            changed = 0
+            for snap, result, score, percentage in zip(page, results, report.scores.tolist(), report.percentages.tolist()):
+                if result.get("score") == score and result.get("max_score") == key.max_score:
+                    continue
+                batch.update(snap.reference, {
+                    "score": score,
+                    "max_score": key.max_score,
+                    "percentage": percentage,
+                    "regraded_at": datetime.now()
+                })
+                user_deltas[result["student_id"]] += score - result.get("score", 0)
+                if result.get("percentage") is not None:
+                    for bin_index, delta in bin_deltas(result["percentage"], percentage).items():
+                        rank_deltas[bin_index] += delta
+                changed += 1
+            apply_bin_deltas(batch, exam_id, rank_deltas)
+
+            for student_id, delta in user_deltas.items():
+                if delta:
+                    batch.set(db.collection("users").document(student_id), {"total_points": firestore.Increment(delta)}, merge=True)
+
+            checkpoint.update({
+                "cursor": page[-1].id,
+                "processed": checkpoint["processed"] + len(page),
+                "changed": checkpoint["changed"] + changed,
+                "points_delta": checkpoint["points_delta"] + sum(user_deltas.values())
+            })
+            batch.update(_job_ref(exam_id), {
+                "cursor": checkpoint["cursor"],
+                "processed": checkpoint["processed"],
+                "changed": checkpoint["changed"],
+                "points_delta": checkpoint["points_delta"],
+                "updated_at": datetime.now()
+            })
+            batch.commit()
+
+            processed_now += len(page)
+            pages += 1
+
+        # Scores changed underneath the read caches
+        clear_caches()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "exam_id": exam_id,
+            "status": checkpoint["status"],
+            "processed": checkpoint["processed"],
+            "changed": checkpoint["changed"],
+            "points_delta": checkpoint["points_delta"],
+            "pages": pages,
+            "elapsed_seconds": elapsed,
+            "results_per_second": processed_now / elapsed if elapsed else 0.0
+        }
+    except Exception as e:
+        raise Exception(f"Failed to regrade exam: {str(e)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score an exam's results after its answer key changes")
+    parser.add_argument("exam_id")
+    parser.add_argument("--page-size", type=int, default=DEFAULT_PAGE_SIZE)
+    parser.add_argument("--restart", action="store_true", help="Ignore any saved checkpoint")
+    args = parser.parse_args()
+
+    report = regrade_exam(args.exam_id, page_size=args.page_size, restart=args.restart)
+    for name, value in report.items():
+        print(f"{name}: {value}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+from firebase_config import db
+from collections import OrderedDict
+from typing import Dict, Iterable, List, Optional, Set
+import argparse
+import re
+import threading
+
+# Users carry a `search_tokens` array with every lowercase prefix of their
+# email, email local part, email domain (with and without the "@"), each
+# word of the email (split on punctuation), full name and each name word. A
+# search for "jo" is then a single array_contains query that matches "John
+# Smith", "Smith Jones", "jo@example.com" and "mary.jones@example.com"
+# without scanning the collection. Other substrings are only found among
+# users this worker has loaded (see UserSearchIndex).
+MAX_PREFIX_LENGTH = 20
+NGRAM_SIZE = 3
+LOCAL_INDEX_SIZE = 20000
+BACKFILL_BATCH_SIZE = 400
+
+def _prefixes(text: str) -> Set[str]:
+    return {text[:i] for i in range(1, min(len(text), MAX_PREFIX_LENGTH) + 1)}
+
+def search_tokens(email: Optional[str], full_name: Optional[str]) -> List[str]:
+    """Lowercase prefix tokens for a user's email and name"""
+    email = (email or "").strip().lower()
+    name = " ".join((full_name or "").lower().split())
+    local, _, domain = email.partition("@")
+    tokens = _prefixes(email) | _prefixes(local) | _prefixes(name)
+    if domain:
+        tokens |= _prefixes(domain) | _prefixes("@" + domain)
+    for word in name.split() + re.split(r"[@._+-]+", email):
+        if word:
+            tokens |= _prefixes(word)
+    return sorted(tokens)
+
+def search_fields(user_data: Dict) -> Dict:
+    """Fields to store on a user document so it can be searched"""
+    return {"search_tokens": search_tokens(user_data.get("email"), user_data.get("full_name"))}
+
+def query_token(term: str) -> str:
+    """The token to query for a search term (longer terms are filtered afterwards)"""
+    return " ".join(term.lower().split())[:MAX_PREFIX_LENGTH]
+
+def matches(user: Dict, term: str) -> bool:
+    """Case-insensitive substring match on email or name, as the search box promises"""
+    term = term.lower().strip()
+    return term in (user.get("email") or "").lower() or term in (user.get("full_name") or "").lower()
+
+class UserSearchIndex:
+    """In-memory n-gram index over the users this worker has recently loaded.
+
+    Answers substring searches in roughly the time it takes to intersect a
+    few posting sets, and evicts least recently added users beyond max_users.
+    """
+
+    def __init__(self, max_users: int = LOCAL_INDEX_SIZE):
+        self.max_users = max_users
+        self._users: "OrderedDict[str, Dict]" = OrderedDict()
+        self._postings: Dict[str, Set[str]] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _grams(text: str) -> Set[str]:
+        grams = set()
+        for size in range(1, NGRAM_SIZE + 1):
+            grams.update(text[i:i + size] for i in range(len(text) - size + 1))
+        return grams
+
+    def _user_grams(self, user: Dict) -> Set[str]:
+        return self._grams((user.get("email") or "").lower()) | self._grams((user.get("full_name") or "").lower())
+
+    def _remove_locked(self, user_id: str) -> None:
+        user = self._users.pop(user_id, None)
+        if user is None:
+            return
+        for gram in self._user_grams(user):
+            posting = self._postings.get(gram)
+            if posting is not None:
+                posting.discard(user_id)
+                if not posting:
+                    del self._postings[gram]
+
+    def add(self, users: Iterable[Dict]) -> None:
+        with self._lock:
+            for user in users:
+                user_id = user.get("id") or user.get("uid")
+                if not user_id:
+                    continue
+                self._remove_locked(user_id)
+                self._users[user_id] = user
+                for gram in self._user_grams(user):
+                    self._postings.setdefault(gram, set()).add(user_id)
+            while len(self._users) > self.max_users:
+                self._remove_locked(next(iter(self._users)))
+
+    def remove(self, user_id: str) -> None:
+        with self._lock:
+            self._remove_locked(user_id)
+
+    def search(self, term: str, limit: int = 50) -> List[Dict]:
+        term = term.lower().strip()
+        if not term:
+            return []
+        with self._lock:
+            # Every n-gram of the term must appear; short terms are looked up directly
+            grams = [term] if len(term) <= NGRAM_SIZE else [term[i:i + NGRAM_SIZE] for i in range(len(term) - NGRAM_SIZE + 1)]
+            postings = sorted((self._postings.get(g, set()) for g in grams), key=len)
+            candidates = set.intersection(*postings) if postings else set()
+            found = [self._users[user_id] for user_id in candidates if matches(self._users[user_id], term)]
+        found.sort(key=lambda u: u.get("email") or "")
+        return [dict(u) for u in found[:limit]]
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+# Shared by every session in this worker
+local_index = UserSearchIndex()
+
+def backfill_search_tokens() -> int:
+    """Add search tokens to every user document; returns the number updated"""
+    updated = 0
+    cursor = None
+    while True:
+        query = db.collection("users").select(["email", "full_name"]).order_by("__name__").limit(BACKFILL_BATCH_SIZE)
+        if cursor:
+            query = query.start_after({"__name__": cursor})
+        page = list(query.stream())
+        if not page:
+            return updated
+        batch = db.batch()
+        for user in page:
+            batch.update(user.reference, search_fields(user.to_dict()))
+        batch.commit()
+        updated += len(page)
+        cursor = page[-1].id
+
+def main():
+    parser = argparse.ArgumentParser(description="User search index maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("backfill", help="Add search tokens to existing user documents")
+    args = parser.parse_args()
+
+    if args.command == "backfill":
+        print(f"Updated {backfill_search_tokens()} users")
+
+if __name__ == "__main__":
+    main()
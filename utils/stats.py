@@ -0,0 +1,94 @@
+from firebase_config import db, transactional
+from firebase_admin import firestore
+from typing import Dict
+import argparse
+import threading
+
+# Platform-wide counters live in a single small document so the admin
+# dashboard never has to stream whole collections to show totals
+STATS_COLLECTION = "stats"
+COUNTERS_DOCUMENT = "counters"
+COUNTER_FIELDS = ("users", "exams", "active_exams", "submissions")
+
+_seeded = False
+_seed_lock = threading.Lock()
+
+def _counters_ref():
+    return db.collection(STATS_COLLECTION).document(COUNTERS_DOCUMENT)
+
+@transactional
+def _seed_counters(transaction) -> None:
+    """Count the collections unless the counters document already has every field"""
+    snapshot = _counters_ref().get(transaction=transaction)
+    data = (snapshot.to_dict() if snapshot.exists else None) or {}
+    if all(name in data for name in COUNTER_FIELDS):
+        return
+    # Increments committed meanwhile touch this document, so the transaction
+    # retries rather than overwriting them with stale counts
+    transaction.set(_counters_ref(), count_collections())
+
+def ensure_counters() -> None:
+    """Seed the counters document from the collections; run once per process at startup"""
+    global _seeded
+    if _seeded:
+        return
+    with _seed_lock:
+        if not _seeded:
+            _seed_counters(db.transaction())
+            _seeded = True
+
+def increment_counters(batch, **deltas: int) -> None:
+    """Queue counter changes on a write batch or transaction.
+
+    Only queues a write. The counters document is seeded separately
+    (ensure_counters at startup, or `python -m utils.stats rebuild`), since
+    an increment on a missing document creates it holding only its delta.
+    """
+    updates = {name: firestore.Increment(delta) for name, delta in deltas.items() if delta}
+    if updates:
+        batch.set(_counters_ref(), updates, merge=True)
+
+def count_collections() -> Dict[str, int]:
+    """Count documents with server-side aggregation queries"""
+    queries = {
+        "users": db.collection("users"),
+        "exams": db.collection("exams"),
+        "active_exams": db.collection("exams").where("is_active", "==", True),
+        "submissions": db.collection("results")
+    }
+    return {name: int(query.count().get()[0][0].value) for name, query in queries.items()}
+
+def rebuild_counters() -> Dict[str, int]:
+    """Recompute every counter from the collections and store the result"""
+    try:
+        counts = count_collections()
+        _counters_ref().set(counts)
+        return counts
+    except Exception as e:
+        raise Exception(f"Failed to rebuild counters: {str(e)}")
+
+def get_dashboard_stats() -> Dict[str, int]:
+    """Get platform totals for the admin dashboard"""
+    try:
+        counters = _counters_ref().get()
+        data = (counters.to_dict() if counters.exists else None) or {}
+        if not all(name in data for name in COUNTER_FIELDS):
+            # First run on existing data: seed the counters document once
+            _seed_counters(db.transaction())
+            data = _counters_ref().get().to_dict()
+        return {name: data.get(name, 0) for name in COUNTER_FIELDS}
+    except Exception as e:
+        raise Exception(f"Failed to get dashboard stats: {str(e)}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Dashboard counter maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("rebuild", help="Recompute the counters from the collections")
+    args = parser.parse_args()
+
+    if args.command == "rebuild":
+        for name, count in rebuild_counters().items():
+            print(f"{name}: {count}")
+
+if __name__ == "__main__":
+    main()